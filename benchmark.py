@@ -0,0 +1,139 @@
+# v1
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import synthetic_corpus
+
+# Where flexible.py and the two scripts are, so they can be imported from inside the corpus directory
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+directions = ["flextext", "eaf"]
+
+def measure(direction: str, directory: str, memory: bool, xml: str = "stdlib"):
+    """Run one conversion in this process and measure it. Meant to be run in a fresh process, as it moves into the corpus directory (the paths in its configs are relative to it)
+
+    Parameters:
+        direction: "flextext" (EAF to FLExText) or "eaf" (FLExText to EAF)
+        directory: a directory written by synthetic_corpus.write_corpus
+        memory: whether to trace memory allocations (which slows the conversion down, so the time isn't meaningful)
+        xml: the XML backend for the converter to use, one of flexible.xml_backends
+
+    Returns a dict with the seconds the conversion took, the seconds it took to validate what it wrote and how many problems were found (see validation.validate_file), or the peak MB allocated during the conversion
+    """
+    os.chdir(directory)
+    sys.path.insert(0, repo_dir)
+    if direction == "flextext":
+        import flextext_construction
+        config = json.load(open("to_flextext_config.json"))
+        converter, item = flextext_construction.FlexTextConverter(config, xml=xml), config["file_names"][0]
+    else:
+        import eaf_construction
+        config = json.load(open("to_eaf_config.json"))
+        converter, item = eaf_construction.EafConverter(config, xml=xml), config["eafs_flextexts"][0]
+    if memory:
+        tracemalloc.start()
+        converter.convert(item)
+        return {"peak_mb":tracemalloc.get_traced_memory()[1] / 1e6}
+    start = time.perf_counter()
+    outputs = converter.convert(item)
+    seconds = time.perf_counter() - start
+    import validation
+    start = time.perf_counter()
+    problems = sum(len(validation.validate_file(output)) for output in outputs)
+    return {"seconds":seconds, "validate_seconds":time.perf_counter() - start, "problems":problems}
+
+def run_measurement(direction: str, directory: str, memory: bool, xml: str = "stdlib"):
+    """Measure a conversion in a separate Python process, so conversions don't share imports, caches or memory"""
+    command = [sys.executable, os.path.abspath(__file__), "--measure", direction, directory, "--xml", xml]
+    if memory:
+        command.append("--memory")
+    # the conversion's progress output isn't wanted, just the measurement on the last line
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True, text=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+def run_benchmarks(sizes: list, memory: bool = True, seed: int = 0, xml_backends: list = ("stdlib",)):
+    """Convert a synthetic corpus of each size in both directions, timing each conversion and measuring its peak memory
+
+    Parameters:
+        sizes: numbers of segments
+        memory: whether to measure memory as well, which takes a second run of each conversion
+        seed: passed on to synthetic_corpus.write_corpus
+        xml_backends: the XML backends to run each conversion with, to compare them
+
+    Returns a list of dicts with the segments, direction, xml backend, seconds, validate_seconds, problems and peak_mb (None if memory wasn't measured)
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic_corpus.write_corpus(directory, size, seed)
+            for direction in directions:
+                for xml in xml_backends:
+                    result = {"segments":size, "direction":direction, "xml":xml}
+                    result.update(run_measurement(direction, directory, False, xml))
+                    result["peak_mb"] = run_measurement(direction, directory, True, xml)["peak_mb"] if memory else None
+                    print("{:>8} segments  {:<8}  {:<6}  {:>9.2f} s  {:>9} MB  validated in {:.2f} s, {} problems".format(size, direction, xml, result["seconds"], "-" if result["peak_mb"] is None else "{:.1f}".format(result["peak_mb"]), result["validate_seconds"], result["problems"]), flush=True)
+                    results.append(result)
+    return results
+
+def compare(results: list, baseline: list, time_tolerance: float, memory_tolerance: float):
+    """Compare benchmark results against a baseline
+
+    Parameters:
+        results: as returned by run_benchmarks
+        baseline: results saved from an earlier run
+        time_tolerance: fraction by which a conversion may be slower than the baseline before it counts as a regression
+        memory_tolerance: fraction by which a conversion's peak memory may be above the baseline before it counts as a regression
+
+    Any more problems in the output than in the baseline's are also a regression.
+
+    Returns a list of messages, one for each regression
+    """
+    # baselines saved before there was a choice of XML backend were all run with the stdlib
+    baseline_by_run = {(i["segments"], i["direction"], i.get("xml", "stdlib")):i for i in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_run.get((result["segments"], result["direction"], result["xml"]))
+        # sizes that weren't in the baseline run have nothing to compare to
+        if base is None:
+            continue
+        if result["seconds"] > base["seconds"] * (1 + time_tolerance):
+            regressions.append("{} segments, {} ({}): {:.2f} s, baseline {:.2f} s".format(result["segments"], result["direction"], result["xml"], result["seconds"], base["seconds"]))
+        if result["peak_mb"] is not None and base["peak_mb"] is not None and result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance):
+            regressions.append("{} segments, {} ({}): {:.1f} MB, baseline {:.1f} MB".format(result["segments"], result["direction"], result["xml"], result["peak_mb"], base["peak_mb"]))
+        # baselines saved before outputs were validated have nothing to compare to
+        if "problems" in base and result["problems"] > base["problems"]:
+            regressions.append("{} segments, {} ({}): {} problems in the output, baseline {}".format(result["segments"], result["direction"], result["xml"], result["problems"], base["problems"]))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile both conversions on synthetic corpora of several sizes")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="Comma-separated numbers of segments to benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpora")
+    parser.add_argument("--no-memory", dest="memory", help="Only time the conversions, without the second run that measures memory", action="store_false")
+    parser.add_argument("--xml", default="stdlib", help="Comma-separated XML backends to run each conversion with (stdlib, lxml), e.g. stdlib,lxml to compare them")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Save the results to FILE, to compare later runs against")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare the results to those saved in FILE, and fail if any are worse")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="How much slower than the baseline (as a fraction) a conversion may be")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="How much more memory than the baseline (as a fraction) a conversion may use")
+    parser.add_argument("--measure", nargs=2, metavar=("DIRECTION", "DIRECTORY"), help=argparse.SUPPRESS)
+    parser.add_argument("--memory", dest="measure_memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # one conversion, run by run_measurement in its own process
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.measure_memory, args.xml)))
+        raise SystemExit(0)
+    results = run_benchmarks([int(i) for i in args.sizes.split(",")], args.memory, args.seed, args.xml.split(","))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf8") as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("Regression:", regression)
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,132 @@
+# v1
+from uuid import uuid4
+import sqlite3
+import time
+
+class CorpusDatabase:
+    """A SQLite database of the segments of converted texts, with their translations, words and morphs, for asking questions of a whole corpus at once
+
+    Each text is stored under its FLExText's path, and storing a text again replaces everything stored for it before.
+    The columns people are likely to look things up by (speaker, xds, word pos and gls, morph cf, gls and msa) are indexed.
+    """
+    schema = """
+        PRAGMA foreign_keys = ON;
+        CREATE TABLE IF NOT EXISTS sources (
+            source_id INTEGER PRIMARY KEY,
+            flextext TEXT UNIQUE NOT NULL,
+            original_eaf TEXT,
+            eaf TEXT,
+            stored REAL
+        );
+        CREATE TABLE IF NOT EXISTS segments (
+            segment_id INTEGER PRIMARY KEY,
+            source_id INTEGER NOT NULL REFERENCES sources(source_id) ON DELETE CASCADE,
+            segnum TEXT,
+            speaker TEXT,
+            xds TEXT,
+            phon_tar TEXT,
+            orig_aID TEXT,
+            begin INTEGER,
+            end INTEGER,
+            full_text TEXT,
+            notes TEXT
+        );
+        CREATE TABLE IF NOT EXISTS translations (
+            segment_id INTEGER NOT NULL REFERENCES segments(segment_id) ON DELETE CASCADE,
+            lang TEXT,
+            text TEXT
+        );
+        CREATE TABLE IF NOT EXISTS words (
+            word_id INTEGER PRIMARY KEY,
+            segment_id INTEGER NOT NULL REFERENCES segments(segment_id) ON DELETE CASCADE,
+            position INTEGER,
+            word_text TEXT,
+            lang TEXT,
+            pos TEXT,
+            gls TEXT
+        );
+        CREATE TABLE IF NOT EXISTS morphs (
+            word_id INTEGER NOT NULL REFERENCES words(word_id) ON DELETE CASCADE,
+            position INTEGER,
+            morph_type TEXT,
+            txt TEXT,
+            cf TEXT,
+            gls TEXT,
+            msa TEXT,
+            variantTypes TEXT,
+            hn TEXT
+        );
+        CREATE TABLE IF NOT EXISTS database_info (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE INDEX IF NOT EXISTS segments_source ON segments(source_id);
+        CREATE INDEX IF NOT EXISTS segments_speaker ON segments(speaker);
+        CREATE INDEX IF NOT EXISTS segments_xds ON segments(xds);
+        CREATE INDEX IF NOT EXISTS translations_segment ON translations(segment_id);
+        CREATE INDEX IF NOT EXISTS words_segment ON words(segment_id);
+        CREATE INDEX IF NOT EXISTS words_pos ON words(pos);
+        CREATE INDEX IF NOT EXISTS words_gls ON words(gls);
+        CREATE INDEX IF NOT EXISTS morphs_word ON morphs(word_id);
+        CREATE INDEX IF NOT EXISTS morphs_cf ON morphs(cf);
+        CREATE INDEX IF NOT EXISTS morphs_gls ON morphs(gls);
+        CREATE INDEX IF NOT EXISTS morphs_msa ON morphs(msa);
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path: the SQLite database file, made if it doesn't exist yet
+        """
+        self.path = path
+
+    def connect(self):
+        """Returns a connection to the database, with the tables and indexes made if they weren't there"""
+        # conversions running side by side wait for each other's writes rather than failing
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.executescript(self.schema)
+        return connection
+
+    def database_id(self):
+        """Returns the ID the database was given when it was made, which a new database at the same path won't have, for the cache to tell them apart"""
+        connection = self.connect()
+        try:
+            with connection:
+                # whichever conversion gets here first when the database is new gives it its ID
+                connection.execute("INSERT OR IGNORE INTO database_info VALUES ('id', ?)", (uuid4().hex,))
+                return connection.execute("SELECT value FROM database_info WHERE name = 'id'").fetchone()[0]
+        finally:
+            connection.close()
+
+    def store(self, text: dict, segments: dict, eaf_file: str = None):
+        """Store the segments of a text, replacing whatever was stored for it before, all in one transaction
+
+        Parameters:
+            text: dict with the paths of the "original_eaf" and the "flextext", as listed in the config
+            segments: dict of segnums and Segments
+            eaf_file: path of the EAF made from the text
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM sources WHERE flextext = ?", (text["flextext"],))
+                source_id = connection.execute("INSERT INTO sources (flextext, original_eaf, eaf, stored) VALUES (?, ?, ?, ?)", (text["flextext"], text["original_eaf"], eaf_file, time.time())).lastrowid
+                # The IDs are worked out here, so each table can be inserted all at once
+                segment_id = connection.execute("SELECT COALESCE(MAX(segment_id), 0) FROM segments").fetchone()[0]
+                word_id = connection.execute("SELECT COALESCE(MAX(word_id), 0) FROM words").fetchone()[0]
+                segment_rows, translation_rows, word_rows, morph_rows = [], [], [], []
+                for segnum, segment in segments.items():
+                    segment_id += 1
+                    segment_rows.append((segment_id, source_id, segnum, segment.speaker, segment.xds, segment.phon_tar, segment.orig_aID,
+                        int(segment.begin) if segment.begin is not None else None, int(segment.end) if segment.end is not None else None, segment.full_text, segment.notes))
+                    translation_rows.extend((segment_id, lang, translation) for lang, translation in segment.translations.items())
+                    for word_position, word in enumerate(segment.words):
+                        word_id += 1
+                        word_rows.append((word_id, segment_id, word_position, word.word_text, word.lang, word.pos, word.gls))
+                        morph_rows.extend((word_id, morph_position, morph.morph_type, morph.txt, morph.cf, morph.gls, morph.msa, morph.variantTypes, morph.hn) for morph_position, morph in enumerate(word.morphs))
+                connection.executemany("INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", segment_rows)
+                connection.executemany("INSERT INTO translations VALUES (?, ?, ?)", translation_rows)
+                connection.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?)", word_rows)
+                connection.executemany("INSERT INTO morphs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", morph_rows)
+        finally:
+            connection.close()
@@ -0,0 +1,100 @@
+# v1
+# numpy is optional, and only needed for corpus statistics: without it, require_numpy says so when they're asked for
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The columns of the statistics table made by summarize_counts, in order
+stats_columns = ["speaker", "kid", "xds", "utterances", "mlu_words", "mlu_morphs", "target_ratio"]
+
+def require_numpy():
+    """Raise an ImportError saying numpy is needed, if it isn't installed"""
+    if np is None:
+        raise ImportError("Corpus statistics need numpy to be installed (pip install numpy)")
+
+def segment_counts(segments: dict, target_pairs: dict, speakers: dict):
+    """Pack the counts that corpus statistics are worked out from into arrays, one element per Phonetic segment
+
+    Parameters:
+        segments: dict of segnums and Segments
+        target_pairs: dict of the segnums of Target segments and the Phonetic segments they go with, from flibl.pair_targets
+        speakers: the "speakers" of to_eaf_config.json, for whether each speaker is a kid
+
+    Returns a dict of numpy arrays: speaker, kid and xds, the numbers of words and morphs, and whether the segment has a Target
+    """
+    require_numpy()
+    phonetic = [segnum for segnum, segment in segments.items() if segment.phon_tar == "Phonetic"]
+    with_target = set(target_pairs.values())
+    return {
+        "speaker":np.array([segments[segnum].speaker for segnum in phonetic], dtype=str),
+        "kid":np.array([bool(speakers.get(segments[segnum].speaker, {}).get("kid")) for segnum in phonetic], dtype=bool),
+        "xds":np.array([segments[segnum].xds for segnum in phonetic], dtype=str),
+        "words":np.array([len(segments[segnum].words) for segnum in phonetic], dtype=np.int64),
+        "morphs":np.array([sum(len(word.morphs) for word in segments[segnum].words) for segnum in phonetic], dtype=np.int64),
+        "target":np.array([segnum in with_target for segnum in phonetic], dtype=bool)
+    }
+
+def save_counts(counts: dict, file):
+    """Write the counts made by segment_counts to a path or binary file object (as an .npz)"""
+    np.savez(file, **counts)
+
+def load_counts(path: str):
+    """Returns the counts written by save_counts, as a dict of arrays"""
+    require_numpy()
+    with np.load(path) as npz:
+        return {name:npz[name] for name in npz.files}
+
+def summarize_counts(counts: list):
+    """Work out corpus statistics from the counts of any number of texts, grouped by speaker, kid and xds, and by speaker and kid over all xds (given as "*")
+
+    Parameters:
+        counts: list of dicts of arrays, as made by segment_counts (or loaded from a file numpy.savez wrote them to)
+
+    Returns a list of rows, each a dict with the stats_columns: the number of (Phonetic) utterances, the mean number of words and of morphs per utterance, and the fraction of utterances with a Target
+    """
+    require_numpy()
+    columns = {name:np.concatenate([np.asarray(text_counts[name]) for text_counts in counts]) if counts else np.array([]) for name in ["speaker", "kid", "xds", "words", "morphs", "target"]}
+    rows = []
+    for by_xds in [True, False]:
+        # Turn each key column into integer codes, and combine them into one code per group
+        speaker_names, speaker_codes = np.unique(columns["speaker"].astype(str), return_inverse=True)
+        kid_codes = columns["kid"].astype(np.int64)
+        if by_xds:
+            xds_names, xds_codes = np.unique(columns["xds"].astype(str), return_inverse=True)
+        else:
+            xds_names, xds_codes = np.array(["*"]), np.zeros(len(kid_codes), dtype=np.int64)
+        group_codes = (speaker_codes * 2 + kid_codes) * len(xds_names) + xds_codes
+        groups, group_index = np.unique(group_codes, return_inverse=True)
+        utterances = np.bincount(group_index, minlength=len(groups))
+        words = np.bincount(group_index, weights=columns["words"], minlength=len(groups))
+        morphs = np.bincount(group_index, weights=columns["morphs"], minlength=len(groups))
+        targets = np.bincount(group_index, weights=columns["target"], minlength=len(groups))
+        for n, group in enumerate(groups):
+            rows.append({
+                "speaker":str(speaker_names[group // len(xds_names) // 2]),
+                "kid":bool(group // len(xds_names) % 2),
+                "xds":str(xds_names[group % len(xds_names)]),
+                "utterances":int(utterances[n]),
+                "mlu_words":words[n] / utterances[n],
+                "mlu_morphs":morphs[n] / utterances[n],
+                "target_ratio":targets[n] / utterances[n]
+            })
+    return sorted(rows, key=lambda row: (row["speaker"], row["xds"] == "*", row["xds"]))
+
+def format_stats(rows: list, separator: str = None):
+    """Lay out corpus statistics as a table
+
+    Parameters:
+        rows: as returned by summarize_counts
+        separator: what to put between columns, e.g. "\t" for a TSV (None to line the columns up with spaces for reading)
+
+    Returns the table as a string, with a header line
+    """
+    lines = [stats_columns]
+    for row in rows:
+        lines.append([row["speaker"], "yes" if row["kid"] else "no", row["xds"] or "-", str(row["utterances"])] + ["{:.3f}".format(row[column]) for column in stats_columns[4:]])
+    if separator is not None:
+        return "\n".join(separator.join(line) for line in lines) + "\n"
+    widths = [max(len(line[n]) for line in lines) for n in range(len(stats_columns))]
+    return "\n".join("  ".join(value.ljust(width) if n < 3 else value.rjust(width) for n, (value, width) in enumerate(zip(line, widths))) for line in lines) + "\n"
@@ -1,442 +1,801 @@
 # v1.6
 import xml.etree.ElementTree as ET
 import flexible as flibl
+import corpus_database
+import corpus_stats
+import watching
 import json
 from datetime import datetime
 import argparse
-parser = argparse.ArgumentParser()
-parser.add_argument("-j", "--json", dest="export_json", help="Export as JSON as well", action="store_true")
-args = parser.parse_args()
-morph_keys = ["txt", "cf", "gls", "msa", "variantTypes", "hn", "morph_type"]
-# Load/parse/create the relevant XML trees
-config = json.load(open('to_eaf_config.json'))
-for text in config["eafs_flextexts"]:
-    orig = ET.parse(text["original_eaf"]).getroot()
-    flextext = ET.parse(text["flextext"]).getroot()
-    # Use the existing info from the original EAF to fill in elements required at the top of the document
-    eaf_tree = ET.ElementTree(ET.Element("ANNOTATION_DOCUMENT", attrib=orig.attrib))
-    eaf = eaf_tree.getroot()
-    eaf.append(orig[0])
-    eaf.append(flibl.make_times(flextext))
-
-    # Get all the speaker codes and make the tier codes for each, if you want specific speaker codes in ELAN but full names in flex
-    # Not actually necessary though so we're skipping it
-    # Fill in tiers
-    # Make the linguistic (tier) types
-    types = {
-        config["language"]: ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID":config["language"],
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"true"
-            }),
-        "words": ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID":"words",
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"false",
-            "CONSTRAINTS":"Symbolic_Subdivision"
-            })
-    }
-    # seems like the original spec wanted each translation language to have its own type--I don't really know if that's necessary but I'm continuing that for now
-    for tns_lang in config["translations"]:
-        types["tns-"+tns_lang] = ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID":"tns-"+tns_lang,
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"false",
-            "CONSTRAINTS":"Symbolic_Association"
-            })
-    for data_type in ["notes", "target", "gls", "pos"]:
-        types[data_type] = ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID": data_type,
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"false",
-            "CONSTRAINTS":"Symbolic_Association"
-            })
-    # make types for each morph-level tier
-    for morph_key in morph_keys:
-        if morph_key == "txt":
-            types["morph-{}".format(morph_key)] = ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID":"morph-{}".format(morph_key),
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"false",
-            "CONSTRAINTS":"Symbolic_Subdivision"
-            })
-        else:
-            types["morph-{}".format(morph_key)] = ET.Element("LINGUISTIC_TYPE", attrib={
-            "LINGUISTIC_TYPE_ID":"morph-{}".format(morph_key),
-            "GRAPHIC_REFERENCES":"false",
-            "TIME_ALIGNABLE":"false",
-            "CONSTRAINTS":"Symbolic_Association"
-            })
-
-    # Make the tiers, by unique speakers
-    tiers_by_speaker = {}
-    # Take the unique speakers from the ELAN file
-    speakers = {i.attrib["PARTICIPANT"] for i in orig.findall("TIER") if "PARTICIPANT" in i.attrib.keys()}
-    # In each iteration we're making ALL of the tiers related to the given speaker
-    for i in speakers:
-        speaker_tiers = []
-        speaker = config["speakers"][i]
-        base_tier_name = speaker["name"] + "-" + config["language"] + "-"
-        # Parent tier is the transcription, labelled just as the speaker + language name
-        parent_tier = ET.Element("TIER", attrib={
-                "PARTICIPANT":speaker["name"],
-                "LINGUISTIC_TYPE_REF":config["language"],
-                "TIER_ID":base_tier_name + "phonetic"
+import glob
+import io
+import itertools
+import os
+import shutil
+import sys
+morph_keys = flibl.morph_keys
+
+class EafConverter:
+    """Makes EAFs from FLExTexts exported from FLEx and the EAFs they originally came from, following a to_eaf_config.json
+
+    Build one for a config and use it for as many texts as needed; the tier types and everything else taken from the config are only worked out once.
+    """
+    def __init__(self, config: dict, export_json: bool = False, time_range: tuple = None, xml: str = "stdlib", phrase_cache: flibl.PhraseCache = None, database: corpus_database.CorpusDatabase = None, stats: bool = False):
+        """
+        Parameters:
+            config: the parsed to_eaf_config.json
+            export_json: whether to write a JSON representation of each text as well
+            time_range: (start, stop) in milliseconds, to only convert the segments overlapping that stretch of the recording; either can be None to leave that end open
+            xml: the XML backend to parse the original EAF and the FLExText with, one of flibl.xml_backends
+            phrase_cache: a PhraseCache to load FLExTexts that have been read before from, instead of parsing them again (None to always parse them)
+            database: a CorpusDatabase to store the segments, words and morphs of each text in as well
+            stats: whether to write the counts that corpus statistics are made from (see summarize) next to each EAF; needs numpy
+        """
+        self.config = config
+        self.export_json = export_json
+        self.time_range = time_range
+        # The EAF is written by flibl.EafWriter whichever backend is used, so the backend only changes how fast the inputs are read
+        self.xml = flibl.make_xml(xml)
+        self.phrase_cache = phrase_cache
+        self.database = database
+        if stats:
+            corpus_stats.require_numpy()
+        self.stats = stats
+        # Make the linguistic (tier) types
+        self.types = {
+            config["language"]: ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID":config["language"],
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"true"
+                }),
+            "words": ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID":"words",
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"false",
+                "CONSTRAINTS":"Symbolic_Subdivision"
                 })
-        speaker_tiers.append(parent_tier)
-        # translation tiers
+        }
+        # seems like the original spec wanted each translation language to have its own type--I don't really know if that's necessary but I'm continuing that for now
         for tns_lang in config["translations"]:
-            speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF":"tns-"+tns_lang,
-                "PARENT_REF":base_tier_name + "phonetic",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":speaker["name"]+"-tns-"+tns_lang
-            }))
-        # notes, xds
-        for note_type in ["notes", "xds"]:
-            speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF":"notes",
-                "PARENT_REF":base_tier_name+"phonetic",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":speaker["name"] + "-" + note_type
-            }))
-        # phonetic words
-        speaker_tiers.append(ET.Element("TIER", attrib={
-            "LINGUISTIC_TYPE_REF":"words",
-            "PARENT_REF":base_tier_name + "phonetic",
-            "PARTICIPANT":speaker["name"],
-            "TIER_ID":base_tier_name + "phonetic-words"
-        }))
-
-        data_types = ["gls", "pos", "morph-txt"]
-        # non-target
-        for data_type in data_types:
+            self.types["tns-"+tns_lang] = ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID":"tns-"+tns_lang,
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"false",
+                "CONSTRAINTS":"Symbolic_Association"
+                })
+        for data_type in ["notes", "target", "gls", "pos"]:
+            self.types[data_type] = ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID": data_type,
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"false",
+                "CONSTRAINTS":"Symbolic_Association"
+                })
+        # make types for each morph-level tier
+        for morph_key in morph_keys:
+            if morph_key == "txt":
+                self.types["morph-{}".format(morph_key)] = ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID":"morph-{}".format(morph_key),
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"false",
+                "CONSTRAINTS":"Symbolic_Subdivision"
+                })
+            else:
+                self.types["morph-{}".format(morph_key)] = ET.Element("LINGUISTIC_TYPE", attrib={
+                "LINGUISTIC_TYPE_ID":"morph-{}".format(morph_key),
+                "GRAPHIC_REFERENCES":"false",
+                "TIME_ALIGNABLE":"false",
+                "CONSTRAINTS":"Symbolic_Association"
+                })
+
+        # the symbolic association tiers hanging off each baseline, and the morph info types, in the order they're made
+        self.phrase_content_types = ["notes", "xds"] + ["tns-"+tns_lang for tns_lang in config["translations"]]
+        self.morph_content_types = [i for i in flibl.Morph.__slots__ if i != "txt"]
+        # Everything in the config but the list of files affects the output, as do exporting the JSON and the counts, which part of each text is converted, and which database it goes into
+        # (by its ID rather than its path, so that a database deleted and made again gets every text stored in it again, even those that haven't changed)
+        self.settings = {"config":{k:v for k, v in config.items() if k != "eafs_flextexts"}, "export_json":export_json, "time_range":time_range, "database":database.database_id() if database is not None else None, "stats":stats}
+
+    def input_files(self, text: dict):
+        """Returns the list of files an EAF is made from, for the cache"""
+        return [text["original_eaf"], text["flextext"]]
+
+    def convert(self, text: dict, profiler: flibl.Profiler = None, files: flibl.FileAccess = None):
+        """Make an EAF from a FLExText exported from FLEx and the EAF it originally came from
+
+        Parameters:
+            text: dict with the paths of the "original_eaf" and the "flextext", as listed in the config
+            profiler: a Profiler to record the stages and counts of the conversion in
+            files: the FileAccess to read the EAF and FLExText and write the outputs with (straight to disk if None)
+
+        Returns a list with the paths of the EAF (and JSON) written
+        """
+        config = self.config
+        if profiler is None:
+            profiler = flibl.Profiler()
+        if files is None:
+            files = flibl.FileAccess()
+        # Load/parse/create the relevant XML trees
+        profiler.begin("parse original EAF")
+        with files.open_input(text["original_eaf"]) as orig_file:
+            orig = self.xml.parse(orig_file)
+        # Use the existing info from the original EAF to fill in elements required at the top of the document
+        header = orig[0]
+        # Time slots are made as the phrases are read
+        time_order = ET.Element("TIME_ORDER")
+        time_slots = {}
+
+        profiler.begin("make tiers")
+        # Get all the speaker codes and make the tier codes for each, if you want specific speaker codes in ELAN but full names in flex
+        # Not actually necessary though so we're skipping it
+        # Fill in tiers
+        # Make the tiers, by unique speakers
+        tiers_by_speaker = {}
+        # Take the unique speakers from the ELAN file
+        speakers = {i.attrib["PARTICIPANT"] for i in self.xml.findall(orig, "TIER") if "PARTICIPANT" in i.attrib.keys()}
+        # In each iteration we're making ALL of the tiers related to the given speaker
+        for i in speakers:
+            speaker_tiers = []
+            speaker = config["speakers"][i]
+            base_tier_name = speaker["name"] + "-" + config["language"] + "-"
+            # Parent tier is the transcription, labelled just as the speaker + language name
+            parent_tier = ET.Element("TIER", attrib={
+                    "PARTICIPANT":speaker["name"],
+                    "LINGUISTIC_TYPE_REF":config["language"],
+                    "TIER_ID":base_tier_name + "phonetic"
+                    })
+            speaker_tiers.append(parent_tier)
+            # translation tiers
+            for tns_lang in config["translations"]:
                 speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF":data_type,
-                "PARENT_REF":base_tier_name + "phonetic-words",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":base_tier_name + "phonetic-" + data_type
-            }))
-        # non-target morph info
-        for morph_key in morph_keys[1:]:
-            speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF":"morph-{}".format(morph_key),
-                "PARENT_REF":base_tier_name + "phonetic-morph-txt",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":base_tier_name + "phonetic-morph-{}".format(morph_key)
-            }))
-        if speaker["kid"]:
-            # target phrase
-            speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF":"target",
-                "PARENT_REF":base_tier_name + "phonetic",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":base_tier_name + "target"
-            }))
-            # target-words
+                    "LINGUISTIC_TYPE_REF":"tns-"+tns_lang,
+                    "PARENT_REF":base_tier_name + "phonetic",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":speaker["name"]+"-tns-"+tns_lang
+                }))
+            # notes, xds
+            for note_type in ["notes", "xds"]:
+                speaker_tiers.append(ET.Element("TIER", attrib={
+                    "LINGUISTIC_TYPE_REF":"notes",
+                    "PARENT_REF":base_tier_name+"phonetic",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":speaker["name"] + "-" + note_type
+                }))
+            # phonetic words
             speaker_tiers.append(ET.Element("TIER", attrib={
                 "LINGUISTIC_TYPE_REF":"words",
-                "PARENT_REF":base_tier_name + "target",
+                "PARENT_REF":base_tier_name + "phonetic",
                 "PARTICIPANT":speaker["name"],
-                "TIER_ID":base_tier_name + "target-words"
+                "TIER_ID":base_tier_name + "phonetic-words"
             }))
-            # the rest (gloss, pos, morph-txt)
+
+            data_types = ["gls", "pos", "morph-txt"]
+            # non-target
             for data_type in data_types:
-                speaker_tiers.append(ET.Element("TIER", attrib={
-                "LINGUISTIC_TYPE_REF": data_type,
-                "PARENT_REF":base_tier_name + "target-words",
-                "PARTICIPANT":speaker["name"],
-                "TIER_ID":base_tier_name + "target-" + data_type
-            }))
+                    speaker_tiers.append(ET.Element("TIER", attrib={
+                    "LINGUISTIC_TYPE_REF":data_type,
+                    "PARENT_REF":base_tier_name + "phonetic-words",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":base_tier_name + "phonetic-" + data_type
+                }))
+            # non-target morph info
             for morph_key in morph_keys[1:]:
                 speaker_tiers.append(ET.Element("TIER", attrib={
                     "LINGUISTIC_TYPE_REF":"morph-{}".format(morph_key),
-                    "PARENT_REF":base_tier_name + "target-morph-txt",
+                    "PARENT_REF":base_tier_name + "phonetic-morph-txt",
                     "PARTICIPANT":speaker["name"],
-                    "TIER_ID":base_tier_name + "target-morph-{}".format(morph_key)
+                    "TIER_ID":base_tier_name + "phonetic-morph-{}".format(morph_key)
+                }))
+            if speaker["kid"]:
+                # target phrase
+                speaker_tiers.append(ET.Element("TIER", attrib={
+                    "LINGUISTIC_TYPE_REF":"target",
+                    "PARENT_REF":base_tier_name + "phonetic",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":base_tier_name + "target"
+                }))
+                # the target's own translations, notes and xds, which refer to the target annotation and so have to be under its tier
+                for tns_lang in config["translations"]:
+                    speaker_tiers.append(ET.Element("TIER", attrib={
+                        "LINGUISTIC_TYPE_REF":"tns-"+tns_lang,
+                        "PARENT_REF":base_tier_name + "target",
+                        "PARTICIPANT":speaker["name"],
+                        "TIER_ID":base_tier_name + "target-tns-" + tns_lang
                     }))
-        tiers_by_speaker[i] = speaker_tiers
-
-    # add all tiers to the EAF tree
-    for speaker, tier_list in tiers_by_speaker.items():
-        for speaker_tier in tier_list:
-            eaf.append(speaker_tier)
-
-    # Concatenate baselines, glosses, etc (make a function to concatenate and return a single string (well, a few strings, each for a different layer like baseline, gls, words, etc))
-    # Collect flextext phrase tiers in a dict of segnum:phrase_el pairs
-    all_phrases = {phrase[0].text: phrase for phrase in flextext.findall(".//*phrase")}
-    # If there are multiple phrases in a paragraph, put them under one key without the decimal
-    combined_phrases = {}
-    for k,v in all_phrases.items():
-        if k.split(".")[0] not in combined_phrases.keys():
-            combined_phrases[k.split(".")[0]] = [v]
-        else:
-            combined_phrases[k.split(".")[0]] += [v]
-
-    # Combining multiple phrases into one element, just replace those in combined_phrases
-    # combined_phrases_collapsed = combined_phrases
-    for segnum, tiers in {segnum:tiers for segnum, tiers in combined_phrases.items() if len(tiers) > 1}.items():
-        # Only thing that this might be weird about is the fact that we're giving the last phrase's guid to the thing; but we aren't using the guid at all in ELAN so it shouldn't matter
-        full_tier = tiers[0]
-        full_tier.attrib = tiers[-1].attrib
-        full_tier.find(".//item[@type='segnum']").text = segnum
-        for extra_tier in tiers[1:]:
-            # full_tier.append(extra_tier.find(".//words"))
-            for word in extra_tier.find(".//words"):
-                full_tier.find(".//words").append(word)
-            # this @type!=val thing isn't a thing before python 3.10
-            for i in extra_tier.findall(".//item[@type!='segnum']"):
-                full_tier.append(i)
-        # combined_phrases_collapsed[segnum] = full_tier
-        combined_phrases[segnum] = [full_tier]
-    # take the phrases out of lists
-    phrases = {k:v[0] for k,v in combined_phrases.items()}
-
-    # Make a slot for every possible thing per utterance
-    aID_count = 1
-    concatenated = {
-        "original_eaf":text["original_eaf"],
-        "flextext":text["flextext"],
-        "media_file":orig[0][0].attrib["MEDIA_URL"]
-    }
-    segments = {}
-    for segnum, phrase in phrases.items():
-        phrase_dict = {}
-        phrase_dict["full_text"] = " ".join([i.text for i in phrase.findall(".//word/item[@type='txt']")])
-        # associate time offsets with each utterance
-        phrase_dict["times"] = {
-            "begin": {
-                "ts_ref": eaf.find("TIME_ORDER").find(".//TIME_SLOT[@TIME_VALUE='{}']".format(phrase.attrib["begin-time-offset"])).attrib["TIME_SLOT_ID"],
-                "time": eaf.find("TIME_ORDER").find(".//TIME_SLOT[@TIME_VALUE='{}']".format(phrase.attrib["begin-time-offset"])).attrib["TIME_VALUE"]
-            },
-            "end": {
-                "ts_ref": eaf.find("TIME_ORDER").find(".//TIME_SLOT[@TIME_VALUE='{}']".format(phrase.attrib["end-time-offset"])).attrib["TIME_SLOT_ID"],
-                "time": eaf.find("TIME_ORDER").find(".//TIME_SLOT[@TIME_VALUE='{}']".format(phrase.attrib["end-time-offset"])).attrib["TIME_VALUE"]
-            }
+                for note_type in ["notes", "xds"]:
+                    speaker_tiers.append(ET.Element("TIER", attrib={
+                        "LINGUISTIC_TYPE_REF":"notes",
+                        "PARENT_REF":base_tier_name + "target",
+                        "PARTICIPANT":speaker["name"],
+                        "TIER_ID":base_tier_name + "target-" + note_type
+                    }))
+                # target-words
+                speaker_tiers.append(ET.Element("TIER", attrib={
+                    "LINGUISTIC_TYPE_REF":"words",
+                    "PARENT_REF":base_tier_name + "target",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":base_tier_name + "target-words"
+                }))
+                # the rest (gloss, pos, morph-txt)
+                for data_type in data_types:
+                    speaker_tiers.append(ET.Element("TIER", attrib={
+                    "LINGUISTIC_TYPE_REF": data_type,
+                    "PARENT_REF":base_tier_name + "target-words",
+                    "PARTICIPANT":speaker["name"],
+                    "TIER_ID":base_tier_name + "target-" + data_type
+                }))
+                for morph_key in morph_keys[1:]:
+                    speaker_tiers.append(ET.Element("TIER", attrib={
+                        "LINGUISTIC_TYPE_REF":"morph-{}".format(morph_key),
+                        "PARENT_REF":base_tier_name + "target-morph-txt",
+                        "PARTICIPANT":speaker["name"],
+                        "TIER_ID":base_tier_name + "target-morph-{}".format(morph_key)
+                        }))
+            tiers_by_speaker[i] = speaker_tiers
+        # Look up tiers by TIER_ID directly instead of searching the whole EAF for every annotation
+        tier_registry = flibl.make_tier_registry(tiers_by_speaker)
+
+        # Make a slot for every possible thing per utterance
+        concatenated = {
+            "original_eaf":text["original_eaf"],
+            "flextext":text["flextext"],
+            "media_file":orig[0][0].attrib["MEDIA_URL"]
         }
-        # associate translations with each utterance
-        translations = phrase.findall("./item[@type='gls']")
-        for tns_lang in config["translations"]:
-            phrase_dict["tns-"+tns_lang] = ""
-            for gls in translations:
-                if gls.attrib["lang"] == tns_lang:
-                    phrase_dict["tns-"+tns_lang] = gls.text
-
-        # initialize the following empty fields, fill them in where possible
-        notes = ""
-        phon_tar = ""
-        orig_aID = ""
-        speaker = ""
-        xds = ""
-        for note in phrase.findall("./item[@type='note']"):
-            if not note.text:
+        segments, target_pairs, warnings, aID_count = self.read_segments(text, time_order, time_slots, profiler, files)
+        # add all segments to the dict containing the text
+        concatenated["segments"] = segments
+        concatenated["warnings"] = warnings
+        if self.stats:
+            counts = corpus_stats.segment_counts(concatenated["segments"], target_pairs, config["speakers"])
+
+        # Make the els for EAF
+        profiler.begin("build annotations")
+        to_build = []
+        for segnum, phrase in concatenated["segments"].items():
+            # Targets that could not be paired with their Phonetic utterance have nothing to refer to
+            if phrase.phon_tar == "Target" and segnum not in target_pairs:
+                continue
+            # Segments with neither note were warned about by pair_targets, and have no tier to go on
+            if not phrase.phon_tar:
+                profiler.count("segments left out")
                 continue
-            if note.text == "Phonetic" or note.text == "Target":
-                phon_tar = note.text
-                if note.text == "Phonetic":
-                    phrase_dict["alignable_aID"] = aID_count
-                    aID_count += 1
-            elif note.text[0] == "a" and note.text[1] in "1234567890":
-                orig_aID = note.text
-            elif note.text in config["speakers"].keys():
-                speaker = note.text
-            elif note.text in config["xds"]:
-                xds = note.text
-            # all other notes will appear on the same tier, concatenated
+            to_build.append(phrase)
+        # every segment's annotation IDs are known before any are made, so each can be made on its own
+        blocks, aID_count = flibl.allocate_annotation_ids(to_build, aID_count, len(self.phrase_content_types), len(self.morph_content_types))
+        # annotations are gathered per tier and added to the tiers all at once at the end
+        tier_annotations = {tier_id:[] for tier_id in tier_registry}
+        tier_lists = {}
+        for seg_count, (phrase, block) in enumerate(zip(to_build, blocks)):
+            profiler.progress("Making annotations", seg_count + 1, len(to_build))
+            # create base tier name, prefix for all subsequent tiers
+            if phrase.phon_tar == "Target":
+                base_tier_name = sys.intern(phrase.speaker + "-" + config["language"] + "-target")
             else:
-                if len(notes) == 0:
-                    notes = note.text
+                base_tier_name = sys.intern(phrase.speaker + "-" + config["language"] + "-phonetic")
+            if base_tier_name not in tier_lists:
+                # a Phonetic segment's notes, xds and translations go on the speaker's tiers, and a Target's on those under its target tier
+                phrase_tier_prefix = base_tier_name if phrase.phon_tar == "Target" else phrase.speaker
+                tier_lists[base_tier_name] = self.segment_tier_lists(tier_annotations, phrase_tier_prefix, base_tier_name)
+                profiler.count("tier lookups", len(tier_lists[base_tier_name]))
+
+            # make annotation el
+            baseline_ann = ET.Element("ANNOTATION")
+            if phrase.phon_tar == "Phonetic":
+                new_baseline_ann = ET.Element("ALIGNABLE_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(phrase.alignable_aID), "TIME_SLOT_REF1":phrase.begin_ts, "TIME_SLOT_REF2":phrase.end_ts})
+
+                # text_aID is the aID that words will refer to
+                text_aID = phrase.alignable_aID
+            # for other types (ie targets)
+            else:
+                new_baseline_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(phrase.ref_aID), "ANNOTATION_REF":"a"+str(phrase.ann_ref)})
+                # text_aID is the aID that words will refer to
+                text_aID = phrase.ref_aID
+
+            # create baseline tier element with annotation value and annotation
+            new_baseline_ann_val = ET.Element("ANNOTATION_VALUE")
+            new_baseline_ann_val.text = phrase.full_text
+            new_baseline_ann.append(new_baseline_ann_val)
+            baseline_ann.append(new_baseline_ann)
+            tier_lists[base_tier_name][0].append(baseline_ann)
+            self.make_segment_annotations(phrase, text_aID, block, tier_lists[base_tier_name])
+        for tier_id, annotations in tier_annotations.items():
+            tier_registry[tier_id].extend(annotations)
+
+        profiler.count("annotations", aID_count - 1)
+        # note the final aID used (ELAN requires this)
+        header.find(".//PROPERTY[@NAME='lastUsedAnnotationId']").text = str(aID_count - 1)
+
+        # name the file using the current time and date
+        now = str(datetime.now()).split(" ")
+        time = now[1].split(":")
+        date_time = now[0].replace("-", "_") + "-{}_{}".format(time[0], time[1])
+        export_name = text["flextext"][:-9] + "-flex_export-" + date_time + flibl.time_range_name(self.time_range)
+        profiler.begin("write EAF")
+        # Write the EAF element by element, in the order ELAN expects
+        with flibl.EafWriter(export_name + ".eaf", orig.attrib, files) as eaf:
+            eaf.write(header)
+            eaf.write(time_order)
+            # add each tier to the EAF
+            for speaker, tiers in tiers_by_speaker.items():
+                # speakers who say nothing in the time range don't need their tiers
+                if self.time_range is not None and len(tiers[0]) == 0:
+                    continue
+                for tier in tiers:
+                    eaf.write(tier)
+                    # the annotations aren't needed anymore once they're written
+                    tier.clear()
+
+            # add the tier types to the new EAF
+            for tier_type in self.types:
+                eaf.write(self.types[tier_type])
+
+            # add the elements defining languages to the new EAF
+            for language in config["languages"]:
+                language_el = ET.Element("LANGUAGE", attrib={"LANG_DEF":language["LANG_DEF"], "LANG_ID":language["LANG_ID"], "LANG_LABEL":language["LANG_LABEL"]})
+                eaf.write(language_el)
+            for language_el in self.xml.findall(orig, ".//LANGUAGE"):
+                eaf.write(language_el)
+
+            # add the constraints (identical to those of the original EAF) to the new EAF
+            for constraint in self.xml.findall(orig, ".//CONSTRAINT"):
+                eaf.write(constraint)
+
+            # add the controlled vocabulary (identical to those of the original EAF) to the new EAF
+            for cv in self.xml.findall(orig, ".//CONTROLLED_VOCABULARY"):
+                eaf.write(cv)
+        # store the segments in the corpus database
+        if self.database is not None:
+            profiler.begin("store in database")
+            self.database.store(text, concatenated["segments"], export_name + ".eaf")
+        outputs = [export_name + ".eaf"]
+        # write a JSON as well
+        if self.export_json:
+            profiler.begin("write JSON")
+            with io.TextIOWrapper(files.open_output(export_name + ".json"), encoding="utf8") as json_file:
+                json.dump(concatenated, json_file, indent=1, default=flibl.record_json)
+            outputs.append(export_name + ".json")
+        # and the counts for the statistics, which summarize puts together with those of the other texts
+        if self.stats:
+            profiler.begin("write counts")
+            with files.open_output(export_name + ".stats.npz") as stats_file:
+                corpus_stats.save_counts(counts, stats_file)
+            outputs.append(export_name + ".stats.npz")
+        profiler.end()
+        return outputs
+
+    def read_segments(self, text: dict, time_order: ET.Element, time_slots: dict, profiler: flibl.Profiler, files: flibl.FileAccess):
+        """Read the segments of a FLExText, numbering the baseline annotations they'll have and pairing each Target with its Phonetic segment
+
+        Parameters:
+            text: dict with the paths of the "original_eaf" and the "flextext", as listed in the config
+            time_order, time_slots: the TIME_ORDER element and dict of time slots the segments' times are added to (see flibl.make_time_slot)
+            profiler: a Profiler to record the stages and counts in
+            files: the FileAccess to read the FLExText with
+
+        Returns a dict of segnums and Segments, the dict of Target and Phonetic segnums from flibl.pair_targets, its warnings, and the first annotation ID that's free
+        """
+        config = self.config
+        aID_count = 1
+        segments = {}
+        profiler.begin("read FLExText")
+        # Read the flextext one phrase at a time; if there are multiple phrases in a paragraph, they come out as one phrase under the segnum without the decimal
+        flextext_file = files.open_input(text["flextext"])
+        if self.phrase_cache is not None:
+            phrases = self.phrase_cache.phrases(flextext_file, config["language"], config["child_language"], self.xml)
+        else:
+            phrases = flibl.iter_phrases(flextext_file, config["language"], config["child_language"], self.xml)
+        for phrase in flibl.combine_phrases(phrases):
+            segnum = phrase["segnum"]
+            segment = flibl.Segment(segnum)
+            segment.full_text = " ".join(phrase["txt"])
+            # associate time offsets with each utterance
+            if phrase["begin"] is None or phrase["end"] is None:
+                raise KeyError("Segment {} has no begin-time-offset or end-time-offset".format(segnum))
+            # The phrases come one at a time, so the ones outside the time range are dropped before anything is made from them
+            if self.time_range is not None and not flibl.overlaps(int(phrase["begin"]), int(phrase["end"]), self.time_range):
+                continue
+            segment.begin = phrase["begin"]
+            segment.end = phrase["end"]
+            segment.begin_ts = flibl.make_time_slot(phrase["begin"], time_order, time_slots)
+            segment.end_ts = flibl.make_time_slot(phrase["end"], time_order, time_slots)
+            # associate translations with each utterance
+            for tns_lang in config["translations"]:
+                segment.translations[tns_lang] = ""
+                for gls_lang, gls_text in phrase["translations"]:
+                    if gls_lang == tns_lang:
+                        segment.translations[tns_lang] = gls_text
+
+            # fill in the notes where possible
+            for note_text in phrase["notes"]:
+                if not note_text:
+                    continue
+                # notes that repeat across segments (phonetic/target, speaker, xds) share one string
+                if note_text == "Phonetic" or note_text == "Target":
+                    segment.phon_tar = sys.intern(note_text)
+                    if note_text == "Phonetic":
+                        segment.alignable_aID = aID_count
+                        aID_count += 1
+                elif note_text[0] == "a" and note_text[1] in "1234567890":
+                    segment.orig_aID = note_text
+                elif note_text in config["speakers"].keys():
+                    segment.speaker = sys.intern(note_text)
+                elif note_text in config["xds"]:
+                    segment.xds = sys.intern(note_text)
+                # all other notes will appear on the same tier, concatenated
                 else:
-                    notes += "; " + note.text
-        # associate these notes with each utterance
-        phrase_dict["phon_tar"] = phon_tar
-        phrase_dict["orig_aID"] = orig_aID
-        phrase_dict["speaker"] = speaker
-        phrase_dict["xds"] = xds
-        phrase_dict["notes"] = notes
+                    if len(segment.notes) == 0:
+                        segment.notes = note_text
+                    else:
+                        segment.notes += "; " + note_text
         
-        # prepare each word as a parent to its glossing etc
-        word_list = []
-        for word in phrase.findall(".//word"):
-            word_info = {}
-            # only include words in the target languages
-            if word.find("./item[@lang='{}']".format(config["language"])) != None:
-                word_info["word_text"] = word.find("./item[@lang='{}']".format(config["language"])).text
-            elif word.find("./item[@lang='{}']".format(config["child_language"])) != None:
-                if phrase_dict["phon_tar"] == "Phonetic":
-                    word_info["word_text"] = word.find("./item[@lang='{}']".format(config["child_language"])).text
-                else:
+            # prepare each word as a parent to its glossing etc
+            for word in phrase["words"]:
+                # only include words in the target languages
+                if word.lang == config["child_language"] and word.lang != config["language"] and segment.phon_tar != "Phonetic":
                     print("It seems like you are using a language not defined as a child language but have marked it as phonetic.")
                     raise KeyError
-            else:
-                word_info["word_text"] = ""
-            # associate pos and gls with each word
-            for info_type in ["pos", "gls"]:
-                if word.find("./item[@type='{}']".format(info_type)) != None:
-                    word_info[info_type] = word.find("./item[@type='{}']".format(info_type)).text
-                else:
-                    word_info[info_type] = ""
-            # prepare each morph as a parent to its glossing etc
-            these_morphs = []
-            for morph in word.findall(".//morph"):
-                this_morph = {}
-                if "type" in morph.attrib.keys():
-                    this_morph["morph_type"] = morph.attrib["type"]
-                else:
-                    this_morph["morph_type"] = ""
-                for morph_key in morph_keys:
-                    if morph.find(".//item[@type='{}']".format(morph_key)) != None:
-                        this_morph[morph_key] = morph.find(".//item[@type='{}']".format(morph_key)).text
-                    else:
-                        this_morph[morph_key] = ""
-                these_morphs.append(this_morph)
-            # associate this morph info with the word in the phrase
-            word_info["morphs"] = these_morphs
-            word_list.append(word_info)
-        # associate this word info with the segment number/phrase in the text
-        phrase_dict["word_list"] = word_list
-        segments[segnum] = phrase_dict
-    # add all segments to the dict containing the text
-    concatenated["segments"] = segments
-
-    # Look for els that share aID in a note in the FLExText to associate them in the EAF
-    for targ_segnum, targ_phrase in concatenated["segments"].items():
-        if targ_phrase["phon_tar"] == "Target":
-            for phon_segnum, phon_phrase in concatenated["segments"].items():
-                if targ_phrase["orig_aID"] == phon_phrase["orig_aID"] and phon_phrase["phon_tar"] == "Phonetic":
-                    targ_phrase["ann_ref"] = phon_phrase["alignable_aID"]
-                    targ_phrase["ref_aID"] = aID_count
-                    targ_phrase["speaker"] = phon_phrase["speaker"]
-                    aID_count += 1
-
-    # Make the els for EAF
-    # count for tracker
-    num_segs = len(concatenated["segments"].keys())
-    seg_perc = int(num_segs/50)
-    milestones = [i*seg_perc for i in range(50)]
-    for segnum, phrase in concatenated["segments"].items():
-        # increment tracker
-        if int(segnum) in milestones:
-            print(milestones.index(int(segnum))*2, "percent complete")
-        # create base tier name, prefix for all subsequent tiers
-        if phrase["phon_tar"] == "Target":
-            base_tier_name = phrase["speaker"] + "-" + config["language"] + "-target"
-        elif phrase["phon_tar"] == "Phonetic":
-            base_tier_name = phrase["speaker"] + "-" + config["language"] + "-phonetic"
-
-        # make annotation el
-        baseline_ann = ET.Element("ANNOTATION")
-        if phrase["phon_tar"] == "Phonetic":
-            new_baseline_ann = ET.Element("ALIGNABLE_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(phrase["alignable_aID"]), "TIME_SLOT_REF1":phrase["times"]["begin"]["ts_ref"], "TIME_SLOT_REF2":phrase["times"]["end"]["ts_ref"]})
-
-            # text_aID is the aID that words will refer to
-            text_aID = phrase["alignable_aID"]
-        # for other types (ie targets)
-        elif phrase["phon_tar"] == "Target":
-            new_baseline_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(phrase["ref_aID"]), "ANNOTATION_REF":"a"+str(phrase["ann_ref"])})
-            # text_aID is the aID that words will refer to
-            text_aID = phrase["ref_aID"]
-
-        # create baseline tier element with annotation value and annotation
-        new_baseline_ann_val = ET.Element("ANNOTATION_VALUE")
-        new_baseline_ann_val.text = phrase["full_text"]
-        new_baseline_ann.append(new_baseline_ann_val)
-        baseline_ann.append(new_baseline_ann)
-        baseline_tier = eaf.find(".//TIER[@TIER_ID='{}']".format(base_tier_name))
-        baseline_tier.append(baseline_ann)
+            # associate this word info with the segment number/phrase in the text
+            segment.words = phrase["words"]
+            segments[segnum] = segment
+            profiler.count("words", len(segment.words))
+            profiler.count("morphs", sum(len(word.morphs) for word in segment.words))
+            profiler.progress("Reading phrases", len(segments))
+        flextext_file.close()
+        profiler.count("segments", len(segments))
+        profiler.count("time slots", len(time_slots))
 
-        # create symbolic association annotations for notes, xds, and translations
-        translation_tier_names = ["tns-"+tns_lang for tns_lang in config["translations"]]
-        for content_type in ["notes", "xds"]+translation_tier_names:
-            # looks kind of weird but we're returning the incremented aID_count, since the XML is being edited in place when using the function
-            aID_count = flibl.make_assoc_annotation(phrase["speaker"], content_type, phrase, new_baseline_ann.attrib["ANNOTATION_ID"], aID_count, eaf)
-
-        # create symbolic subdivision annotations for words
-        new_phrase = 1
-        for word in phrase["word_list"]:
-            word_aID = aID_count
+        # Look for els that share aID in a note in the FLExText to associate them in the EAF
+        profiler.begin("pair targets")
+        target_pairs, warnings = flibl.pair_targets(segments)
+        for targ_segnum, phon_segnum in target_pairs.items():
+            targ_phrase = segments[targ_segnum]
+            phon_phrase = segments[phon_segnum]
+            targ_phrase.ann_ref = phon_phrase.alignable_aID
+            targ_phrase.ref_aID = aID_count
+            targ_phrase.speaker = phon_phrase.speaker
             aID_count += 1
-            word_tier = eaf.find(".//TIER[@TIER_ID='{}']".format(base_tier_name + "-words"))
-            # if the annotation being created is not the first in the tier, add a parameter to refer to the previous annotation in the tier (a quirk of ELAN requires this)
-            if new_phrase:
-                new_word_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(word_aID), "ANNOTATION_REF":"a"+str(text_aID)})
-            else:
-                new_word_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(word_aID), "ANNOTATION_REF":"a"+str(text_aID), "PREVIOUS_ANNOTATION":"a"+str(prev_word_aID)})
-            new_phrase = 0
-            
-            # create word tier element with annotation value and annotation
-            new_word_ann_val = ET.Element("ANNOTATION_VALUE")
-            new_word_ann_val.text = word["word_text"]
-            new_word_ann.append(new_word_ann_val)
-            word_ann = ET.Element("ANNOTATION")
-            word_ann.append(new_word_ann)
-            word_tier.append(word_ann)
-            
-            # create symbolic association annotations for pos and gls
-            for content_type in ["pos", "gls"]:
-                aID_count = flibl.make_assoc_annotation(base_tier_name, content_type, word, "a"+str(word_aID), aID_count, eaf)
-            new_word = 1
-            # create symbolic subdivision annotations for words
-            for morph in word["morphs"]:
-                morph_txt_tier = eaf.find(".//TIER[@TIER_ID='{}']".format(base_tier_name + "-morph-txt"))
-                morph_txt_aID = aID_count
-                aID_count += 1
-                # if the annotation being created is not the first in the tier, add a parameter to refer to the previous annotation in the tier
-                if new_word:
-                    new_morph_txt_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(morph_txt_aID), "ANNOTATION_REF":"a"+str(word_aID)})
-                else:
-                    new_morph_txt_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(morph_txt_aID), "ANNOTATION_REF":"a"+str(word_aID), "PREVIOUS_ANNOTATION":"a"+str(prev_morph_txt_aID)})
-                new_word = 0
-
-                # create morph tier element with annotation value and annotation
-                new_morph_txt_ann_val = ET.Element("ANNOTATION_VALUE")
-                new_morph_txt_ann_val.text = morph["txt"]
-                new_morph_txt_ann.append(new_morph_txt_ann_val)
-                morph_txt_ann = ET.Element("ANNOTATION")
-                morph_txt_ann.append(new_morph_txt_ann)
-                morph_txt_tier.append(morph_txt_ann)
-                morph_dict = {"morph-"+i:morph[i] for i in morph if i != "txt"}
-                # create symbolic association annotations morph info types (txt (form in text), cf (citation form), gls (gloss), msa (morph "part of speech", as it were), variantTypes, hn (sense number), morph_type)
-                for morph_type_name in morph_dict.keys():
-                    aID_count = flibl.make_assoc_annotation(base_tier_name, morph_type_name, morph_dict, "a"+str(morph_txt_aID), aID_count, eaf)
+        for warning in warnings:
+            print("Warning: {} in segment {}".format(" ".join(filter(None, [warning["warning"], warning["orig_aID"]])), warning["segnum"]))
+        return segments, target_pairs, warnings, aID_count
+
+    def segment_tier_lists(self, tier_annotations: dict, phrase_tier_prefix: str, base_tier_name: str):
+        """Get the lists of annotations that a segment's annotations go into
+
+        Parameters:
+            tier_annotations: dict of TIER_IDs and the lists of annotations to be added to them
+            phrase_tier_prefix: what the phrase-level association tiers are named after: the speaker code for Phonetic segments, the TIER_ID of the target tier for Targets
+            base_tier_name: the TIER_ID of the segment's baseline tier (phonetic or target), which the other tiers are named after
+
+        Returns a tuple of the lists for the baseline, each phrase-level association (in the order of phrase_content_types), the words, their pos and gls, the morph txt, and each other morph info type (in the order of morph_content_types)
+        """
+        return tuple(
+            [tier_annotations[base_tier_name]]
+            + [tier_annotations[phrase_tier_prefix + "-" + content_type] for content_type in self.phrase_content_types]
+            + [tier_annotations[base_tier_name + "-" + data_type] for data_type in ["words", "pos", "gls", "morph-txt"]]
+            + [tier_annotations[base_tier_name + "-morph-" + morph_type_name] for morph_type_name in self.morph_content_types]
+        )
+
+    def make_segment_annotations(self, phrase: flibl.Segment, text_aID: int, aID: int, tier_lists: tuple):
+        """Make the symbolic annotations of a segment: its notes, xds and translations, and its words with their glossing and morphs
+
+        Parameters:
+            phrase: the Segment
+            text_aID: the number of the ANNOTATION_ID of the segment's baseline annotation
+            aID: the first ID of the segment's block, from flibl.allocate_annotation_ids
+            tier_lists: the lists the annotations go into, from segment_tier_lists
+
+        Makes changes to the lists in place (returns nothing)
+        """
+        n_phrase_types = len(self.phrase_content_types)
+        phrase_lists = tier_lists[1:1 + n_phrase_types]
+
+        # create symbolic association annotations for notes, xds, and translations
+        phrase_content = [phrase.notes, phrase.xds] + [phrase.translations[tns_lang] for tns_lang in self.config["translations"]]
+        for annotations, content in zip(phrase_lists, phrase_content):
+            annotations.append(flibl.make_ref_annotation(aID, text_aID, content))
+            aID += 1
+
+        self.make_word_annotations(phrase.words, text_aID, itertools.count(aID), tier_lists[1 + n_phrase_types:])
+
+    def make_word_annotations(self, words: list, text_aID: int, aIDs, word_lists: tuple):
+        """Make the annotations of a segment's words, with their pos, gls and morphs
+
+        Parameters:
+            words: the segment's Words
+            text_aID: the number of the ANNOTATION_ID of the segment's baseline annotation
+            aIDs: iterator of the annotation ID numbers to use, in the order the annotations are made (each word, its pos and gls, then each of its morphs' txt and other info types)
+            word_lists: the lists the annotations go into: those of segment_tier_lists from the words on
 
+        Makes changes to the lists in place (returns nothing)
+        """
+        word_list, pos_list, gls_list, morph_txt_list = word_lists[:4]
+        morph_lists = word_lists[4:]
+        # create symbolic subdivision annotations for words, each after the first referring to the one before it
+        prev_word_aID = None
+        for word in words:
+            word_aID = next(aIDs)
+            word_list.append(flibl.make_ref_annotation(word_aID, text_aID, word.word_text, prev_word_aID))
+            # create symbolic association annotations for pos and gls
+            pos_list.append(flibl.make_ref_annotation(next(aIDs), word_aID, word.pos))
+            gls_list.append(flibl.make_ref_annotation(next(aIDs), word_aID, word.gls))
+            # create symbolic subdivision annotations for morphs
+            prev_morph_txt_aID = None
+            for morph in word.morphs:
+                morph_txt_aID = next(aIDs)
+                morph_txt_list.append(flibl.make_ref_annotation(morph_txt_aID, word_aID, morph.txt, prev_morph_txt_aID))
+                # create symbolic association annotations morph info types (cf (citation form), gls (gloss), msa (morph "part of speech", as it were), variantTypes, hn (sense number), morph_type)
+                for annotations, morph_type_name in zip(morph_lists, self.morph_content_types):
+                    annotations.append(flibl.make_ref_annotation(next(aIDs), morph_txt_aID, getattr(morph, morph_type_name)))
                 prev_morph_txt_aID = morph_txt_aID
             prev_word_aID = word_aID
-    
-    # add each tier to the EAF
-    for speaker, tiers in tiers_by_speaker.items():
-        for tier in tiers:
-            if not tier in eaf:
-                eaf.append(tier)
-
-    # add the tier types to the new EAF
-    for tier_type in types:
-        eaf.append(types[tier_type])
-        
-    # add the elements defining languages to the new EAF
-    for language in config["languages"]:
-        language_el = ET.Element("LANGUAGE", attrib={"LANG_DEF":language["LANG_DEF"], "LANG_ID":language["LANG_ID"], "LANG_LABEL":language["LANG_LABEL"]})
-        eaf.append(language_el)
-    for language_el in orig.findall(".//LANGUAGE"):
-        eaf.append(language_el)
-    
-    # add the constraints (identical to those of the original EAF) to the new EAF
-    for constraint in orig.findall(".//CONSTRAINT"):
-        eaf.append(constraint)
-
-    # add the controlled vocabulary (identical to those of the original EAF) to the new EAF
-    for cv in orig.findall(".//CONTROLLED_VOCABULARY"):
-        eaf.append(cv)
-    
-    # note the final aID used (ELAN requires this)
-    eaf.find(".//PROPERTY[@NAME='lastUsedAnnotationId']").text = str(aID_count - 1)
-
-    # name the file using the current time and date
-    now = str(datetime.now()).split(" ")
-    time = now[1].split(":")
-    date_time = now[0].replace("-", "_") + "-{}_{}".format(time[0], time[1])
-    ET.indent(eaf, space="\t", level=0)
-    eaf_tree.write(text["flextext"][:-9] + "-flex_export-" + date_time + ".eaf", encoding="unicode")
-    # write a JSON as well
-    if args.export_json:
-        json.dump(concatenated, open(text["flextext"][:-9] + "-flex_export-" + date_time + ".json", mode="w", encoding="utf8"), indent=1)
\ No newline at end of file
+
+    def previous_eaf(self, text: dict):
+        """Get the EAF to update for a text: its "previous_eaf" in the config if it has one, and otherwise the EAF most recently made from its FLExText"""
+        if "previous_eaf" in text:
+            return text["previous_eaf"]
+        made = glob.glob(glob.escape(text["flextext"][:-9]) + "-flex_export-*.eaf")
+        if not made:
+            raise FileNotFoundError("There is no EAF made from {} to update".format(text["flextext"]))
+        return max(made, key=os.path.getmtime)
+
+    def update(self, text: dict, profiler: flibl.Profiler = None, files: flibl.FileAccess = None):
+        """Bring the EAF made from a FLExText before up to date with the glossing in the FLExText now, in place
+
+        Segments are found in the EAF by their speaker and times, with Targets found through the Phonetic segment with the same orig_aID.
+        Only the words, pos, gls and morphs of segments whose glossing changed are made again, reusing their annotation IDs (new IDs are only needed if there are more annotations than before), and their text on the phonetic or target tier is made again from the words; everything else in the EAF, including the time slots, is kept as it was.
+        Segments that aren't found in the EAF are listed in a warning, and if two utterances of the same speaker have the same times (in the EAF or the FLExText), nothing is updated.
+        The EAF as it was is kept as a .bak file next to it.
+
+        Parameters:
+            text: dict with the paths of the "original_eaf" and the "flextext", as listed in the config, and optionally the "previous_eaf" to update (see previous_eaf)
+            profiler: a Profiler to record the stages and counts of the update in
+            files: the FileAccess to read the files and write the EAF with (straight to disk if None)
+
+        Returns a list with the path of the EAF updated, and raises ValueError if two utterances of the same speaker have the same times
+        """
+        config = self.config
+        if profiler is None:
+            profiler = flibl.Profiler()
+        if files is None:
+            files = flibl.FileAccess()
+        eaf_file = self.previous_eaf(text)
+        profiler.begin("parse previous EAF")
+        # The new annotations are made with ElementTree, so the EAF they go into has to be parsed with it too
+        with files.open_input(eaf_file) as previous:
+            eaf = ET.parse(previous).getroot()
+        times = flibl.time_values(eaf)
+        tier_graph = flibl.TierGraph(eaf)
+        # The EAF keeps its own time slots, so the ones made while reading aren't used
+        segments, target_pairs, warnings, aID_count = self.read_segments(text, ET.Element("TIME_ORDER"), {}, profiler, files)
+
+        profiler.begin("match segments")
+        # The Phonetic baseline annotations by speaker and times, and the Target baseline annotations by the ANNOTATION_ID of the Phonetic ones they refer to
+        phonetic_annotations = {}
+        target_annotations = {}
+        # Segments are matched by speaker and times alone, so if two in the EAF (or two in the FLExText) have the same ones, there's no telling which glossing goes where
+        duplicates = []
+        for speaker in {segment.speaker for segment in segments.values()}:
+            base_tier_name = speaker + "-" + config["language"] + "-"
+            for annotation in tier_graph.by_id.get(base_tier_name + "phonetic", []):
+                key = (speaker, times[annotation[0].attrib["TIME_SLOT_REF1"]], times[annotation[0].attrib["TIME_SLOT_REF2"]])
+                if key in phonetic_annotations:
+                    duplicates.append("{} and {} in {}".format(phonetic_annotations[key].attrib["ANNOTATION_ID"], annotation[0].attrib["ANNOTATION_ID"], eaf_file))
+                phonetic_annotations[key] = annotation[0]
+            for annotation in tier_graph.by_id.get(base_tier_name + "target", []):
+                target_annotations[annotation[0].attrib["ANNOTATION_REF"]] = annotation[0]
+        segnums_by_key = {}
+        for segnum, segment in segments.items():
+            if segment.phon_tar == "Phonetic":
+                key = (segment.speaker, segment.begin, segment.end)
+                if key in segnums_by_key:
+                    duplicates.append("segments {} and {} in {}".format(segnums_by_key[key], segnum, text["flextext"]))
+                segnums_by_key[key] = segnum
+        if duplicates:
+            raise ValueError("Can't update {}, as some utterances have the same speaker and times: {}".format(eaf_file, "; ".join(duplicates)))
+        targets_by_phonetic = {phon_segnum:targ_segnum for targ_segnum, phon_segnum in target_pairs.items()}
+        # (segment, TIER_ID of its baseline, its baseline annotation) for each segment found
+        found = []
+        not_found = []
+        for segnum, segment in segments.items():
+            if segment.phon_tar != "Phonetic":
+                continue
+            phonetic_annotation = phonetic_annotations.get((segment.speaker, segment.begin, segment.end))
+            if phonetic_annotation is None:
+                not_found.append(segnum)
+                continue
+            found.append((segment, segment.speaker + "-" + config["language"] + "-phonetic", phonetic_annotation))
+            target_annotation = target_annotations.get(phonetic_annotation.attrib["ANNOTATION_ID"])
+            if segnum in targets_by_phonetic and target_annotation is not None:
+                found.append((segments[targets_by_phonetic[segnum]], segment.speaker + "-" + config["language"] + "-target", target_annotation))
+        if not_found:
+            profiler.count("segments not found", len(not_found))
+            print("Warning: {} segments of {} not found in {} by speaker and times, so left as they were: {}".format(len(not_found), text["flextext"], eaf_file, ", ".join(not_found)))
+
+        profiler.begin("update annotations")
+        last_aID_property = eaf[0].find(".//PROPERTY[@NAME='lastUsedAnnotationId']")
+        new_aIDs = itertools.count(int(last_aID_property.text) + 1)
+        # The annotations of each word-level tier by the annotation they refer to, worked out the first time the tier is needed
+        references = {}
+        # The ids of the annotations being replaced, and for each tier, the new annotations with the old annotation they go in place of (None to add them at the end)
+        replaced = set()
+        patches = {}
+        for segment, base_tier_name, baseline_annotation in found:
+            baseline_aID = baseline_annotation.attrib["ANNOTATION_ID"]
+            # the utterance's text is made from its words, so it changes along with them
+            text_changed = (baseline_annotation[0].text or "") != segment.full_text
+            if text_changed:
+                baseline_annotation[0].text = segment.full_text
+            tier_ids = [base_tier_name + "-" + data_type for data_type in ["words", "pos", "gls", "morph-txt"]] + [base_tier_name + "-morph-" + morph_type_name for morph_type_name in self.morph_content_types]
+            for tier_id in tier_ids:
+                if tier_id not in references:
+                    references[tier_id] = {}
+                    for annotation in tier_graph.by_id[tier_id]:
+                        references[tier_id].setdefault(annotation[0].attrib["ANNOTATION_REF"], []).append(annotation)
+            old_values, old_annotations = self.word_annotation_values([references[tier_id] for tier_id in tier_ids], baseline_aID)
+            new_values = [(word.word_text or "", word.pos or "", word.gls or "", [tuple(getattr(morph, key) or "" for key in ["txt"] + self.morph_content_types) for morph in word.morphs]) for word in segment.words]
+            if new_values == old_values:
+                profiler.count("segments with only their text updated" if text_changed else "segments unchanged")
+                continue
+            profiler.count("segments updated")
+            # the old annotations' IDs are used again in the order they were made, and new ones only once they run out
+            old_aIDs = [int(annotation[0].attrib["ANNOTATION_ID"][1:]) for n, annotation in old_annotations]
+            word_lists = tuple([] for tier_id in tier_ids)
+            self.make_word_annotations(segment.words, int(baseline_aID[1:]), itertools.chain(old_aIDs, new_aIDs), word_lists)
+            first_replaced = {}
+            for n, annotation in old_annotations:
+                replaced.add(id(annotation))
+                first_replaced.setdefault(n, annotation)
+            for n, tier_id in enumerate(tier_ids):
+                patches.setdefault(tier_id, []).append((first_replaced.get(n), word_lists[n]))
+        # Put each changed tier back together, with the new annotations where the old ones were
+        for tier_id, tier_patches in patches.items():
+            tier = tier_graph.by_id[tier_id]
+            in_place_of = {id(old):new for old, new in tier_patches if old is not None}
+            annotations = []
+            for annotation in tier:
+                annotations.extend(in_place_of.get(id(annotation), []))
+                if id(annotation) not in replaced:
+                    annotations.append(annotation)
+            for old, new in tier_patches:
+                if old is None:
+                    annotations.extend(new)
+            tier[:] = annotations
+        last_aID_property.text = str(next(new_aIDs) - 1)
+        if warnings:
+            profiler.count("pairing warnings", len(warnings))
+
+        profiler.begin("write EAF")
+        # keep the EAF as it was, in case
+        shutil.copyfile(eaf_file, eaf_file + ".bak")
+        with flibl.EafWriter(eaf_file, eaf.attrib, files) as writer:
+            for el in eaf:
+                writer.write(el)
+        profiler.end()
+        return [eaf_file]
+
+    def word_annotation_values(self, references: list, baseline_aID: str):
+        """Get the values of the words, pos, gls and morphs of a segment as they are in an EAF
+
+        Parameters:
+            references: for each of the word-level tiers (in the order of segment_tier_lists), a dict of ANNOTATION_IDs and the list of annotations referring to them
+            baseline_aID: the ANNOTATION_ID of the segment's baseline annotation
+
+        Returns the values, laid out as (word text, pos, gls, [(morph txt, each other morph info type), ...]) for each word, and the list of annotations they came from, as (index of the tier in references, ANNOTATION element), in the order make_word_annotations would make them
+        """
+        word_references, pos_references, gls_references, morph_txt_references = references[:4]
+        morph_references = references[4:]
+        values = []
+        annotations = []
+        for word_annotation in word_references.get(baseline_aID, []):
+            word_aID = word_annotation[0].attrib["ANNOTATION_ID"]
+            annotations.append((0, word_annotation))
+            word_values = [word_annotation[0][0].text or ""]
+            for n, associations in [(1, pos_references), (2, gls_references)]:
+                association = associations.get(word_aID, [])
+                annotations.extend((n, annotation) for annotation in association)
+                word_values.append(association[0][0][0].text or "" if association else "")
+            morphs = []
+            for morph_annotation in morph_txt_references.get(word_aID, []):
+                morph_aID = morph_annotation[0].attrib["ANNOTATION_ID"]
+                annotations.append((3, morph_annotation))
+                morph_values = [morph_annotation[0][0].text or ""]
+                for n, associations in enumerate(morph_references):
+                    association = associations.get(morph_aID, [])
+                    annotations.extend((4 + n, annotation) for annotation in association)
+                    morph_values.append(association[0][0][0].text or "" if association else "")
+                morphs.append(tuple(morph_values))
+            values.append((word_values[0], word_values[1], word_values[2], morphs))
+        return values, annotations
+
+    def update_many(self, texts: list, jobs: int = 1, trace_memory: bool = False, pipeline: bool = False, validate: bool = False):
+        """Update the EAFs made from a list of texts before (see update), one per worker process if jobs is more than 1
+
+        Parameters:
+            texts: dicts with the paths of the "original_eaf" and the "flextext", as listed in the config
+            jobs, trace_memory, pipeline, validate: see flibl.convert_batch
+
+        Returns a list of results (see flibl.convert_file), in the same order as texts
+        """
+        # an update changes its own input, so there's nothing for the cache to go by
+        return flibl.convert_batch(self.update, texts, jobs, input_files=self.input_files, trace_memory=trace_memory, pipeline=pipeline, validate=validate)
+
+    def convert_many(self, texts: list, jobs: int = 1, cache: flibl.ConversionCache = None, trace_memory: bool = False, pipeline: bool = False, validate: bool = False):
+        """Make EAFs for a list of texts, one per worker process if jobs is more than 1
+
+        Parameters:
+            texts: dicts with the paths of the "original_eaf" and the "flextext", as listed in the config
+            jobs, cache, trace_memory, pipeline, validate: see flibl.convert_batch
+
+        Returns a list of results (see flibl.convert_file), in the same order as texts
+        """
+        return flibl.convert_batch(self.convert, texts, jobs, cache=cache, input_files=self.input_files, settings=self.settings, trace_memory=trace_memory, pipeline=pipeline, validate=validate)
+
+    def watch(self, texts: list, cache: flibl.ConversionCache = None, trace_memory: bool = False, validate: bool = False):
+        """Make the EAF from each of a list of texts again whenever its FLExText or original EAF changes, until interrupted
+
+        Parameters:
+            texts: dicts with the paths of the "original_eaf" and the "flextext", as listed in the config
+            cache, trace_memory, validate: see flibl.convert_batch
+
+        Returns a list of the results of every conversion made (see flibl.convert_file)
+        """
+        return watching.watch(self.convert, texts, self.input_files, label=lambda text: text["flextext"], cache=cache, settings=self.settings, trace_memory=trace_memory, validate=validate)
+
+    def summarize(self, results: list):
+        """Work out the corpus statistics of a batch of texts converted with stats on
+
+        Parameters:
+            results: as returned by convert_many
+
+        Returns a list of rows (see corpus_stats.summarize_counts) for all the texts that were converted (or skipped as unchanged) together
+        """
+        counts = []
+        for result in results:
+            if result["status"] != "error":
+                counts.extend(corpus_stats.load_counts(output) for output in result["outputs"] if output.endswith(".stats.npz"))
+        return corpus_stats.summarize_counts(counts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j", "--json", dest="export_json", help="Export as JSON as well", action="store_true")
+    parser.add_argument("--sqlite", metavar="FILE", help="Store the segments, words and morphs of each text in the SQLite database FILE as well (replacing what was stored for the same FLExText before)")
+    parser.add_argument("--stats", metavar="FILE", help="Work out utterance counts, MLU in words and morphs, and how many utterances have targets, per speaker and xds over all the texts, print them, and save them to FILE as a TSV (needs numpy)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of files to convert at the same time, each in its own process")
+    parser.add_argument("--pipeline", help="Read the next text and write the last one in the background while converting, to hide slow (e.g. network) storage; for one text at a time, without --jobs", action="store_true")
+    parser.add_argument("--no-cache", dest="use_cache", help="Convert every file, even if it hasn't changed since it was last converted", action="store_false")
+    parser.add_argument("--cache-dir", default=".flibl_cache", help="Where to keep track of past conversions")
+    parser.add_argument("--cache-max-age", type=float, default=30, help="Days after which an unused past conversion is forgotten")
+    parser.add_argument("--cache-max-size", type=float, default=1000, help="Size in MB that copies of past conversions are kept under")
+    parser.add_argument("--from", dest="start", type=int, metavar="MS", help="Only convert the segments that end after this time (in milliseconds)")
+    parser.add_argument("--to", dest="stop", type=int, metavar="MS", help="Only convert the segments that begin before this time (in milliseconds)")
+    parser.add_argument("--xml", choices=flibl.xml_backends, default="stdlib", help="What to read the original EAF and the FLExText with: Python's own ElementTree (stdlib), lxml (faster, if installed), or lxml if it's installed and ElementTree if not (auto)")
+    parser.add_argument("--update", help="Instead of making new EAFs, bring the EAF made from each FLExText before up to date with its glossing, rewriting only the words, pos, gls and morphs of the segments that changed", action="store_true")
+    parser.add_argument("--watch", help="After converting, keep running and convert each text again whenever its FLExText (or original EAF) is saved (Ctrl+C to stop)", action="store_true")
+    parser.add_argument("--validate", help="Check the structure of each EAF made (annotation IDs and references, PREVIOUS_ANNOTATION chains, time slots, lastUsedAnnotationId), and count it as failed if there are problems, listing them", action="store_true")
+    parser.add_argument("--profile", metavar="FILE", help="Write a JSON report of how long each stage of each conversion took and how much it made")
+    parser.add_argument("--profile-memory", help="With --profile, also measure the most memory each stage used (this makes the conversion, and the times in the report, a lot slower)", action="store_true")
+    args = parser.parse_args()
+    # measuring memory slows everything down, so it's only done when asked for on its own
+    trace_memory = bool(args.profile) and args.profile_memory
+    config = json.load(open('to_eaf_config.json'))
+    time_range = None if args.start is None and args.stop is None else (args.start, args.stop)
+    # FLExTexts read before are kept (in a compact form) alongside the past conversions, for when the config changes but they haven't
+    phrase_cache = flibl.PhraseCache(os.path.join(args.cache_dir, "phrases")) if args.use_cache else None
+    database = corpus_database.CorpusDatabase(args.sqlite) if args.sqlite else None
+    converter = EafConverter(config, args.export_json, time_range, args.xml, phrase_cache, database, bool(args.stats))
+    cache = flibl.ConversionCache(args.cache_dir, args.cache_max_age, args.cache_max_size) if args.use_cache else None
+    if args.update:
+        results = converter.update_many(config["eafs_flextexts"], args.jobs, trace_memory=trace_memory, pipeline=args.pipeline, validate=args.validate)
+    else:
+        results = converter.convert_many(config["eafs_flextexts"], args.jobs, cache, trace_memory=trace_memory, pipeline=args.pipeline, validate=args.validate)
+        if args.watch:
+            flibl.print_summary(results, label=lambda text: text["flextext"])
+            results += converter.watch(config["eafs_flextexts"], cache, trace_memory=trace_memory, validate=args.validate)
+    if args.profile:
+        with open(args.profile, "w", encoding="utf8") as profile_file:
+            json.dump(results, profile_file, indent=1)
+    if args.stats:
+        stats = converter.summarize(results)
+        print("\n" + corpus_stats.format_stats(stats))
+        with open(args.stats, "w", encoding="utf8") as stats_file:
+            stats_file.write(corpus_stats.format_stats(stats, separator="\t"))
+    if not flibl.print_summary(results, label=lambda text: text["flextext"]):
+        raise SystemExit(1)
\ No newline at end of file
@@ -1,42 +1,223 @@
 # v12
-from typing import List
-from uuid import uuid4
+from typing import List, Tuple
+from collections import OrderedDict
+from uuid import uuid4, uuid5, NAMESPACE_URL
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 import xml.etree.ElementTree as ET
+import hashlib
+import io
 import json
+import os
 import re
+import shutil
+import sys
+import time
+import traceback
+import types
+import tracemalloc
+# lxml is optional: if it's installed, it can be used (through LxmlXml) to parse and write faster
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
 
-config = json.load(open("to_flextext_config.json"))
+# The types of item that FLEx gives for each morph
+morph_keys = ["txt", "cf", "gls", "msa", "variantTypes", "hn", "morph_type"]
 
-# Using the definitions from the config file, make dict of language-charset pairs.
-word_forming = {
-    config["languages"]["main_language"]: re.compile("([^" + config["valid_characters"]["main_language"] + "])"),
-    config["languages"]["child_language"]: re.compile("([^" + config["valid_characters"]["child_language"] + "])")
-}
+class StdlibXml:
+    """The XML operations the scripts use, done with Python's own xml.etree.ElementTree
 
-def tokenize(phrase: str, lg: str):
-    """Tokenize an utterance based on specified word-forming characters.
+    Elements made or parsed by one backend should only be put in trees of the same backend.
+    """
+    name = "stdlib"
+
+    def element(self, tag: str, attrib: dict = None):
+        """Returns a new element"""
+        return ET.Element(tag, attrib={} if attrib is None else attrib)
+
+    def tree(self, root):
+        """Returns an ElementTree for writing the document root is the root of"""
+        return ET.ElementTree(root)
+
+    def parse(self, source):
+        """Parse a document from a path or binary file object and return its root element"""
+        return ET.parse(source).getroot()
+
+    def iterparse(self, source, events: tuple = ("end",)):
+        """Parse a document incrementally, yielding (event, element) pairs as ET.iterparse does"""
+        return ET.iterparse(source, events=events)
+
+    def findall(self, el, path: str):
+        """Returns the list of elements under el matching an ElementPath expression (such as ".//TIER")"""
+        return el.findall(path)
+
+    def indent(self, tree, space: str = "\t"):
+        """Indent a tree in place, for pretty printing"""
+        ET.indent(tree, space=space, level=0)
+
+    def write(self, tree, file):
+        """Write a tree to a binary file object, ASCII-encoded with character references and without an XML declaration"""
+        tree.write(file)
+
+class LxmlXml(StdlibXml):
+    """The XML operations the scripts use, done with lxml, which parses, searches and writes in C
+
+    The output is the same XML as with StdlibXml, except that empty elements are written as <tag/> rather than <tag />.
+    """
+    name = "lxml"
+    # compiled XPath expressions, by path
+    compiled_paths = {}
+
+    def __init__(self):
+        if lxml_etree is None:
+            raise ImportError("The lxml XML backend needs lxml to be installed (pip install lxml)")
+
+    def element(self, tag: str, attrib: dict = None):
+        return lxml_etree.Element(tag, attrib={} if attrib is None else attrib)
+
+    def tree(self, root):
+        return lxml_etree.ElementTree(root)
+
+    def parse(self, source):
+        # huge_tree lifts libxml2's limits on text size and depth, which long recordings can run into
+        # Comments and processing instructions are dropped, as ElementTree does, since the scripts take every child to be an element (e.g. the HEADER's MEDIA_DESCRIPTOR)
+        return lxml_etree.parse(source, lxml_etree.XMLParser(huge_tree=True, remove_comments=True, remove_pis=True)).getroot()
+
+    def iterparse(self, source, events: tuple = ("end",)):
+        return lxml_etree.iterparse(source, events=events, huge_tree=True, remove_comments=True, remove_pis=True)
+
+    def findall(self, el, path: str):
+        # The ElementPath expressions the scripts use are valid XPath too
+        if path not in self.compiled_paths:
+            self.compiled_paths[path] = lxml_etree.XPath(path)
+        return self.compiled_paths[path](el)
+
+    def indent(self, tree, space: str = "\t"):
+        lxml_etree.indent(tree, space=space, level=0)
+
+    def write(self, tree, file):
+        tree.write(file)
+
+# The XML backends to choose from: "auto" is lxml if it's installed, and the stdlib otherwise
+xml_backends = ["stdlib", "lxml", "auto"]
+
+def make_xml(backend: str = "stdlib"):
+    """Get an XML backend
 
     Parameters:
-        phrase: the string to be tokenized
-        lg: the language whose word-forming characters are to be used in tokenization
-    
-    Return list of tokens
+        backend: one of xml_backends
+
+    Returns a StdlibXml or LxmlXml
     """
-    if phrase:
-        tokens = [j for j in [i.strip() for i in word_forming[lg].split(phrase)] if j]
-        collected_tokens = []
+    if backend == "auto":
+        backend = "stdlib" if lxml_etree is None else "lxml"
+    if backend == "lxml":
+        return LxmlXml()
+    if backend == "stdlib":
+        return StdlibXml()
+    raise ValueError("Unknown XML backend {}, should be one of {}".format(backend, ", ".join(xml_backends)))
+
+def make_word_forming(config: dict):
+    """Compile the patterns for the characters that are not word-forming in each language
+
+    Parameters:
+        config: the parsed to_flextext_config.json
+
+    Returns a dict of language code and compiled pattern pairs
+    """
+    return {
+        config["languages"]["main_language"]: re.compile("([^" + config["valid_characters"]["main_language"] + "])"),
+        config["languages"]["child_language"]: re.compile("([^" + config["valid_characters"]["child_language"] + "])")
+    }
+
+class Tokenizer:
+    """Split utterances into words and punctuation by the word-forming characters of a language, in one scan per utterance
+
+    Utterances that come up again (as they often do in child speech) are served from a cache of the most recently used ones.
+    """
+    def __init__(self, word_forming: re.Pattern, cache_size: int = 4096):
+        """
+        Parameters:
+            word_forming: the compiled pattern (from make_word_forming) of the non-word-forming characters of the language
+            cache_size: how many utterances to remember the tokens of (0 to not remember any)
+        """
+        self.word_forming = word_forming
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def pieces(self, phrase: str):
+        """Yield each run of word-forming characters and each character between them, stripped of whitespace, with its kind ("txt" or "punct")"""
+        position = 0
+        for match in self.word_forming.finditer(phrase):
+            yield phrase[position:match.start()].strip(), "txt"
+            yield match.group().strip(), "punct"
+            position = match.end()
+        yield phrase[position:].strip(), "txt"
+
+    def scan(self, phrase: str):
+        """Tokenize an utterance, without the cache
+
+        Returns a tuple of (token, kind) pairs
+        """
+        tokens = []
         punct_chars = ""
-        for token in tokens:
+        for token, kind in self.pieces(phrase):
+            if not token:
+                continue
+            # periods are gathered up and put before the next token (as in " ..."); any at the very end are left out
             if token == ".":
                 punct_chars += token
             else:
                 if punct_chars:
-                    collected_tokens.append(" " + punct_chars)
+                    punct = " " + punct_chars
+                    tokens.append((punct, "punct" if self.word_forming.search(punct) else "txt"))
                     punct_chars = ""
-                collected_tokens.append(token)
-        return collected_tokens
-    else:
-        return []
+                tokens.append((token, kind))
+        return tuple(tokens)
+
+    def tokenize(self, phrase: str):
+        """Tokenize an utterance based on the word-forming characters
+
+        Parameters:
+            phrase: the string to be tokenized
+
+        Returns a tuple of (token, kind) pairs, where kind is "txt" for words and "punct" for anything with non-word-forming characters
+        """
+        if not phrase:
+            return ()
+        tokens = self.cache.get(phrase)
+        if tokens is not None:
+            self.cache.move_to_end(phrase)
+            return tokens
+        tokens = self.scan(phrase)
+        if self.cache_size:
+            self.cache[phrase] = tokens
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tokens
+
+    def tokenize_many(self, phrases: List[str]):
+        """Tokenize a list of utterances, scanning each distinct one only once
+
+        Returns a list with the tuple of (token, kind) pairs for each utterance
+        """
+        batch = {}
+        for phrase in phrases:
+            if phrase not in batch:
+                batch[phrase] = self.tokenize(phrase)
+        return [batch[phrase] for phrase in phrases]
+
+def tokenize(phrase: str, word_forming: re.Pattern):
+    """Tokenize an utterance based on specified word-forming characters.
+
+    Parameters:
+        phrase: the string to be tokenized
+        word_forming: the compiled pattern (from make_word_forming) of the non-word-forming characters of the utterance's language
+    
+    Return list of tokens
+    """
+    return [token for token, kind in Tokenizer(word_forming, 0).tokenize(phrase)]
 
 def print_el_info(el: ET.Element):
     """Print the tag, attributes, text, and number of children of an ET.Element
@@ -58,31 +239,148 @@ def time_values(eaf_root: ET.Element):
         for i in eaf_root.findall(".//TIME_SLOT")
         }
 
-def add_word_el(tokenized_utt: List[str], phrase_el: ET.Element, lg: str):
+def overlaps(begin: int, end: int, time_range: tuple):
+    """Check whether a stretch of time overlaps a time range
+
+    Parameters:
+        begin, end: the stretch of time, in milliseconds
+        time_range: (start, stop) in milliseconds; either can be None to leave that end open
+
+    Returns True if some of the stretch falls inside the range
+    """
+    start, stop = time_range
+    return (stop is None or begin < stop) and (start is None or end > start)
+
+def time_range_name(time_range: tuple):
+    """Get the part of an output file name that says which time range of the input it covers
+
+    Parameters:
+        time_range: (start, stop) in milliseconds, either of which can be None, or None for the whole file
+
+    Returns a string like "-60000_120000ms" ("" for the whole file)
+    """
+    if time_range is None:
+        return ""
+    start, stop = time_range
+    return "-{}_{}ms".format("start" if start is None else start, "end" if stop is None else stop)
+
+class GuidMaker:
+    """Make the GUIDs for the elements of a FLExText
+
+    The strategy is one of
+        "random": a new random GUID every time, so every run gives a different file
+        "uuid5": derived (as a namespaced uuid5) from the source file and where the element comes from, e.g. the annotation ID and token index
+        "counter": counting up from a GUID derived from the source file, in the order the elements are made
+    With "uuid5" or "counter", converting the same file the same way always gives the same GUIDs.
+    """
+    strategies = ["random", "uuid5", "counter"]
+
+    def __init__(self, strategy: str = "random", source: str = ""):
+        """
+        Parameters:
+            strategy: one of GuidMaker.strategies
+            source: the name of the file being converted, to derive GUIDs from
+        """
+        if strategy not in self.strategies:
+            raise ValueError("Unknown GUID strategy {}, expected one of {}".format(strategy, ", ".join(self.strategies)))
+        self.strategy = strategy
+        self.namespace = uuid5(NAMESPACE_URL, "flibl:" + source)
+        # the counter takes the place of the last 12 hex digits
+        self.prefix = str(self.namespace)[:24]
+        self.count = 0
+
+    @property
+    def deterministic(self):
+        """Whether the same input always gets the same GUIDs"""
+        return self.strategy != "random"
+
+    def guid(self, *key):
+        """Make a GUID for an element
+
+        Parameters:
+            key: what identifies the element within the source file, e.g. ("word", annotation ID, token index); only used by "uuid5"
+
+        Returns the GUID as a string
+        """
+        if self.strategy == "random":
+            return str(uuid4())
+        if self.strategy == "uuid5":
+            return str(uuid5(self.namespace, "/".join(str(i) for i in key)))
+        self.count += 1
+        return self.prefix + "{:012x}".format(self.count)
+
+def add_word_el(tokenized_utt: List[Tuple[str, str]], phrase_el: ET.Element, lg: str, guids: GuidMaker = None, key: tuple = ()):
     """Populate a phrase element with a tokenized utterance
     
     Parameters:
-        tokenized_utt: a list with tokens from an utterance
+        tokenized_utt: the (token, kind) pairs of an utterance, as given by Tokenizer.tokenize
         phrase_el: the element that will be the parent to the words added (below the words el in the phrase_el will be the items w/ translations and notes)
-        lg: the language whose word-forming characters are to be used in tokenization
+        lg: the language of the utterance
+        guids: the GuidMaker for the words' GUIDs (None for random ones)
+        key: what identifies the phrase to the GuidMaker; each word's key is this plus the token index
     
     Makes changes in place (returns nothing)
     """
-    words = ET.Element("words")
-    utterance_word_forming = word_forming[lg]
-    for token in tokenized_utt:
-        word = ET.Element("word", attrib={"guid":str(uuid4())})
-        if utterance_word_forming.search(token):
-            type = "punct"
-        else:
-            type = "txt"
-        token_el = ET.Element("item", attrib={"type": type, "lang": lg})
+    # made with makeelement, so they're the same kind of element as phrase_el whichever XML backend made it
+    words = phrase_el.makeelement("words", {})
+    for n, (token, kind) in enumerate(tokenized_utt):
+        word = phrase_el.makeelement("word", {"guid":guids.guid("word", *key, n) if guids is not None else str(uuid4())})
+        token_el = phrase_el.makeelement("item", {"type": kind, "lang": lg})
 
         token_el.text = token
         word.append(token_el)
         words.append(word)
     phrase_el.append(words)
 
+class TierGraph:
+    """The tiers of an EAF, looked up by TIER_ID, by parent and by linguistic type, all worked out in one pass over the document"""
+    def __init__(self, eaf: ET.Element):
+        """
+        Parameters:
+            eaf: the root element of an EAF file
+        """
+        self.eaf = eaf
+        # the TIER elements, in document order
+        self.tiers = []
+        self.by_id = {}
+        self.by_parent = {}
+        self.by_type = {}
+        # the CONSTRAINTS of each LINGUISTIC_TYPE_ID that has one
+        self.type_constraints = {}
+        for el in eaf:
+            if el.tag == "TIER":
+                self.tiers.append(el)
+                self.by_id[el.attrib["TIER_ID"]] = el
+                if "PARENT_REF" in el.attrib:
+                    self.by_parent.setdefault(el.attrib["PARENT_REF"], []).append(el)
+                self.by_type.setdefault(el.attrib.get("LINGUISTIC_TYPE_REF"), []).append(el)
+            elif el.tag == "LINGUISTIC_TYPE" and "CONSTRAINTS" in el.attrib:
+                self.type_constraints[el.attrib["LINGUISTIC_TYPE_ID"]] = el.attrib["CONSTRAINTS"]
+
+    def of_type(self, tier_type: str):
+        """Returns the list of tiers of a linguistic type, in document order"""
+        return self.by_type.get(tier_type, [])
+
+    def children(self, tier_id: str):
+        """Returns the list of tiers whose parent is the tier with TIER_ID tier_id, in document order"""
+        return self.by_parent.get(tier_id, [])
+
+    def remove_constraint(self, constraint: str):
+        """Remove the tiers whose linguistic types use a given stereotype constraint (such as "Included_In") from the EAF and the graph
+
+        Makes changes to the EAF in place (returns nothing)
+        """
+        removed = set()
+        for tier_type, type_constraint in self.type_constraints.items():
+            if type_constraint == constraint:
+                removed.update(id(tier) for tier in self.by_type.pop(tier_type, []))
+        if not removed:
+            return
+        self.eaf[:] = [el for el in self.eaf if id(el) not in removed]
+        self.tiers = [tier for tier in self.tiers if id(tier) not in removed]
+        self.by_id = {tier_id:tier for tier_id, tier in self.by_id.items() if id(tier) not in removed}
+        self.by_parent = {parent:[tier for tier in tiers if id(tier) not in removed] for parent, tiers in self.by_parent.items()}
+
 def remove_constraint(constraint: str, eaf: ET.Element):
     """Remove the tiers that use the "Included In" stereotype constraint
 
@@ -91,31 +389,421 @@ def remove_constraint(constraint: str, eaf: ET.Element):
     
     Makes changes in place (returns nothing)    
     """
-    for constraint_tier in eaf.findall(".//*[@CONSTRAINTS='{}']".format(constraint)):
-        for bad_tier in eaf.findall(".//*[@LINGUISTIC_TYPE_REF='{}']".format(constraint_tier.attrib["LINGUISTIC_TYPE_ID"])):
-            eaf.remove(bad_tier)
+    TierGraph(eaf).remove_constraint(constraint)
 
-def make_times(flextext: ET.Element):
-    """Make the TIME_ORDER element for the output EAF
+def make_time_slot(value: str, time_order: ET.Element, time_slots: dict):
+    """Get the TIME_SLOT_ID for a time value, making a new TIME_SLOT if the value doesn't have one yet
 
     Parameters:
-        flextext: the root of the parsed flextext exported from FLEx
+        value: the time value (in milliseconds) from the flextext
+        time_order: the TIME_ORDER element of the output EAF
+        time_slots: dict of TIME_VALUE and TIME_SLOT_ID pairs already in time_order
 
-    Returns an ET.Element of TIME_ORDER
+    Returns the TIME_SLOT_ID; makes changes to time_order and time_slots in place
     """
-    phrases = flextext.findall(".//*phrase")
-    time_order = ET.Element("TIME_ORDER")
-    tsN = 1
-    for i in phrases:
+    if value not in time_slots:
+        time_slots[value] = "ts" + str(len(time_slots) + 1)
+        time_order.append(ET.Element("TIME_SLOT", attrib={"TIME_SLOT_ID":time_slots[value], "TIME_VALUE":value}))
+    return time_slots[value]
+
+class Morph:
+    """A morph of a word, with the items FLEx gives for it"""
+    __slots__ = ["morph_type", "txt", "cf", "gls", "msa", "variantTypes", "hn"]
+
+    def __init__(self, morph_type: str = ""):
+        self.morph_type = morph_type
+        self.txt = self.cf = self.gls = self.msa = self.variantTypes = self.hn = ""
+
+    def to_json(self):
+        """Returns a dict of the morph's items, for json.dump"""
+        return {key:getattr(self, key) for key in self.__slots__}
+
+class Word:
+    """A word of a segment, with its glossing and morphs"""
+    __slots__ = ["word_text", "lang", "pos", "gls", "morphs"]
+
+    def __init__(self, word_text: str = "", lang: str = None, pos: str = "", gls: str = "", morphs: list = None):
+        self.word_text = word_text
+        self.lang = lang
+        self.pos = pos
+        self.gls = gls
+        self.morphs = morphs if morphs is not None else []
+
+    def to_json(self):
+        """Returns a dict of the word's text, pos, gls and morphs, for json.dump"""
+        return {"word_text":self.word_text, "pos":self.pos, "gls":self.gls, "morphs":self.morphs}
+
+class Segment:
+    """A segment (utterance) of a text going to ELAN, with its times, notes, translations, and words"""
+    __slots__ = ["segnum", "full_text", "begin", "end", "begin_ts", "end_ts", "translations", "alignable_aID", "phon_tar", "orig_aID", "speaker", "xds", "notes", "words", "ann_ref", "ref_aID"]
+
+    def __init__(self, segnum: str):
+        self.segnum = segnum
+        self.full_text = ""
+        self.begin = self.end = self.begin_ts = self.end_ts = None
+        # dict of translation language and translation pairs
+        self.translations = {}
+        self.alignable_aID = self.ann_ref = self.ref_aID = None
+        self.phon_tar = self.orig_aID = self.speaker = self.xds = self.notes = ""
+        self.words = []
+
+    def to_json(self):
+        """Returns a dict of the segment, laid out as in the JSON export, for json.dump"""
+        segment = {
+            "full_text":self.full_text,
+            "times":{
+                "begin":{"ts_ref":self.begin_ts, "time":self.begin},
+                "end":{"ts_ref":self.end_ts, "time":self.end}
+            }
+        }
+        for tns_lang, translation in self.translations.items():
+            segment["tns-"+tns_lang] = translation
+        if self.alignable_aID is not None:
+            segment["alignable_aID"] = self.alignable_aID
+        segment.update({"phon_tar":self.phon_tar, "orig_aID":self.orig_aID, "speaker":self.speaker, "xds":self.xds, "notes":self.notes, "word_list":self.words})
+        if self.ref_aID is not None:
+            segment["ann_ref"] = self.ann_ref
+            segment["ref_aID"] = self.ref_aID
+        return segment
+
+def record_json(record):
+    """Serialize a Segment, Word or Morph, for use as the default of json.dump"""
+    return record.to_json()
+
+def read_morph(morph: ET.Element):
+    """Read the items of a FLExText morph element in one pass
+
+    Parameters:
+        morph: the morph element
+
+    Returns a Morph with the morph type and each of morph_keys, empty where FLEx gave nothing
+    """
+    this_morph = Morph(sys.intern(morph.attrib["type"]) if "type" in morph.attrib.keys() else "")
+    # the first item of each type wins, as with find
+    found = {}
+    for item in morph.iter("item"):
+        item_type = item.attrib.get("type")
+        if item_type not in found:
+            found[item_type] = item.text
+    for morph_key in morph_keys:
+        setattr(this_morph, morph_key, found.get(morph_key, ""))
+    return this_morph
+
+def read_word(word: ET.Element, language: str, child_language: str):
+    """Read the text, glossing and morphs of a FLExText word element in one pass over its items
+
+    Parameters:
+        word: the word element
+        language: the code of the main language in FLEx
+        child_language: the code used in FLEx for child/ungrammatical utterances
+
+    Returns a Word, with lang being the language the word text was found in (None if neither)
+    """
+    word_info = Word()
+    # text in the main language is preferred over text in the child language, wherever each item comes
+    lang_text = {}
+    info_found = set()
+    for item in word.iterfind("item"):
+        item_lang = item.attrib.get("lang")
+        if item_lang not in lang_text:
+            lang_text[item_lang] = item.text
+        item_type = item.attrib.get("type")
+        if (item_type == "pos" or item_type == "gls") and item_type not in info_found:
+            info_found.add(item_type)
+            setattr(word_info, item_type, item.text)
+    for lg in [language, child_language]:
+        if lg in lang_text:
+            word_info.word_text = lang_text[lg]
+            word_info.lang = lg
+            break
+    word_info.morphs = [read_morph(morph) for morph in word.iter("morph")]
+    return word_info
+
+def read_phrase(phrase: ET.Element, language: str, child_language: str):
+    """Read a FLExText phrase element into a phrase record
+
+    Parameters:
+        phrase: the phrase element
+        language: the code of the main language in FLEx
+        child_language: the code used in FLEx for child/ungrammatical utterances
+
+    Returns a dict with the segnum, begin and end times (None if missing), translations as (lang, text) pairs, note texts, the texts of the words' txt items, and Words
+    """
+    return {
+        "segnum": phrase[0].text,
+        "begin": phrase.attrib.get("begin-time-offset"),
+        "end": phrase.attrib.get("end-time-offset"),
+        "translations": [(i.attrib["lang"], i.text) for i in phrase.findall("./item[@type='gls']")],
+        "notes": [i.text for i in phrase.findall("./item[@type='note']")],
+        "txt": [i.text for i in phrase.findall(".//word/item[@type='txt']")],
+        "words": [read_word(word, language, child_language) for word in phrase.findall(".//word")]
+    }
+
+def iter_phrases(flextext_file, language: str, child_language: str, xml: StdlibXml = None):
+    """Read a FLExText one phrase at a time, without keeping the whole document in memory
+
+    Parameters:
+        flextext_file: path to (or file object of) the flextext exported from FLEx
+        language: the code of the main language in FLEx
+        child_language: the code used in FLEx for child/ungrammatical utterances
+        xml: the XML backend to parse it with (the stdlib if None)
+
+    Yields a phrase record (see read_phrase) for each phrase, in document order
+    """
+    if xml is None:
+        xml = StdlibXml()
+    paragraphs = None
+    for event, el in xml.iterparse(flextext_file, events=("start", "end")):
+        if event == "start":
+            if el.tag == "paragraphs":
+                paragraphs = el
+        elif el.tag == "phrase":
+            yield read_phrase(el, language, child_language)
+            el.clear()
+        elif el.tag == "paragraph" and paragraphs is not None:
+            # Everything in the paragraph has been read, so drop it from the tree
+            # (the parser reads ahead, so the next paragraphs may already be there; this one is always the first)
+            paragraphs.remove(el)
+
+class PhraseColumns:
+    """Phrase records (see read_phrase) packed into columns of numbers, for storing compactly
+
+    Every string is stored once, in a string table, and the columns hold their indices in it (0 is None).
+    The phrases, translations, notes, txts, words and morphs each have their own columns, and each phrase (and word) has counts of the rows that belong to it.
+    """
+    names = (["segnum", "begin", "end", "n_translations", "n_notes", "n_txt", "n_words", "translation_lang", "translation_text", "note", "txt", "word_text", "word_lang", "pos", "gls", "n_morphs"]
+        + ["morph_" + slot for slot in Morph.__slots__])
+    # marks the start of a packed file, and changes whenever the layout does
+    magic = b"FLIBL-PHRASES-1\n"
+
+    def __init__(self):
+        self.columns = {name:array("I") for name in self.names}
+        self.strings = [None]
+        self.string_ids = {None:0}
+
+    def string_id(self, text: str):
+        """Returns the index of a string in the string table, adding it if it's new"""
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add(self, phrase: dict):
+        """Add a phrase record to the end of the columns"""
+        columns = self.columns
+        string_id = self.string_id
+        columns["segnum"].append(string_id(phrase["segnum"]))
+        columns["begin"].append(string_id(phrase["begin"]))
+        columns["end"].append(string_id(phrase["end"]))
+        columns["n_translations"].append(len(phrase["translations"]))
+        for lang, text in phrase["translations"]:
+            columns["translation_lang"].append(string_id(lang))
+            columns["translation_text"].append(string_id(text))
+        columns["n_notes"].append(len(phrase["notes"]))
+        columns["note"].extend(string_id(text) for text in phrase["notes"])
+        columns["n_txt"].append(len(phrase["txt"]))
+        columns["txt"].extend(string_id(text) for text in phrase["txt"])
+        columns["n_words"].append(len(phrase["words"]))
+        for word in phrase["words"]:
+            columns["word_text"].append(string_id(word.word_text))
+            columns["word_lang"].append(string_id(word.lang))
+            columns["pos"].append(string_id(word.pos))
+            columns["gls"].append(string_id(word.gls))
+            columns["n_morphs"].append(len(word.morphs))
+            for morph in word.morphs:
+                for slot in Morph.__slots__:
+                    columns["morph_" + slot].append(string_id(getattr(morph, slot)))
+
+    def records(self):
+        """Yields the phrase records, in the order they were added, making each one from the columns only when it's reached"""
+        strings = self.strings
+        columns = self.columns
+        morph_columns = [columns["morph_" + slot] for slot in Morph.__slots__]
+        # the first row of the next phrase in each of the other tables
+        translation = note = txt = word_row = morph_row = 0
+        for n in range(len(columns["segnum"])):
+            n_translations = columns["n_translations"][n]
+            n_notes = columns["n_notes"][n]
+            n_txt = columns["n_txt"][n]
+            words = []
+            for _ in range(columns["n_words"][n]):
+                morphs = []
+                for _ in range(columns["n_morphs"][word_row]):
+                    morph = Morph.__new__(Morph)
+                    for slot, column in zip(Morph.__slots__, morph_columns):
+                        setattr(morph, slot, strings[column[morph_row]])
+                    morphs.append(morph)
+                    morph_row += 1
+                words.append(Word(strings[columns["word_text"][word_row]], strings[columns["word_lang"][word_row]], strings[columns["pos"][word_row]], strings[columns["gls"][word_row]], morphs))
+                word_row += 1
+            yield {
+                "segnum":strings[columns["segnum"][n]],
+                "begin":strings[columns["begin"][n]],
+                "end":strings[columns["end"][n]],
+                "translations":[(strings[columns["translation_lang"][row]], strings[columns["translation_text"][row]]) for row in range(translation, translation + n_translations)],
+                "notes":[strings[i] for i in columns["note"][note:note + n_notes]],
+                "txt":[strings[i] for i in columns["txt"][txt:txt + n_txt]],
+                "words":words
+            }
+            translation += n_translations
+            note += n_notes
+            txt += n_txt
+
+    def write(self, packed_file):
+        """Write the columns and string table, packed (see unpack_phrase_columns), to a binary file object a piece at a time"""
+        lengths = array("I", (len(text.encode("utf8")) for text in self.strings[1:]))
+        header = {"byteorder":sys.byteorder, "lengths":[len(self.columns[name]) for name in self.names], "strings":len(lengths)}
+        packed_file.write(self.magic)
+        packed_file.write(json.dumps(header).encode("utf8") + b"\n")
+        for name in self.names:
+            self.columns[name].tofile(packed_file)
+        lengths.tofile(packed_file)
+        for text in self.strings[1:]:
+            packed_file.write(text.encode("utf8"))
+
+def unpack_phrase_columns(data: bytes):
+    """Unpack phrase columns packed by PhraseColumns.write
+
+    Parameters:
+        data: the packed bytes
+
+    Returns a PhraseColumns (raises ValueError if data isn't packed phrase columns)
+    """
+    if not data.startswith(PhraseColumns.magic):
+        raise ValueError("Not packed phrase columns")
+    header_end = data.index(b"\n", len(PhraseColumns.magic)) + 1
+    header = json.loads(data[len(PhraseColumns.magic):header_end])
+    columns = PhraseColumns()
+    position = header_end
+    item_size = array("I").itemsize
+    for name, length in zip(PhraseColumns.names, header["lengths"]):
+        columns.columns[name].frombytes(data[position:position + length * item_size])
+        position += length * item_size
+    lengths = array("I")
+    lengths.frombytes(data[position:position + header["strings"] * item_size])
+    position += header["strings"] * item_size
+    if header["byteorder"] != sys.byteorder:
+        lengths.byteswap()
+        for column in columns.columns.values():
+            column.byteswap()
+    for length in lengths:
+        columns.strings.append(data[position:position + length].decode("utf8"))
+        position += length
+    if position != len(data):
+        raise ValueError("Packed phrase columns are the wrong length")
+    return columns
+
+class PhraseCache:
+    """Keeps the phrase records read from each FLExText in a file of packed PhraseColumns, so a FLExText that hasn't changed is loaded from there instead of being parsed again
+
+    The files are named after a hash of the FLExText, the languages it's read with, and this module's code, so a changed FLExText (or a change to how FLExTexts are read) is simply parsed again.
+    """
+    def __init__(self, directory: str = os.path.join(".flibl_cache", "phrases"), max_size_mb: float = 500):
+        """
+        Parameters:
+            directory: where the packed files are kept
+            max_size_mb: the least recently used files are deleted to keep them all under this size
+        """
+        self.directory = directory
+        self.max_size = max_size_mb * 1024 * 1024
+        self.code_hash = None
+
+    def key(self, flextext_file, language: str, child_language: str):
+        """Returns the hex key of a FLExText's phrases, from its contents and the languages it's read with
+
+        Parameters:
+            flextext_file: a binary file object of the FLExText, which is read through in chunks (not all at once) and left at its end
+            language, child_language: see iter_phrases
+        """
+        if self.code_hash is None:
+            with open(__file__, "rb") as code_file:
+                self.code_hash = hashlib.sha256(code_file.read()).hexdigest()
+        digest = hashlib.sha256(json.dumps([language, child_language, self.code_hash]).encode("utf8"))
+        for chunk in iter(lambda: flextext_file.read(1 << 20), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def phrases(self, flextext_file, language: str, child_language: str, xml: StdlibXml = None):
+        """Read a FLExText's phrase records, from the packed file if there is one for it, and otherwise by parsing it (and packing them for next time)
+
+        The FLExText is read through twice, once to work out its key and once to parse it if it isn't packed yet, but never held in memory whole.
+
+        Parameters:
+            flextext_file: path to (or seekable binary file object of) the flextext exported from FLEx
+            language, child_language, xml: see iter_phrases
+
+        Yields a phrase record (see read_phrase) for each phrase, in document order
+        """
+        if isinstance(flextext_file, str):
+            with open(flextext_file, "rb") as f:
+                key = self.key(f, language, child_language)
+        else:
+            key = self.key(flextext_file, language, child_language)
+            flextext_file.seek(0)
+        path = os.path.join(self.directory, key)
         try:
-            begin = ET.Element("TIME_SLOT", attrib={"TIME_SLOT_ID":"ts"+str(tsN), "TIME_VALUE":i.attrib["begin-time-offset"]})
-            end = ET.Element("TIME_SLOT", attrib={"TIME_SLOT_ID":"ts"+str(tsN+1), "TIME_VALUE":i.attrib["end-time-offset"]})
-            tsN += 2
-            time_order.append(begin)
-            time_order.append(end)
-        except:
-            next
-    return time_order
+            with open(path, "rb") as packed_file:
+                columns = unpack_phrase_columns(packed_file.read())
+            # mark it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            columns = None
+        if columns is not None:
+            yield from columns.records()
+            return
+        columns = PhraseColumns()
+        for phrase in iter_phrases(flextext_file, language, child_language, xml):
+            # packed before it's yielded, as combine_phrases changes the records it's given
+            columns.add(phrase)
+            yield phrase
+        self.save(key, columns)
+
+    def save(self, key: str, columns: PhraseColumns):
+        """Write packed phrase columns under a key, then delete the least recently used files if they're over the size limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        with open(path + ".tmp", "wb") as packed_file:
+            columns.write(packed_file)
+        os.replace(path + ".tmp", path)
+        packed = []
+        for name in os.listdir(self.directory):
+            stat = os.stat(os.path.join(self.directory, name))
+            packed.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for mtime, size, name in packed)
+        for mtime, size, name in sorted(packed):
+            if total <= self.max_size:
+                break
+            if name == key:
+                continue
+            total -= size
+            os.remove(os.path.join(self.directory, name))
+
+def combine_phrases(phrases):
+    """Combine the phrases FLEx splits a paragraph into (segnums like 12.1, 12.2) into one phrase
+
+    Parameters:
+        phrases: iterable of phrase records, as yielded by iter_phrases
+
+    Yields one phrase record per paragraph, with the segnum without the decimal and the times of the last phrase
+    """
+    combined = None
+    for phrase in phrases:
+        segnum = phrase["segnum"].split(".")[0]
+        if combined is not None and combined["segnum"] == segnum:
+            combined["begin"] = phrase["begin"]
+            combined["end"] = phrase["end"]
+            combined["translations"] += phrase["translations"]
+            combined["notes"] += phrase["notes"]
+            combined["txt"] += phrase["txt"]
+            combined["words"] += phrase["words"]
+        else:
+            if combined is not None:
+                yield combined
+            combined = phrase
+            combined["segnum"] = segnum
+    if combined is not None:
+        yield combined
 
 def parse_phrase(para: ET.Element):
     """
@@ -150,39 +838,546 @@ def parse_phrase(para: ET.Element):
                 for j in i:
                     para[0][0].append(i)
             
-def make_assoc_annotation(base_tier_name: str, tier_type: str, content_dict: dict, parent_aID: str, aID_count: int, eaf: ET.ElementTree):
-    """Make an annotation of the type Symbolic Association
-    
+def pair_targets(segments: dict):
+    """Match each Target segment with the Phonetic segment that has the same original aID
+
     Parameters:
-        base_tier_name: the prefix for the tiers to be made; will include at minimum the speaker code
-        tier_type: the type of tier in ELAN, defined by the kind of content in it, such as morphological gloss or translation
-        content_dict: the dict of items to be read from, where the content of the annotation will be. This will either be a dict containing information of a phrase, a word, or a morph
-        content_aID: the aID of the parent element to the one being created
-        aID_count: the present aID in the count as we create more annotations
-    
-    Returns next aID to be used in the creation of the EAF; makes changes to EAF XML document tree in place
-    """
-    # tier_content_type is -pos etc
-    # phrase_word_morph_dict is var word or var phase in the original constr script, which is just where i slice the string and give each word a dict of info like pos, morphs etc or where the xds, notes etc are stored in the case of phrase dict
-    # basline_word_aID is the baseline aID or word aID, depending on if this is for the phrase level or word level ref ann
-    # i'll want to run this with like 
-    # for note_type in ["pos", "xds", ...]:
-        # make_assoc_annotation(base_tier_name, note_type, eaf, word, word_aID)
-    x_aID = aID_count
-    aID_count += 1
-    x_tier_name = base_tier_name + "-" + tier_type
-    x_tier = eaf.find(".//TIER[@TIER_ID='{}']".format(x_tier_name))
-    new_x_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(x_aID), "ANNOTATION_REF":parent_aID})
-    new_x_ann_val = ET.Element("ANNOTATION_VALUE")
+        segments: dict of segnum and Segment pairs
+
+    Returns a dict of Target segnum and Phonetic segnum pairs, and a list of warnings for the aIDs that could not be paired one-to-one and the segments that are neither Phonetic nor Target
+    """
+    phonetic = {}
+    warnings = []
+    for segnum, segment in segments.items():
+        # without the note, there's no telling which tier the segment belongs on
+        if not segment.phon_tar:
+            warnings.append({"warning":"no_phonetic_or_target_note", "orig_aID":segment.orig_aID, "segnum":segnum})
+            continue
+        if segment.phon_tar != "Phonetic" or not segment.orig_aID:
+            continue
+        if segment.orig_aID in phonetic:
+            # Keep the first one, a Target can only refer to one utterance
+            warnings.append({"warning":"duplicate_phonetic", "orig_aID":segment.orig_aID, "segnum":segnum, "paired_segnum":phonetic[segment.orig_aID]})
+        else:
+            phonetic[segment.orig_aID] = segnum
+    pairs = {}
+    paired = {}
+    for segnum, segment in segments.items():
+        if segment.phon_tar != "Target":
+            continue
+        if segment.orig_aID not in phonetic:
+            warnings.append({"warning":"unmatched_target", "orig_aID":segment.orig_aID, "segnum":segnum})
+        elif segment.orig_aID in paired:
+            warnings.append({"warning":"duplicate_target", "orig_aID":segment.orig_aID, "segnum":segnum, "paired_segnum":paired[segment.orig_aID]})
+        else:
+            pairs[segnum] = phonetic[segment.orig_aID]
+            paired[segment.orig_aID] = segnum
+    return pairs, warnings
+
+def make_tier_registry(tiers_by_speaker: dict):
+    """Index the TIER elements made for the output EAF by their TIER_ID
+
+    Parameters:
+        tiers_by_speaker: dict of speaker code and list of TIER elements pairs
+
+    Returns a dict of TIER_ID and TIER element pairs
+    """
+    return {sys.intern(tier.attrib["TIER_ID"]): tier for tier_list in tiers_by_speaker.values() for tier in tier_list}
+
+def make_ref_annotation(aID: int, parent_aID: int, value: str, previous_aID: int = None):
+    """Make an annotation of the type Symbolic Association or Symbolic Subdivision
+
+    Parameters:
+        aID: the number of the annotation's ANNOTATION_ID
+        parent_aID: the number of the ANNOTATION_ID of the annotation it refers to
+        value: the content of the annotation, taken from a Segment, Word, or Morph
+        previous_aID: for subdivisions after the first, the number of the ANNOTATION_ID of the one before it (a quirk of ELAN requires this)
+
+    Returns the ANNOTATION element, to be added to its tier
+    """
+    if previous_aID is None:
+        ref_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(aID), "ANNOTATION_REF":"a"+str(parent_aID)})
+    else:
+        ref_ann = ET.Element("REF_ANNOTATION", attrib={"ANNOTATION_ID":"a"+str(aID), "ANNOTATION_REF":"a"+str(parent_aID), "PREVIOUS_ANNOTATION":"a"+str(previous_aID)})
+    ann_val = ET.Element("ANNOTATION_VALUE")
+    ann_val.text = value
+    ref_ann.append(ann_val)
+    ann = ET.Element("ANNOTATION")
+    ann.append(ref_ann)
+    return ann
+
+def allocate_annotation_ids(segments: list, first_aID: int, n_phrase_types: int, n_morph_types: int):
+    """Work out the block of annotation IDs for the symbolic annotations of each segment before any are made
+
+    Each segment takes one ID for each of its phrase-level associations (notes, xds, translations), then for each word, one for the word, its pos and its gls, and for each morph, one for its txt and one for each of the other morph info types.
+
+    Parameters:
+        segments: the Segments to be made into annotations, in order
+        first_aID: the first annotation ID that's free
+        n_phrase_types: the number of phrase-level association tiers
+        n_morph_types: the number of morph info types besides txt
+
+    Returns a list with the first ID of each segment's block, and the first ID free after all of them
+    """
+    blocks = []
+    aID = first_aID
+    for segment in segments:
+        blocks.append(aID)
+        aID += n_phrase_types
+        for word in segment.words:
+            aID += 3 + (1 + n_morph_types) * len(word.morphs)
+    return blocks, aID
+
+def escape_cdata(text: str):
+    """Escape text content the way ElementTree does when serializing"""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def escape_attrib(text: str):
+    """Escape an attribute value the way ElementTree does when serializing"""
+    text = escape_cdata(text)
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+def serialize_indented(el: ET.Element, level: int, parts: list, space: str = "\t"):
+    """Serialize an element, indenting it as ET.indent would, without changing the element
+
+    Parameters:
+        el: the element to serialize (tags and attribute names are expected to be plain, i.e. without namespaces)
+        level: the indentation level of the element itself
+        parts: list that the serialized strings are added to
+        space: the whitespace used for each level of indentation
+
+    Makes changes to parts in place (returns nothing)
+    """
+    tag = el.tag
+    parts.append("<" + tag)
+    for k, v in el.items():
+        parts.append(" " + k + "=\"" + escape_attrib(v) + "\"")
+    if len(el):
+        child_indentation = "\n" + space * (level + 1)
+        parts.append(">")
+        if el.text and el.text.strip():
+            parts.append(escape_cdata(el.text))
+        else:
+            parts.append(child_indentation)
+        last = len(el) - 1
+        for n, child in enumerate(el):
+            serialize_indented(child, level + 1, parts, space)
+            if child.tail and child.tail.strip():
+                parts.append(escape_cdata(child.tail))
+            elif n < last:
+                parts.append(child_indentation)
+            else:
+                # Dedent after the last child
+                parts.append("\n" + space * level)
+        parts.append("</" + tag + ">")
+    elif el.text:
+        parts.append(">" + escape_cdata(el.text) + "</" + tag + ">")
+    else:
+        parts.append(" />")
+
+class EafWriter:
+    """Write an EAF document one top-level element at a time
+
+    Elements should be written in the order ELAN expects them: HEADER, TIME_ORDER, each TIER, LINGUISTIC_TYPEs, LANGUAGEs, CONSTRAINTs and CONTROLLED_VOCABULARYs.
+    The output is the same as building the whole tree, running ET.indent(tree, space="\\t") and writing it with encoding="unicode".
+    """
+    def __init__(self, file_name: str, attrib: dict, files: "FileAccess" = None):
+        """
+        Parameters:
+            file_name: path of the EAF to be written
+            attrib: the attributes of the ANNOTATION_DOCUMENT element (namespaced ones, like xsi:noNamespaceSchemaLocation, are declared as ElementTree would)
+            files: the FileAccess to open the file with (straight to disk if None)
+        """
+        if files is None:
+            files = FileAccess()
+        self.file = io.TextIOWrapper(files.open_output(file_name), encoding="utf-8", errors="xmlcharrefreplace")
+        # Let ElementTree work out the namespace declarations for the root, then leave it open
+        self.start_tag = ET.tostring(ET.Element("ANNOTATION_DOCUMENT", attrib=dict(attrib)), encoding="unicode")[:-len(" />")] + ">"
+        self.empty = True
+
+    def write(self, el: ET.Element):
+        """Write an element as a child of ANNOTATION_DOCUMENT
+
+        Parameters:
+            el: the element to be written
+        """
+        parts = [self.start_tag + "\n\t"] if self.empty else ["\n\t"]
+        self.empty = False
+        serialize_indented(el, 1, parts)
+        self.file.write("".join(parts))
+
+    def close(self):
+        """Close ANNOTATION_DOCUMENT and the file"""
+        if self.empty:
+            self.file.write(self.start_tag[:-1] + " />")
+        else:
+            self.file.write("\n</ANNOTATION_DOCUMENT>")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class FileAccess:
+    """Opens the files a conversion reads and writes; this one goes straight to disk (see pipelined_files.PipelinedFiles for one that reads ahead and writes in the background)"""
+    def open_input(self, path: str):
+        """Returns a binary file object to read path from"""
+        return open(path, "rb")
+
+    def open_output(self, path: str):
+        """Returns a binary file object to write path with; the file is complete once it's closed"""
+        return open(path, "wb")
+
+class ConversionCache:
+    """Remember the outputs of past conversions, so that files whose inputs haven't changed can be skipped
+
+    Each conversion is keyed on a hash of its input files, the code doing the conversion, and the settings from the config that affect the output.
+    A copy of every output is kept in the cache directory, so it can be put back if the original output was deleted.
+    """
+    def __init__(self, directory: str = ".flibl_cache", max_age_days: float = 30, max_size_mb: float = 1000):
+        """
+        Parameters:
+            directory: where the cache index and the copies of the outputs are kept
+            max_age_days: entries that haven't been used for this long are dropped
+            max_size_mb: the least recently used entries are dropped to keep the copies under this size
+        """
+        self.directory = directory
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.max_size = max_size_mb * 1024 * 1024
+        try:
+            with open(os.path.join(directory, "index.json"), encoding="utf8") as index_file:
+                self.index = json.load(index_file)
+        except (OSError, ValueError):
+            self.index = {"files":{}, "entries":{}}
+
+    def file_hash(self, path: str):
+        """Get the sha256 of a file, reusing the last one if its size and modification time haven't changed"""
+        stat = os.stat(path)
+        known = self.index["files"].get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self.index["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def key(self, input_files: list, settings):
+        """Make the cache key for a conversion
+
+        Parameters:
+            input_files: paths of the files the conversion reads (including the code doing it)
+            settings: anything JSON-serializable that affects the output, e.g. the relevant parts of the config
+
+        Returns the key as a hex string
+        """
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf8"))
+        for path in input_files:
+            digest.update(path.encode("utf8") + b"\0" + self.file_hash(path).encode("ascii"))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Get the outputs of an earlier conversion with the same key, restoring any that were deleted from the cached copies
+
+        Returns the list of output paths, or None if there was no usable earlier conversion
+        """
+        entry = self.index["entries"].get(key)
+        if entry is None:
+            return None
+        for n, output in enumerate(entry["outputs"]):
+            if not os.path.exists(output):
+                copy = os.path.join(self.directory, key, str(n))
+                if not os.path.exists(copy):
+                    self.drop(key)
+                    return None
+                shutil.copyfile(copy, output)
+        entry["used"] = time.time()
+        return entry["outputs"]
+
+    def put(self, key: str, outputs: list):
+        """Record the outputs of a conversion, keeping a copy of each
+
+        Parameters:
+            key: the cache key of the conversion
+            outputs: the paths of the files the conversion wrote
+        """
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        size = 0
+        for n, output in enumerate(outputs):
+            shutil.copyfile(output, os.path.join(self.directory, key, str(n)))
+            size += os.path.getsize(output)
+        self.index["entries"][key] = {"outputs":outputs, "size":size, "used":time.time()}
+
+    def drop(self, key: str):
+        """Remove an entry and its copies from the cache"""
+        shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+        del self.index["entries"][key]
+
+    def evict(self):
+        """Drop the entries that are too old, then the least recently used ones until the cache is within its size limit"""
+        now = time.time()
+        for key, entry in list(self.index["entries"].items()):
+            if now - entry["used"] > self.max_age:
+                self.drop(key)
+        total = sum(entry["size"] for entry in self.index["entries"].values())
+        for key, entry in sorted(self.index["entries"].items(), key=lambda i: i[1]["used"]):
+            if total <= self.max_size:
+                break
+            total -= entry["size"]
+            self.drop(key)
+        # Forget the hashes of input files that are gone
+        self.index["files"] = {path:known for path, known in self.index["files"].items() if os.path.exists(path)}
+
+    def save(self):
+        """Write the cache index"""
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, "index.json")
+        with open(index_path + ".tmp", "w", encoding="utf8") as index_file:
+            json.dump(self.index, index_file)
+        os.replace(index_path + ".tmp", index_path)
+
+class Profiler:
+    """Keep track of where a conversion spends its time (and, if traced, memory), count what it makes, and show its progress
+
+    Mark where each stage of a conversion begins with profiler.begin("name"); it ends where the next one begins, or at profiler.end(). Stages that run more than once add up.
+    """
+    def __init__(self, trace_memory: bool = False, show_progress: bool = False):
+        """
+        Parameters:
+            trace_memory: whether to keep the peak memory allocated in each stage (this slows the conversion down considerably)
+            show_progress: whether to show progress on stderr as the conversion goes
+        """
+        self.trace_memory = trace_memory
+        self.show_progress = show_progress
+        self.stages = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.current_stage = None
+        self.stage_start = None
+        # the label, done and total last given to progress, while its line is being drawn
+        self.progress_line = None
+        self.progress_start = None
+        self.last_progress = 0.0
+        # tracing is only stopped again by the Profiler that started it, so one running around it (e.g. in benchmark.py) isn't cut short
+        self.started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    def begin(self, name: str):
+        """End the current stage, if any, and begin timing the stage called name"""
+        self.end()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.current_stage = name
+        self.stage_start = time.perf_counter()
+
+    def end(self):
+        """End the current stage, if any, adding its time (and peak memory) to the stage's totals"""
+        self.finish_progress()
+        if self.current_stage is None:
+            return
+        stage = self.stages.setdefault(self.current_stage, {"seconds":0.0, "calls":0})
+        stage["seconds"] += time.perf_counter() - self.stage_start
+        stage["calls"] += 1
+        if self.trace_memory:
+            stage["peak_mb"] = max(stage.get("peak_mb", 0.0), tracemalloc.get_traced_memory()[1] / 1e6)
+        self.current_stage = None
+
+    def count(self, name: str, n: int = 1):
+        """Add n to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def progress(self, label: str, done: int, total: int = None):
+        """Show how much of a stage is done, and about how long is left if the total is known, redrawing at most a few times a second"""
+        if not self.show_progress:
+            return
+        now = time.perf_counter()
+        if self.progress_line is None:
+            self.progress_start = now
+        self.progress_line = (label, done, total)
+        if done == total:
+            self.finish_progress()
+        elif now - self.last_progress >= 0.2:
+            self.last_progress = now
+            self.draw_progress(now)
+
+    def draw_progress(self, now: float):
+        """Redraw the progress line"""
+        label, done, total = self.progress_line
+        if total:
+            elapsed = now - self.progress_start
+            eta = "{:.0f}s left".format(elapsed * (total - done) / done) if done else ""
+            line = "{}: {}/{} ({:.0f}%) {}".format(label, done, total, 100 * done / total, eta)
+        else:
+            line = "{}: {}".format(label, done)
+        sys.stderr.write("\r" + line.ljust(60))
+        sys.stderr.flush()
+
+    def finish_progress(self):
+        """Draw the final state of the progress line, if there is one, and move past it"""
+        if self.progress_line is None:
+            return
+        self.draw_progress(time.perf_counter())
+        sys.stderr.write("\n")
+        self.progress_line = None
+
+    def report(self):
+        """End the profile, stopping memory tracing if this Profiler started it
+
+        Returns a dict with the total seconds, the stages (seconds, calls, and peak_mb if traced) and the counters
+        """
+        self.end()
+        report = {"seconds":time.perf_counter() - self.start, "stages":self.stages, "counters":self.counters}
+        if self.trace_memory:
+            report["peak_mb"] = max([stage.get("peak_mb", 0.0) for stage in self.stages.values()] + [0.0])
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+            self.trace_memory = False
+        return report
+
+def convert_file(convert, item, *args, trace_memory: bool = False, show_progress: bool = False, files: FileAccess = None, validate: bool = False):
+    """Run one conversion, catching any error so that it doesn't stop the rest of a batch
+
+    Parameters:
+        convert: the function that converts one file, e.g. eaf_construction.convert
+        item: what convert takes as its first argument (a file name or a config entry)
+        args: any other arguments for convert
+        trace_memory, show_progress: passed on to the Profiler given to convert
+        files: the FileAccess for convert to open its files with (None to leave it to convert)
+        validate: whether to check the EAFs and FLExTexts written (see validation.validate_outputs) and count the conversion as failed if they have problems; only for outputs that are on disk once convert returns, i.e. not with pipelined_files.PipelinedFiles
+
+    Returns a dict with the input, a status of "ok" or "error", the outputs or the error, the seconds it took, and the profile (see Profiler.report)
+    """
+    start = time.perf_counter()
+    profiler = Profiler(trace_memory, show_progress)
     try:
-        new_x_ann_val.text = content_dict[tier_type]
-    except KeyError:
-        print("It's possible you didn't export the flextext with all of the fields visible.")
-        raise
-        
-    new_x_ann.append(new_x_ann_val)
-    x_ann = ET.Element("ANNOTATION")
-    x_ann.append(new_x_ann)
-    x_tier.append(x_ann)
-
-    return aID_count
\ No newline at end of file
+        if files is None:
+            outputs = convert(item, *args, profiler=profiler)
+        else:
+            outputs = convert(item, *args, profiler=profiler, files=files)
+        invalid = None
+        if validate:
+            profiler.begin("validate output")
+            # only needed for --validate, so it isn't imported along with flibl
+            from validation import validate_outputs
+            invalid = validate_outputs(outputs)
+    except Exception as e:
+        return {"input":item, "status":"error", "error":"{}: {}".format(type(e).__name__, e), "traceback":traceback.format_exc(), "seconds":time.perf_counter() - start, "profile":profiler.report()}
+    result = {"input":item, "status":"ok", "outputs":outputs, "seconds":time.perf_counter() - start, "profile":profiler.report()}
+    if invalid is not None:
+        result.update(invalid)
+    return result
+
+def convert_batch(convert, items: list, jobs: int = 1, *args, cache: ConversionCache = None, input_files=None, settings=None, trace_memory: bool = False, pipeline: bool = False, validate: bool = False):
+    """Convert a list of files, one per worker process if jobs is more than 1
+
+    Parameters:
+        convert: the function that converts one file and returns the list of files it wrote (must be importable, i.e. defined at the top level of a module)
+        items: the list of what convert takes as its first argument
+        jobs: the number of files to convert at the same time
+        args: any other arguments for convert
+        cache: a ConversionCache, to skip the items whose inputs haven't changed since they were last converted (None to convert everything)
+        input_files: function that gives the list of files an item is converted from, for the cache
+        settings: the parts of the config (and options) that affect the output, for the cache
+        trace_memory: whether to keep the peak memory of each stage in the profiles (slow, and it makes the times in them longer too)
+        pipeline: when converting one file at a time, read the next file's inputs and write the last file's outputs in the background (see pipelined_files.PipelinedFiles)
+        validate: whether to check the EAFs and FLExTexts each conversion writes, counting it as failed if they have problems (see validation.validate_outputs)
+
+    Returns a list of results (see convert_file), in the same order as items; skipped items have a status of "cached"
+    """
+    results = [None] * len(items)
+    keys = {}
+    if cache is not None:
+        # A change to the code doing the conversion also makes a new key: the script, and flibl and its other modules that the script imports (e.g. corpus_database)
+        script = sys.modules[convert.__module__]
+        code_directory = os.path.dirname(os.path.abspath(__file__))
+        code_files = [script.__file__]
+        for module in vars(script).values():
+            if isinstance(module, types.ModuleType) and getattr(module, "__file__", None) and os.path.dirname(os.path.abspath(module.__file__)) == code_directory and module.__file__ not in code_files:
+                code_files.append(module.__file__)
+        for n, item in enumerate(items):
+            try:
+                keys[n] = cache.key(input_files(item) + code_files, settings)
+            except OSError:
+                # Let the conversion report the missing file
+                continue
+            outputs = cache.get(keys[n])
+            if outputs is not None:
+                results[n] = {"input":item, "status":"cached", "outputs":outputs, "seconds":0.0}
+    pending = [n for n in range(len(items)) if results[n] is None]
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = {n:pool.submit(convert_file, convert, items[n], *args, trace_memory=trace_memory, validate=validate) for n in pending}
+            for n, future in futures.items():
+                results[n] = future.result()
+    elif pipeline:
+        # only needed for --pipeline, so it isn't imported along with flibl
+        from pipelined_files import PipelinedFiles
+        files = PipelinedFiles()
+        files.prefetch([input_files(items[n]) if input_files is not None else [] for n in pending])
+        for n in pending:
+            files.next_inputs()
+            results[n] = convert_file(convert, items[n], *args, trace_memory=trace_memory, show_progress=sys.stderr.isatty(), files=files)
+        write_errors = files.close()
+        # a conversion only succeeded if its outputs made it to disk
+        for n in pending:
+            failed = [output for output in results[n].get("outputs", []) if output in write_errors]
+            if failed:
+                results[n].update({"status":"error", "error":"could not write {}".format(", ".join(failed)), "traceback":"".join(write_errors[output] for output in failed)})
+            # the outputs are only all on disk now
+            elif validate and results[n]["status"] == "ok":
+                from validation import validate_outputs
+                results[n].update(validate_outputs(results[n]["outputs"]) or {})
+    else:
+        # progress is only shown when it's one file at a time, as files converted together would draw over each other
+        for n in pending:
+            results[n] = convert_file(convert, items[n], *args, trace_memory=trace_memory, show_progress=sys.stderr.isatty(), validate=validate)
+    if cache is not None:
+        for n in pending:
+            if results[n]["status"] == "ok" and n in keys:
+                cache.put(keys[n], results[n]["outputs"])
+        cache.evict()
+        cache.save()
+    return results
+
+def print_summary(results: list, label=str, totals: bool = True):
+    """Print how each file in a batch went, with the traceback of any that failed
+
+    Parameters:
+        results: list of results from convert_batch
+        label: function that gives the name to print for each input
+        totals: whether to finish with how many of the files were converted
+
+    Returns True if every file was converted
+    """
+    failed = [result for result in results if result["status"] == "error"]
+    for result in results:
+        if result["status"] == "error":
+            print("error  {}: {}".format(label(result["input"]), result["error"]))
+        elif result["status"] == "cached":
+            print("cached {} -> {} (unchanged)".format(label(result["input"]), ", ".join(result["outputs"])))
+        else:
+            print("ok     {} -> {} ({:.1f}s)".format(label(result["input"]), ", ".join(result["outputs"]), result["seconds"]))
+    for result in failed:
+        print("\n" + label(result["input"]) + "\n" + result["traceback"])
+    if totals:
+        print("Converted {} of {} files".format(len(results) - len(failed), len(results)))
+    return not failed
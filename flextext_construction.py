@@ -1,228 +1,349 @@
 # v04.7
-import xml.etree.ElementTree as ET
 import flexible as flibl
+import watching
 import re
 from datetime import datetime
 import json
-from uuid import uuid4
-
-# Open the config file and define some important variables
-config = json.load(open("to_flextext_config.json"))
-for name in config["file_names"]:
-    file_name = name
-    language = config["languages"]["main_language"]
-    flex_language = config["languages"]["flex_language"]
-
-    # if you have target utterances and use a different language in FLEx for the phonetic renderings of those in FLEx, give that language code here
-    child_language = config["languages"]["child_language"]
-
-    # Open and parse the EAF
-    eaf_parsed = ET.parse(file_name)
-    eaf_root = eaf_parsed.getroot()
-    media_guid = str(uuid4())
-
-    # Create XML tree for the FLExText
-    document = ET.ElementTree(ET.Element("document"))
-    document_root = document.getroot()
-    interlinear_text = ET.Element("interlinear-text", attrib={"guid":str(uuid4())})
-
-    # Generate the title
-    title = ET.Element("item", attrib={"type":"title", "lang":flex_language})
-    # Truncate the path to be just the file name without the extension
-    eaf_split_pattern = re.compile("[^/]+\.eaf")
-    title_match = eaf_split_pattern.search(file_name)[0][:-4]
-    title.text = title_match
-    # Right now, being in beta, we are titling the text and naming the file using the date and time of creation, so you can keep track of different versions in case things go awry and you have to delete something. Of course you can change it manually.
-    #TODO: add ability to specify title and filename in config file. 
-    now = str(datetime.now()).split(" ")
-    time = now[1].split(":")
-    date_time = now[0].replace("-", "_") + "-{}_{}".format(time[0], time[1])
-    title.text += "-" + date_time
-
-    interlinear_text.append(title)
-
-    paragraphs = ET.Element("paragraphs")
-
-    # Remove the tiers by constraint, if specified
-    for i in config["exclude_tier_constraint"]:
-        flibl.remove_constraint(i, eaf_root)
-
-    # Get dict of time IDs and their values
-    times = flibl.time_values(eaf_root)
-
-    # Special tiers to consider
-    exclude_ids = config["exclude_tier_id"]
-    exclude_types = config["exclude_tier_type"]
-    translation_tiers = config["translation_tiers"]
-    # Make a flat list of all the tier IDs associated with each of the target utterance tier types
-    target_tiers = [i.attrib["TIER_ID"] for j in config["target_utterance_tier_type"] for i in eaf_root.findall(".//*[@LINGUISTIC_TYPE_REF='{}']".format(j))]
-    
-    # Make tier groups
-    top_tiers = []
-    # Populate the top-level tiers
-    for i in eaf_root.findall("TIER"):
-        if ("PARENT_REF" not in i.attrib.keys()) and (i.attrib["TIER_ID"] not in exclude_ids) and (i.attrib["LINGUISTIC_TYPE_REF"] not in exclude_types):
-            top_tiers.append({
-                "PARENT_TIER_ID": i.attrib["TIER_ID"],
-                "PARTICIPANT": i.attrib["PARTICIPANT"],
-                "PARENT_TIER": i,
-                "CHILD_TIERS": []
-            })
-
-    # Populate the child tiers
-    for i in eaf_root.findall("TIER"):
-        # Only put the tier in if it's meant to be included
-        if ("PARENT_REF" in i.attrib.keys()) and (i.attrib["LINGUISTIC_TYPE_REF"] not in exclude_types)and (i.attrib["TIER_ID"] not in exclude_ids):
-            for j in top_tiers:
-                # Place the child tier under the appropriate parent tier (i.e. if the parent of a tier matches the ID of another tier, place the first tier under the parent)
-                if j["PARENT_TIER_ID"] == i.attrib["PARENT_REF"]:
-                    j["CHILD_TIERS"].append(i)
-                    break
-
-    # Make annotations dict: keys = annotaion IDs from ELAN, values = dicts with guid, begin-time-offset, end-time-offset, text, speaker, media-file, CHILD_TIERS
-    annotations = {}
-    for alignable_tier in top_tiers:
-        for annotation in alignable_tier["PARENT_TIER"]:
-            # Assign attributes for each annotation
-            annotation_id = annotation[0].attrib["ANNOTATION_ID"]
-            annotation_content = {}
-            annotation_content["guid"] = str(uuid4())
-            annotation_content["begin-time-offset"] = times[annotation[0].attrib["TIME_SLOT_REF1"]]
-            annotation_content["end-time-offset"] = times[annotation[0].attrib["TIME_SLOT_REF2"]]
-            annotation_content["text"] = annotation[0][0].text
-            annotation_content["speaker"] = alignable_tier["PARTICIPANT"]
-            annotation_content["media-file"] = media_guid
-            annotation_content["CHILD_TIERS"] = {}
-            annotations[annotation_id] = annotation_content
-        # Get the note/translations into the CHILD_TIERS--these won't be tokenized, rather placed as full strings at the phrase level, in "Notes" in FLEx
-        for reference_tier in alignable_tier["CHILD_TIERS"]:
-            for annotation in reference_tier:
-                this_annotation_id = annotation[0].attrib["ANNOTATION_REF"]
-                if reference_tier.attrib["TIER_ID"] in translation_tiers.keys():
-                    annotation[0][0].attrib["translation"] = translation_tiers[reference_tier.attrib["TIER_ID"]]
+import argparse
+
+class FlexTextConverter:
+    """Makes FLExTexts from EAFs, following a to_flextext_config.json
+
+    Build one for a config and use it for as many files as needed; the tokenizers and everything else taken from the config are only worked out once.
+    """
+    def __init__(self, config: dict, guids: str = "random", time_range: tuple = None, xml: str = "stdlib"):
+        """
+        Parameters:
+            config: the parsed to_flextext_config.json
+            guids: how to make the GUIDs in the FLExText, one of flibl.GuidMaker.strategies; anything but "random" gives the same FLExText every time an EAF is converted (and leaves the date and time out of its title)
+            time_range: (start, stop) in milliseconds, to only convert the annotations overlapping that stretch of the recording; either can be None to leave that end open
+            xml: the XML backend to parse the EAF and build and write the FLExText with, one of flibl.xml_backends
+        """
+        self.config = config
+        self.guids = guids
+        self.time_range = time_range
+        self.xml = flibl.make_xml(xml)
+        # Define some important variables
+        self.language = config["languages"]["main_language"]
+        self.flex_language = config["languages"]["flex_language"]
+        # if you have target utterances and use a different language in FLEx for the phonetic renderings of those in FLEx, give that language code here
+        self.child_language = config["languages"]["child_language"]
+        # Using the definitions from the config file, make a tokenizer for each language
+        self.tokenizers = {lg:flibl.Tokenizer(word_forming) for lg, word_forming in flibl.make_word_forming(config).items()}
+        # For truncating the path to be just the file name without the extension
+        self.eaf_split_pattern = re.compile("[^/]+\.eaf")
+        # Defining languages for FLEx
+        self.language_defs = config["language_fonts"]
+        # Everything in the config but the list of files affects the output, as do how GUIDs are made, which part of each file is converted and how the XML is written
+        self.settings = {"config":{k:v for k, v in config.items() if k != "file_names"}, "guids":guids, "time_range":time_range, "xml":self.xml.name}
+
+    def input_files(self, file_name: str):
+        """Returns the list of files a FLExText is made from, for the cache"""
+        return [file_name]
+
+    def convert(self, file_name: str, profiler: flibl.Profiler = None, files: flibl.FileAccess = None):
+        """Make a FLExText from an EAF
+
+        Parameters:
+            file_name: path of the EAF
+            profiler: a Profiler to record the stages and counts of the conversion in
+            files: the FileAccess to read the EAF and write the FLExText with (straight to disk if None)
+
+        Returns a list with the path of the FLExText written
+        """
+        if profiler is None:
+            profiler = flibl.Profiler()
+        if files is None:
+            files = flibl.FileAccess()
+        config = self.config
+        xml = self.xml
+        language = self.language
+        flex_language = self.flex_language
+        child_language = self.child_language
+
+        # Open and parse the EAF
+        profiler.begin("parse EAF")
+        with files.open_input(file_name) as eaf_file:
+            eaf_root = xml.parse(eaf_file)
+        # Truncate the path to be just the file name without the extension
+        title_match = self.eaf_split_pattern.search(file_name)[0][:-4]
+        guids = flibl.GuidMaker(self.guids, title_match)
+        media_guid = guids.guid("media", 0)
+
+        # Create XML tree for the FLExText
+        document = xml.tree(xml.element("document"))
+        document_root = document.getroot()
+        interlinear_text = xml.element("interlinear-text", attrib={"guid":guids.guid("interlinear-text")})
+
+        # Generate the title
+        title = xml.element("item", attrib={"type":"title", "lang":flex_language})
+        title.text = title_match
+        # Right now, being in beta, we are titling the text and naming the file using the date and time of creation, so you can keep track of different versions in case things go awry and you have to delete something. Of course you can change it manually.
+        #TODO: add ability to specify title and filename in config file. 
+        now = str(datetime.now()).split(" ")
+        time = now[1].split(":")
+        date_time = now[0].replace("-", "_") + "-{}_{}".format(time[0], time[1])
+        # GUIDs that don't change from run to run are for getting the same FLExText every time, so the title doesn't change either
+        if not guids.deterministic:
+            title.text += "-" + date_time
+
+        interlinear_text.append(title)
+
+        paragraphs = xml.element("paragraphs")
+
+        # Remove the tiers by constraint, if specified
+        profiler.begin("remove constraints")
+        # Every tier lookup from here on goes through the graph rather than searching the EAF
+        tier_graph = flibl.TierGraph(eaf_root)
+        for i in config["exclude_tier_constraint"]:
+            tier_graph.remove_constraint(i)
+
+        profiler.begin("group tiers")
+        # Get dict of time IDs and their values
+        times = flibl.time_values(eaf_root)
+
+        # Special tiers to consider
+        exclude_ids = set(config["exclude_tier_id"])
+        exclude_types = set(config["exclude_tier_type"])
+        translation_tiers = config["translation_tiers"]
+        # Make a set of all the tier IDs associated with each of the target utterance tier types
+        target_tiers = {i.attrib["TIER_ID"] for j in config["target_utterance_tier_type"] for i in tier_graph.of_type(j)}
+        
+        # Make tier groups
+        top_tiers = []
+        # Populate the top-level tiers, each with its child tiers, as long as they're meant to be included
+        for i in tier_graph.tiers:
+            if ("PARENT_REF" not in i.attrib.keys()) and (i.attrib["TIER_ID"] not in exclude_ids) and (i.attrib["LINGUISTIC_TYPE_REF"] not in exclude_types):
+                profiler.count("tier lookups")
+                top_tiers.append({
+                    "PARENT_TIER_ID": i.attrib["TIER_ID"],
+                    "PARTICIPANT": i.attrib["PARTICIPANT"],
+                    "PARENT_TIER": i,
+                    "CHILD_TIERS": [j for j in tier_graph.children(i.attrib["TIER_ID"]) if (j.attrib["LINGUISTIC_TYPE_REF"] not in exclude_types) and (j.attrib["TIER_ID"] not in exclude_ids)]
+                })
+
+        # Make annotations dict: keys = annotaion IDs from ELAN, values = dicts with guid, begin-time-offset, end-time-offset, text, speaker, media-file, CHILD_TIERS
+        profiler.begin("collect annotations")
+        annotations = {}
+        for alignable_tier in top_tiers:
+            tier_annotations = alignable_tier["PARENT_TIER"]
+            # Only the annotations overlapping the time range are wanted; the whole EAF has been parsed already, so one check per annotation is as cheap as finding them gets
+            if self.time_range is not None:
+                tier_annotations = [annotation for annotation in tier_annotations if flibl.overlaps(int(times[annotation[0].attrib["TIME_SLOT_REF1"]]), int(times[annotation[0].attrib["TIME_SLOT_REF2"]]), self.time_range)]
+            for annotation in tier_annotations:
+                # Assign attributes for each annotation
+                annotation_id = annotation[0].attrib["ANNOTATION_ID"]
+                annotation_content = {}
+                annotation_content["begin-time-offset"] = times[annotation[0].attrib["TIME_SLOT_REF1"]]
+                annotation_content["end-time-offset"] = times[annotation[0].attrib["TIME_SLOT_REF2"]]
+                annotation_content["text"] = annotation[0][0].text
+                annotation_content["speaker"] = alignable_tier["PARTICIPANT"]
+                annotation_content["media-file"] = media_guid
+                annotation_content["CHILD_TIERS"] = {}
+                annotations[annotation_id] = annotation_content
+            # Get the note/translations into the CHILD_TIERS--these won't be tokenized, rather placed as full strings at the phrase level, in "Notes" in FLEx
+            for reference_tier in alignable_tier["CHILD_TIERS"]:
+                for annotation in reference_tier:
+                    this_annotation_id = annotation[0].attrib["ANNOTATION_REF"]
+                    # belongs to an annotation outside the time range
+                    if self.time_range is not None and this_annotation_id not in annotations:
+                        continue
+                    if reference_tier.attrib["TIER_ID"] in translation_tiers.keys():
+                        annotation[0][0].attrib["translation"] = translation_tiers[reference_tier.attrib["TIER_ID"]]
+                    else:
+                        annotation[0][0].attrib["translation"] = ""
+                    annotations[this_annotation_id]["CHILD_TIERS"][reference_tier.attrib["TIER_ID"]] = annotation[0][0]
+
+        # Fill in the main content
+        profiler.begin("build phrases")
+        for ann_count, annotation in enumerate(annotations):
+            profiler.progress("Making phrases", ann_count + 1, len(annotations))
+            # Initialize the annotation as not having an associated target utterance
+            target = False
+            annotation_dict = annotations[annotation]
+            aID = annotation
+            # Make elements for the internal elements per utterance
+            paragraph = xml.element("paragraph", attrib={"guid":guids.guid("paragraph", aID)})
+            phrases = xml.element("phrases")
+            phrase = xml.element("phrase", attrib={"guid":guids.guid("phrase", aID), "begin-time-offset": annotation_dict["begin-time-offset"], "end-time-offset": annotation_dict["end-time-offset"], "speaker": annotation_dict["speaker"], "media-file": annotation_dict["media-file"]})
+            # A list of Note elements for FLEx, to be populated
+            notes = []
+            # Add all the Note elements
+            for i in annotation_dict["CHILD_TIERS"]:
+                # If the child tier is a translation, make a special translation (gls) element for it
+                if annotation_dict["CHILD_TIERS"][i].attrib["translation"]:
+                    note = xml.element("item", attrib={"type":"gls", "lang":annotation_dict["CHILD_TIERS"][i].attrib["translation"]})
+                # If there is an associated target tier, mark the variable target as such, so it can be added later
+                elif i in target_tiers:
+                    target = True
+                    target_text = annotation_dict["CHILD_TIERS"][i].text
+                    continue
+                # Otherwise, consider it just a normal Note
                 else:
-                    annotation[0][0].attrib["translation"] = ""
-                annotations[this_annotation_id]["CHILD_TIERS"][reference_tier.attrib["TIER_ID"]] = annotation[0][0]
-
-    # Fill in the main content
-    for annotation in annotations:
-        # Initialize the annotation as not having an associated target utterance
-        target = False
-        annotation_dict = annotations[annotation]
-        aID = annotation
-        # Make elements for the internal elements per utterance
-        paragraph = ET.Element("paragraph", attrib={"guid": str(uuid4())})
-        phrases = ET.Element("phrases")
-        phrase = ET.Element("phrase", attrib={"guid":str(uuid4()), "begin-time-offset": annotation_dict["begin-time-offset"], "end-time-offset": annotation_dict["end-time-offset"], "speaker": annotation_dict["speaker"], "media-file": annotation_dict["media-file"]})
-        # A list of Note elements for FLEx, to be populated
-        notes = []
-        # Add all the Note elements
-        for i in annotation_dict["CHILD_TIERS"]:
-            # If the child tier is a translation, make a special translation (gls) element for it
-            if annotation_dict["CHILD_TIERS"][i].attrib["translation"]:
-                note = ET.Element("item", attrib={"type":"gls", "lang":annotation_dict["CHILD_TIERS"][i].attrib["translation"]})
-            # If there is an associated target tier, mark the variable target as such, so it can be added later
-            elif i in target_tiers:
-                target = True
-                target_text = annotation_dict["CHILD_TIERS"][i].text
-                continue
-            # Otherwise, consider it just a normal Note
+                    note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+                # Fill the note/gls element with the text of the annotation
+                note.text = annotation_dict["CHILD_TIERS"][i].text
+                notes.append(note)
+            # Add the notes needed to indicate metadata
+            phonetic_note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+            if target:
+                phonetic_note.text = "Target"
             else:
-                note = ET.Element("item", attrib={"type":"note", "lang":flex_language})
-            # Fill the note/gls element with the text of the annotation
-            note.text = annotation_dict["CHILD_TIERS"][i].text
-            notes.append(note)
-        # Add the notes needed to indicate metadata
-        phonetic_note = ET.Element("item", attrib={"type":"note", "lang":flex_language})
-        if target:
-            phonetic_note.text = "Target"
-        else:
-            phonetic_note.text = "Phonetic"
-        notes.append(phonetic_note)
-        id_note = ET.Element("item", attrib={"type":"note", "lang":flex_language})
-        id_note.text = aID
-        notes.append(id_note)
-        speaker_note = ET.Element("item", attrib={"type":"note", "lang":flex_language})
-        speaker_note.text = annotation_dict["speaker"]
-        notes.append(speaker_note)
-        # If there is an associated target utterance, use the original utterance as child language and the target as the main language
-        if target:
-            # Use the defined child_language to tokenize the original utterance
-            text = flibl.tokenize(annotation_dict["text"], child_language)
-            flibl.add_word_el(text, phrase, child_language)
-            # Add the notes, similarly to how it was done above
-            for i in notes:
-                phrase.append(i)
-            phrases.append(phrase)
-            paragraph.append(phrases)
-            paragraphs.append(paragraph)
-            target_phrase = ET.Element("phrase", attrib={"guid":str(uuid4()), "begin-time-offset": annotation_dict["begin-time-offset"], "end-time-offset": annotation_dict["end-time-offset"], "speaker": annotation_dict["speaker"], "media-file": annotation_dict["media-file"]})
-            # Use the defined language (i.e. the general Vernacular as defined by FLEx) to tokenize the target utterance
-            text = flibl.tokenize(target_text, language)
-            flibl.add_word_el(text, target_phrase, language)
-            # Add notes as above, but only to give the ID and the fact that this is the target utterance
-            target_phrase.append(id_note)
-            target_note = ET.Element("item", attrib={"type":"note", "lang":flex_language})
-            target_note.text = "Target"
-            target_phrase.append(target_note)
-            target_paragraph = ET.Element("paragraph", attrib={"guid": str(uuid4())})
-            target_phrases = ET.Element("phrases")
-            target_phrases.append(target_phrase)
-            target_paragraph.append(target_phrases)
-            paragraphs.append(target_paragraph)
-        # If there isn't an associated target utterance, just use the main language
-        else:
-            text = flibl.tokenize(annotation_dict["text"], language)
-            flibl.add_word_el(text, phrase, language)
-            # Add all appropriate notes to utterance
-            for i in notes:
-                phrase.append(i)
-            phrases.append(phrase)
-            paragraph.append(phrases)
-            paragraphs.append(paragraph)
-
-    # FLEx wants a number for each phrase, that's seg_count
-    seg_count = 1
-    seg_num_paras = []
-    # Go through the paragraphs sorted by the begin-time-offset (i.e. their starting time), and add a segnum element to each
-    # Populate seg_num_paras with the paragraphs, correctly ordered, with the segnum element
-    for para in sorted(paragraphs, key=lambda para: int(para[0][0].attrib["begin-time-offset"])):
-        segnum = ET.Element("item", attrib={"type":"segnum", "lang":flex_language})
-        segnum.text = str(seg_count)
-        seg_count += 1
-        para[0][0].insert(0, segnum)
-        seg_num_paras.append(para)
+                phonetic_note.text = "Phonetic"
+            notes.append(phonetic_note)
+            id_note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+            id_note.text = aID
+            notes.append(id_note)
+            speaker_note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+            speaker_note.text = annotation_dict["speaker"]
+            notes.append(speaker_note)
+            # If there is an associated target utterance, use the original utterance as child language and the target as the main language
+            if target:
+                # Use the defined child_language to tokenize the original utterance
+                text = self.tokenizers[child_language].tokenize(annotation_dict["text"])
+                flibl.add_word_el(text, phrase, child_language, guids, (aID,))
+                profiler.count("tokens", len(text))
+                # Add the notes, similarly to how it was done above
+                for i in notes:
+                    phrase.append(i)
+                phrases.append(phrase)
+                paragraph.append(phrases)
+                paragraphs.append(paragraph)
+                target_phrase = xml.element("phrase", attrib={"guid":guids.guid("phrase", aID, "target"), "begin-time-offset": annotation_dict["begin-time-offset"], "end-time-offset": annotation_dict["end-time-offset"], "speaker": annotation_dict["speaker"], "media-file": annotation_dict["media-file"]})
+                # Use the defined language (i.e. the general Vernacular as defined by FLEx) to tokenize the target utterance
+                text = self.tokenizers[language].tokenize(target_text)
+                flibl.add_word_el(text, target_phrase, language, guids, (aID, "target"))
+                profiler.count("tokens", len(text))
+                # Add notes as above, but only to give the ID and the fact that this is the target utterance
+                target_id_note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+                target_id_note.text = aID
+                target_phrase.append(target_id_note)
+                target_note = xml.element("item", attrib={"type":"note", "lang":flex_language})
+                target_note.text = "Target"
+                target_phrase.append(target_note)
+                target_paragraph = xml.element("paragraph", attrib={"guid":guids.guid("paragraph", aID, "target")})
+                target_phrases = xml.element("phrases")
+                target_phrases.append(target_phrase)
+                target_paragraph.append(target_phrases)
+                paragraphs.append(target_paragraph)
+            # If there isn't an associated target utterance, just use the main language
+            else:
+                text = self.tokenizers[language].tokenize(annotation_dict["text"])
+                flibl.add_word_el(text, phrase, language, guids, (aID,))
+                profiler.count("tokens", len(text))
+                # Add all appropriate notes to utterance
+                for i in notes:
+                    phrase.append(i)
+                phrases.append(phrase)
+                paragraph.append(phrases)
+                paragraphs.append(paragraph)
+
+        profiler.count("paragraphs", len(paragraphs))
+        # FLEx wants a number for each phrase, that's seg_count
+        profiler.begin("sort paragraphs")
+        seg_count = 1
+        seg_num_paras = []
+        # Go through the paragraphs sorted by the begin-time-offset (i.e. their starting time), and add a segnum element to each
+        # Populate seg_num_paras with the paragraphs, correctly ordered, with the segnum element
+        for para in sorted(paragraphs, key=lambda para: int(para[0][0].attrib["begin-time-offset"])):
+            segnum = xml.element("item", attrib={"type":"segnum", "lang":flex_language})
+            segnum.text = str(seg_count)
+            seg_count += 1
+            para[0][0].insert(0, segnum)
+            seg_num_paras.append(para)
     
-    # Generate a paragraphs element with all of the paragraphs, in order as defined just above
-    new_paragraphs = ET.Element("paragraphs")
-    for i in seg_num_paras:
-        new_paragraphs.append(i)
-    # Add the paragraphs to the flextext document
-    interlinear_text.append(new_paragraphs)
-
-    # Defining languages for FLEx
-    language_defs = config["language_fonts"]
-    languages = ET.Element("languages")
-    for i in language_defs:
-        languages.append(ET.Element("language", attrib=i))
-    # Add the langauge definitions to the flextext document
-    interlinear_text.append(languages)
-
-    # Media metadata
-    media_descriptor = eaf_root.findall(".//MEDIA_DESCRIPTOR") # taking the first 
-    media_files = ET.Element("media-files", attrib={"offset-type": ""})
-    media = ET.Element("media", attrib={"guid":media_guid, "location": media_descriptor[0].attrib["MEDIA_URL"]})
-    media_files.append(media)
-    # Make media elements for the flextext
-    for i in media_descriptor[1:]:
-        secondary_media = ET.Element("media", attrib={"guid":str(uuid4()), "location": i.attrib["MEDIA_URL"]})
-        media_files.append(secondary_media)
-    # Add the media descriptors to the flextext document
-    interlinear_text.append(media_files)
-
-    # Finalize everything by writing it to the flextext document
-    document_root.append(interlinear_text)
-
-    # Write the file
-    ET.indent(document, space="\t", level=0)
-    document.write("{}-elan_export-{}.flextext".format(file_name[:-4], date_time))
\ No newline at end of file
+        # Generate a paragraphs element with all of the paragraphs, in order as defined just above
+        new_paragraphs = xml.element("paragraphs")
+        for i in seg_num_paras:
+            new_paragraphs.append(i)
+        # Add the paragraphs to the flextext document
+        interlinear_text.append(new_paragraphs)
+
+        profiler.begin("languages and media")
+        # Defining languages for FLEx
+        languages = xml.element("languages")
+        for i in self.language_defs:
+            languages.append(xml.element("language", attrib=i))
+        # Add the langauge definitions to the flextext document
+        interlinear_text.append(languages)
+
+        # Media metadata
+        media_descriptor = xml.findall(eaf_root, ".//MEDIA_DESCRIPTOR") # taking the first 
+        media_files = xml.element("media-files", attrib={"offset-type": ""})
+        media = xml.element("media", attrib={"guid":media_guid, "location": media_descriptor[0].attrib["MEDIA_URL"]})
+        media_files.append(media)
+        # Make media elements for the flextext
+        for n, i in enumerate(media_descriptor[1:]):
+            secondary_media = xml.element("media", attrib={"guid":guids.guid("media", n + 1), "location": i.attrib["MEDIA_URL"]})
+            media_files.append(secondary_media)
+        # Add the media descriptors to the flextext document
+        interlinear_text.append(media_files)
+
+        # Finalize everything by writing it to the flextext document
+        document_root.append(interlinear_text)
+
+        # Write the file
+        profiler.begin("indent")
+        xml.indent(document, space="\t")
+        profiler.begin("write FLExText")
+        export_name = "{}-elan_export-{}{}.flextext".format(file_name[:-4], date_time, flibl.time_range_name(self.time_range))
+        with files.open_output(export_name) as flextext_file:
+            xml.write(document, flextext_file)
+        profiler.end()
+        return [export_name]
+
+    def convert_many(self, file_names: list, jobs: int = 1, cache: flibl.ConversionCache = None, trace_memory: bool = False, pipeline: bool = False, validate: bool = False):
+        """Make FLExTexts from a list of EAFs, one per worker process if jobs is more than 1
+
+        Parameters:
+            file_names: paths of the EAFs
+            jobs, cache, trace_memory, pipeline, validate: see flibl.convert_batch
+
+        Returns a list of results (see flibl.convert_file), in the same order as file_names
+        """
+        return flibl.convert_batch(self.convert, file_names, jobs, cache=cache, input_files=self.input_files, settings=self.settings, trace_memory=trace_memory, pipeline=pipeline, validate=validate)
+
+    def watch(self, file_names: list, cache: flibl.ConversionCache = None, trace_memory: bool = False, validate: bool = False):
+        """Make the FLExText from each of a list of EAFs again whenever the EAF changes, until interrupted
+
+        Parameters:
+            file_names: paths of the EAFs
+            cache, trace_memory, validate: see flibl.convert_batch
+
+        Returns a list of the results of every conversion made (see flibl.convert_file)
+        """
+        return watching.watch(self.convert, file_names, self.input_files, cache=cache, settings=self.settings, trace_memory=trace_memory, validate=validate)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=1, help="Number of files to convert at the same time, each in its own process")
+    parser.add_argument("--pipeline", help="Read the next file and write the last one in the background while converting, to hide slow (e.g. network) storage; for one file at a time, without --jobs", action="store_true")
+    parser.add_argument("--no-cache", dest="use_cache", help="Convert every file, even if it hasn't changed since it was last converted", action="store_false")
+    parser.add_argument("--cache-dir", default=".flibl_cache", help="Where to keep track of past conversions")
+    parser.add_argument("--cache-max-age", type=float, default=30, help="Days after which an unused past conversion is forgotten")
+    parser.add_argument("--cache-max-size", type=float, default=1000, help="Size in MB that copies of past conversions are kept under")
+    parser.add_argument("--guids", choices=flibl.GuidMaker.strategies, default="random", help="How to make the GUIDs in the FLExText: random, or derived from the EAF (uuid5 or counter) so converting the same EAF always gives the same FLExText")
+    parser.add_argument("--from", dest="start", type=int, metavar="MS", help="Only convert the annotations that end after this time (in milliseconds)")
+    parser.add_argument("--to", dest="stop", type=int, metavar="MS", help="Only convert the annotations that begin before this time (in milliseconds)")
+    parser.add_argument("--xml", choices=flibl.xml_backends, default="stdlib", help="What to read and write the XML with: Python's own ElementTree (stdlib), lxml (faster, if installed), or lxml if it's installed and ElementTree if not (auto)")
+    parser.add_argument("--watch", help="After converting, keep running and convert each EAF again whenever it is saved (Ctrl+C to stop)", action="store_true")
+    parser.add_argument("--validate", help="Check the structure of each FLExText made (segnums, time offsets, words, guids), and count it as failed if there are problems, listing them", action="store_true")
+    parser.add_argument("--profile", metavar="FILE", help="Write a JSON report of how long each stage of each conversion took and how much it made")
+    parser.add_argument("--profile-memory", help="With --profile, also measure the most memory each stage used (this makes the conversion, and the times in the report, a lot slower)", action="store_true")
+    args = parser.parse_args()
+    # measuring memory slows everything down, so it's only done when asked for on its own
+    trace_memory = bool(args.profile) and args.profile_memory
+    # Open the config file
+    config = json.load(open("to_flextext_config.json"))
+    time_range = None if args.start is None and args.stop is None else (args.start, args.stop)
+    converter = FlexTextConverter(config, args.guids, time_range, args.xml)
+    cache = flibl.ConversionCache(args.cache_dir, args.cache_max_age, args.cache_max_size) if args.use_cache else None
+    results = converter.convert_many(config["file_names"], args.jobs, cache, trace_memory=trace_memory, pipeline=args.pipeline, validate=args.validate)
+    if args.watch:
+        flibl.print_summary(results)
+        results += converter.watch(config["file_names"], cache, trace_memory=trace_memory, validate=args.validate)
+    if args.profile:
+        with open(args.profile, "w", encoding="utf8") as profile_file:
+            json.dump(results, profile_file, indent=1)
+    if not flibl.print_summary(results):
+        raise SystemExit(1)
\ No newline at end of file
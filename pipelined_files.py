@@ -0,0 +1,94 @@
+# v1
+import io
+import queue
+import threading
+import traceback
+import flexible as flibl
+
+class OutputBuffer(io.BytesIO):
+    """A file being written in memory, handed to PipelinedFiles to write to disk once it's closed"""
+    def __init__(self, files: "PipelinedFiles", path: str):
+        super().__init__()
+        self.files = files
+        self.path = path
+
+    def close(self):
+        if not self.closed:
+            self.files.outputs.put((self.path, self.getvalue()))
+        super().close()
+
+class PipelinedFiles(flibl.FileAccess):
+    """Opens the files for a batch of conversions run one after another, reading the next conversion's inputs and writing the last one's outputs in background threads while the current one runs
+
+    Both threads spend their time waiting on the disk (or network), which doesn't hold up the conversion the way a second conversion in the same process would.
+    At most depth conversions' worth of inputs are read ahead, and at most depth outputs wait to be written, before the threads (or the conversions) wait for each other.
+    """
+    def __init__(self, depth: int = 2):
+        """
+        Parameters:
+            depth: how many conversions' inputs can be read ahead, and how many outputs can be waiting to be written
+        """
+        self.inputs = queue.Queue(maxsize=depth)
+        self.outputs = queue.Queue(maxsize=depth)
+        # the contents of the current conversion's inputs, by path
+        self.prefetched = {}
+        # the traceback of each output that couldn't be written, by path
+        self.write_errors = {}
+        self.writer = threading.Thread(target=self.write_outputs, daemon=True)
+        self.writer.start()
+
+    def prefetch(self, input_lists: list):
+        """Start reading the inputs of a batch of conversions, in the order they'll be run
+
+        Parameters:
+            input_lists: the list of input files of each conversion
+        """
+        threading.Thread(target=self.read_inputs, args=(input_lists,), daemon=True).start()
+
+    def read_inputs(self, input_lists: list):
+        """Read the inputs of each conversion into the inputs queue (run in its own thread by prefetch)"""
+        for paths in input_lists:
+            contents = {}
+            for path in paths:
+                try:
+                    with open(path, "rb") as f:
+                        contents[path] = f.read()
+                except OSError:
+                    # Left for the conversion to open (and report the error) itself
+                    continue
+            self.inputs.put(contents)
+
+    def next_inputs(self):
+        """Wait for the next conversion's inputs to be read; call this before each conversion, in the order given to prefetch"""
+        self.prefetched = self.inputs.get()
+
+    def open_input(self, path: str):
+        data = self.prefetched.pop(path, None)
+        if data is None:
+            return open(path, "rb")
+        return io.BytesIO(data)
+
+    def open_output(self, path: str):
+        return OutputBuffer(self, path)
+
+    def write_outputs(self):
+        """Write each closed output to disk (run in its own thread) until close puts None on the queue"""
+        while True:
+            output = self.outputs.get()
+            if output is None:
+                break
+            path, data = output
+            try:
+                with open(path, "wb") as f:
+                    f.write(data)
+            except OSError:
+                self.write_errors[path] = traceback.format_exc()
+
+    def close(self):
+        """Wait for every output to be written
+
+        Returns a dict of the paths that couldn't be written and the traceback of why
+        """
+        self.outputs.put(None)
+        self.writer.join()
+        return self.write_errors
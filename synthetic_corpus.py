@@ -0,0 +1,320 @@
+# v1
+import xml.etree.ElementTree as ET
+import argparse
+import json
+import os
+import random
+
+# Letters the made-up words are built from; all of them are word-forming in the configs written below
+consonants = ["p", "t", "k", "m", "n", "j", "y", "w", "'", "ts"]
+vowels = ["a", "e", "i", "o", "u", "ä", "ë", "ö"]
+xds_values = ["A", "A+C", "C", "T", "T+A", "T+C"]
+# suffixes get their own glosses and msa, like FLEx gives for an affix
+suffixes = {"'ë":"PL", "jts":"PST", "äm":"LOC", "ku":"Q"}
+
+def make_lexicon(rnd: random.Random, size: int):
+    """Make up stems to build utterances from
+
+    Parameters:
+        rnd: the random generator to draw from
+        size: how many stems to make
+
+    Returns a list of (stem, gloss, part of speech) tuples
+    """
+    lexicon = []
+    for i in range(size):
+        stem = "".join(rnd.choice(consonants) + rnd.choice(vowels) for syllable in range(rnd.randint(1, 3)))
+        lexicon.append((stem, "gloss{}".format(i), rnd.choice(["n", "v", "adj", "adv"])))
+    return lexicon
+
+def make_utterances(n_segments: int, speakers: dict, rnd: random.Random):
+    """Make up the utterances of a recording
+
+    Parameters:
+        n_segments: how many utterances to make
+        speakers: dict of speaker codes and whether they are kids (1) or not (0), as in to_eaf_config.json
+        rnd: the random generator to draw from
+
+    Returns a list of dicts, in time order, with the speaker, begin and end times, words (list of (stem, suffix) pairs), punctuation after each word (or ""), xds, translation, and target words (None for no target)
+    """
+    lexicon = make_lexicon(rnd, 500)
+    utterances = []
+    t = 0
+    for i in range(n_segments):
+        speaker = rnd.choice(list(speakers.keys()))
+        begin = t + rnd.randint(0, 300)
+        end = begin + rnd.randint(400, 3000)
+        # some utterances overlap the next one
+        t = end if rnd.random() < 0.8 else begin + 100
+        words = [(rnd.choice(lexicon), rnd.choice(list(suffixes.keys())) if rnd.random() < 0.3 else "") for w in range(rnd.randint(1, 8))]
+        punct = ["" for w in words]
+        if len(words) > 1 and rnd.random() < 0.2:
+            punct[rnd.randrange(len(words) - 1)] = "."
+        if rnd.random() < 0.2:
+            punct[-1] = "?"
+        # kids' utterances sometimes have a target (adult-like) version
+        target = None
+        if speakers[speaker] and rnd.random() < 0.5:
+            target = [rnd.choice(lexicon) if rnd.random() < 0.3 else word for word, suffix in words]
+        utterances.append({
+            "speaker":speaker,
+            "begin":begin,
+            "end":end,
+            "words":words,
+            "punct":punct,
+            "xds":rnd.choice(xds_values),
+            "translation":"tradución {}".format(i),
+            "target":target
+        })
+    return utterances
+
+def utterance_text(utterance: dict):
+    """Write out an utterance the way it would be transcribed in ELAN"""
+    return " ".join(word[0] + suffix + punct for (word, suffix), punct in zip(utterance["words"], utterance["punct"]))
+
+def write_tree(el: ET.Element, out, level: int):
+    """Write an element, indented as if it were level levels deep in its document, and let go of it"""
+    ET.indent(el, space="  ", level=level)
+    out.write("  " * level + ET.tostring(el, encoding="unicode") + "\n")
+    el.clear()
+
+def write_eaf(file_name: str, utterances: list, speakers: dict, translation_lang: str):
+    """Write the EAF the utterances were transcribed in, with tiers laid out the way the configs written by write_configs expect
+
+    Parameters:
+        file_name: path of the EAF to write
+        utterances: as returned by make_utterances
+        speakers: dict of speaker codes and whether they are kids, as in to_eaf_config.json
+        translation_lang: the language code used in the translation tier names
+
+    Returns a list with the ANNOTATION_ID of each utterance's annotation on its speaker's tier
+    """
+    # each tier's annotations, as (annotation element type, attributes, value)
+    tiers = {}
+    for speaker, kid in speakers.items():
+        tiers[speaker] = []
+        tiers[speaker + "_Translation-gls-" + translation_lang] = []
+        tiers[speaker + "_xds"] = []
+        if kid:
+            tiers[speaker + "_target"] = []
+    aID_count = 1
+    utterance_aIDs = []
+    for i, utterance in enumerate(utterances):
+        speaker = utterance["speaker"]
+        utterance_aID = "a{}".format(aID_count)
+        utterance_aIDs.append(utterance_aID)
+        tiers[speaker].append(("ALIGNABLE_ANNOTATION", {"ANNOTATION_ID":utterance_aID, "TIME_SLOT_REF1":"ts{}".format(2*i + 1), "TIME_SLOT_REF2":"ts{}".format(2*i + 2)}, utterance_text(utterance)))
+        aID_count += 1
+        ref_annotations = [(speaker + "_Translation-gls-" + translation_lang, utterance["translation"]), (speaker + "_xds", utterance["xds"])]
+        if utterance["target"] is not None:
+            ref_annotations.append((speaker + "_target", " ".join(word[0] for word in utterance["target"])))
+        for tier_id, value in ref_annotations:
+            tiers[tier_id].append(("REF_ANNOTATION", {"ANNOTATION_ID":"a{}".format(aID_count), "ANNOTATION_REF":utterance_aID}, value))
+            aID_count += 1
+
+    with open(file_name, "w", encoding="utf-8") as out:
+        out.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        out.write('<ANNOTATION_DOCUMENT AUTHOR="" DATE="2022-08-26T11:17:00-06:00" FORMAT="3.0" VERSION="3.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://www.mpi.nl/tools/elan/EAFv3.0.xsd">\n')
+        header = ET.Element("HEADER", attrib={"MEDIA_FILE":"", "TIME_UNITS":"milliseconds"})
+        ET.SubElement(header, "MEDIA_DESCRIPTOR", attrib={"MEDIA_URL":"file:///recording.wav", "MIME_TYPE":"audio/x-wav", "RELATIVE_MEDIA_URL":"./recording.wav"})
+        ET.SubElement(header, "PROPERTY", attrib={"NAME":"URN"}).text = "urn:nl-mpi-tools-elan-eaf:synthetic"
+        ET.SubElement(header, "PROPERTY", attrib={"NAME":"lastUsedAnnotationId"}).text = str(aID_count - 1)
+        write_tree(header, out, 1)
+        time_order = ET.Element("TIME_ORDER")
+        for i, utterance in enumerate(utterances):
+            ET.SubElement(time_order, "TIME_SLOT", attrib={"TIME_SLOT_ID":"ts{}".format(2*i + 1), "TIME_VALUE":str(utterance["begin"])})
+            ET.SubElement(time_order, "TIME_SLOT", attrib={"TIME_SLOT_ID":"ts{}".format(2*i + 2), "TIME_VALUE":str(utterance["end"])})
+        write_tree(time_order, out, 1)
+        for tier_id, annotations in tiers.items():
+            speaker = tier_id.split("_")[0]
+            if tier_id == speaker:
+                tier = ET.Element("TIER", attrib={"LINGUISTIC_TYPE_REF":"default-lt", "PARTICIPANT":speaker, "TIER_ID":tier_id})
+            elif tier_id.endswith("_target"):
+                tier = ET.Element("TIER", attrib={"LINGUISTIC_TYPE_REF":"Target Utterance", "PARENT_REF":speaker, "PARTICIPANT":speaker, "TIER_ID":tier_id})
+            elif tier_id.endswith("_xds"):
+                tier = ET.Element("TIER", attrib={"LINGUISTIC_TYPE_REF":"xds", "PARENT_REF":speaker, "PARTICIPANT":speaker, "TIER_ID":tier_id})
+            else:
+                tier = ET.Element("TIER", attrib={"LINGUISTIC_TYPE_REF":"Translation", "PARENT_REF":speaker, "PARTICIPANT":speaker, "TIER_ID":tier_id})
+            for ann_type, attrib, value in annotations:
+                ET.SubElement(ET.SubElement(ET.SubElement(tier, "ANNOTATION"), ann_type, attrib=attrib), "ANNOTATION_VALUE").text = value
+            write_tree(tier, out, 1)
+        # an empty tier for notes, which the config excludes
+        write_tree(ET.Element("TIER", attrib={"LINGUISTIC_TYPE_REF":"default-lt", "TIER_ID":"Notes"}), out, 1)
+        for lt_id, constraint in [("default-lt", None), ("Translation", "Symbolic_Association"), ("xds", "Symbolic_Association"), ("Target Utterance", "Symbolic_Association")]:
+            attrib = {"GRAPHIC_REFERENCES":"false", "LINGUISTIC_TYPE_ID":lt_id, "TIME_ALIGNABLE":"true" if constraint is None else "false"}
+            if constraint is not None:
+                attrib["CONSTRAINTS"] = constraint
+            if lt_id == "xds":
+                attrib["CONTROLLED_VOCABULARY_REF"] = "xds"
+            write_tree(ET.Element("LINGUISTIC_TYPE", attrib=attrib), out, 1)
+        write_tree(ET.Element("LANGUAGE", attrib={"LANG_DEF":"http://cdb.iso.org/lg/CDB-00130975-001", "LANG_ID":"und", "LANG_LABEL":"undetermined (und)"}), out, 1)
+        for stereotype, description in [("Time_Subdivision", "Time subdivision of parent annotation's time interval, no time gaps allowed within this interval"), ("Symbolic_Subdivision", "Symbolic subdivision of a parent annotation. Annotations refering to the same parent are ordered"), ("Symbolic_Association", "1-1 association with a parent annotation"), ("Included_In", "Time alignable annotations within the parent annotation's time interval, gaps are allowed")]:
+            write_tree(ET.Element("CONSTRAINT", attrib={"DESCRIPTION":description, "STEREOTYPE":stereotype}), out, 1)
+        cv = ET.Element("CONTROLLED_VOCABULARY", attrib={"CV_ID":"xds"})
+        ET.SubElement(cv, "DESCRIPTION", attrib={"LANG_REF":"und"})
+        for i, xds in enumerate(xds_values):
+            entry = ET.SubElement(cv, "CV_ENTRY_ML", attrib={"CVE_ID":"cve{}".format(i + 1)})
+            ET.SubElement(entry, "CVE_VALUE", attrib={"LANG_REF":"und"}).text = xds
+        write_tree(cv, out, 1)
+        out.write("</ANNOTATION_DOCUMENT>\n")
+    return utterance_aIDs
+
+def make_word(word: tuple, suffix: str, lang: str, flex_language: str, rnd: random.Random):
+    """Make a word element glossed the way FLEx exports it, with a morph for the stem and one for the suffix, if any"""
+    stem, gloss, pos = word
+    word_el = ET.Element("word", attrib={"guid":"00000000-0000-0000-0000-000000000000"})
+    ET.SubElement(word_el, "item", attrib={"type":"txt", "lang":lang}).text = stem + suffix
+    morphs = ET.SubElement(word_el, "morphs")
+    morph_parts = [("stem", stem, gloss, pos)]
+    if suffix:
+        morph_parts.append(("suffix", suffix, suffixes[suffix], "sfx"))
+    for morph_type, txt, morph_gloss, msa in morph_parts:
+        morph = ET.SubElement(morphs, "morph", attrib={"type":morph_type, "guid":"00000000-0000-0000-0000-000000000000"})
+        ET.SubElement(morph, "item", attrib={"type":"txt", "lang":lang}).text = txt
+        ET.SubElement(morph, "item", attrib={"type":"cf", "lang":lang}).text = txt
+        # FLEx only gives the homograph number and variant types when there are any
+        if rnd.random() < 0.3:
+            ET.SubElement(morph, "item", attrib={"type":"hn", "lang":lang}).text = str(rnd.randint(1, 3))
+        ET.SubElement(morph, "item", attrib={"type":"gls", "lang":flex_language}).text = morph_gloss
+        ET.SubElement(morph, "item", attrib={"type":"msa", "lang":flex_language}).text = msa
+        if rnd.random() < 0.05:
+            ET.SubElement(morph, "item", attrib={"type":"variantTypes", "lang":flex_language}).text = "+irr"
+    ET.SubElement(word_el, "item", attrib={"type":"gls", "lang":flex_language}).text = gloss if not suffix else gloss + "-" + suffixes[suffix]
+    # some words haven't been assigned a category
+    if rnd.random() < 0.9:
+        ET.SubElement(word_el, "item", attrib={"type":"pos", "lang":flex_language}).text = pos
+    return word_el
+
+def make_phrase(segnum: str, utterance: dict, words: list, lang: str, flex_language: str, rnd: random.Random):
+    """Make a phrase element with its segnum, times, speaker and words (but no translation or notes)"""
+    phrase = ET.Element("phrase", attrib={"guid":"00000000-0000-0000-0000-000000000000", "begin-time-offset":str(utterance["begin"]), "end-time-offset":str(utterance["end"]), "speaker":utterance["speaker"], "media-file":"00000000-0000-0000-0000-000000000001"})
+    ET.SubElement(phrase, "item", attrib={"type":"segnum", "lang":flex_language}).text = segnum
+    words_el = ET.SubElement(phrase, "words")
+    for i, (word, suffix, punct) in enumerate(words):
+        words_el.append(make_word(word, suffix, lang, flex_language, rnd))
+        if punct:
+            punct_el = ET.SubElement(words_el, "word", attrib={"guid":"00000000-0000-0000-0000-000000000000"})
+            # punctuation inside the phrase keeps the space tokenizing put before it
+            ET.SubElement(punct_el, "item", attrib={"type":"punct", "lang":lang}).text = punct if i == len(words) - 1 else " " + punct
+    return phrase
+
+def write_flextext(file_name: str, utterances: list, utterance_aIDs: list, speakers: dict, languages: dict, translation_lang: str, rnd: random.Random):
+    """Write the FLExText that FLEx would export after the EAF was brought over by flextext_construction.py and glossed
+
+    Parameters:
+        file_name: path of the FLExText to write
+        utterances: as returned by make_utterances
+        utterance_aIDs: as returned by write_eaf
+        speakers: dict of speaker codes and whether they are kids, as in to_eaf_config.json
+        languages: dict with the main_language, child_language and flex_language, as in to_flextext_config.json
+        translation_lang: the language code of the translations
+        rnd: the random generator to draw from
+    """
+    language = languages["main_language"]
+    child_language = languages["child_language"]
+    flex_language = languages["flex_language"]
+    with open(file_name, "w", encoding="utf-8") as out:
+        out.write("<?xml version='1.0' encoding='utf-8'?>\n<document>\n")
+        out.write('  <interlinear-text guid="00000000-0000-0000-0000-000000000002">\n')
+        out.write('    <item type="title" lang="{}">synthetic</item>\n    <paragraphs>\n'.format(flex_language))
+        seg_count = 1
+        for utterance, utterance_aID in zip(utterances, utterance_aIDs):
+            kid = speakers[utterance["speaker"]]
+            words = [(word, suffix, punct) for (word, suffix), punct in zip(utterance["words"], utterance["punct"])]
+            paragraph = ET.Element("paragraph", attrib={"guid":"00000000-0000-0000-0000-000000000000"})
+            phrases = ET.SubElement(paragraph, "phrases")
+            # FLEx splits some long segments into several phrases, numbered 12.1, 12.2, etc, and only the last keeps the times
+            if len(words) > 2 and rnd.random() < 0.1:
+                split = rnd.randint(1, len(words) - 1)
+                first = make_phrase("{}.1".format(seg_count), utterance, words[:split], child_language if kid else language, flex_language, rnd)
+                del first.attrib["begin-time-offset"]
+                del first.attrib["end-time-offset"]
+                phrases.append(first)
+                phrases.append(make_phrase("{}.2".format(seg_count), utterance, words[split:], child_language if kid else language, flex_language, rnd))
+            else:
+                phrases.append(make_phrase(str(seg_count), utterance, words, child_language if kid else language, flex_language, rnd))
+            seg_count += 1
+            # the translation and notes go at the end of the first phrase of the segment
+            ET.SubElement(phrases[0], "item", attrib={"type":"gls", "lang":translation_lang}).text = utterance["translation"]
+            for note in [utterance["xds"], "Phonetic", utterance_aID, utterance["speaker"]]:
+                ET.SubElement(phrases[0], "item", attrib={"type":"note", "lang":flex_language}).text = note
+            write_tree(paragraph, out, 3)
+            # the target version of a kid's utterance comes right after it, pointing back to it
+            if utterance["target"] is not None:
+                paragraph = ET.Element("paragraph", attrib={"guid":"00000000-0000-0000-0000-000000000000"})
+                phrase = make_phrase(str(seg_count), utterance, [(word, "", "") for word in utterance["target"]], language, flex_language, rnd)
+                seg_count += 1
+                for note in [utterance_aID, "Target"]:
+                    ET.SubElement(phrase, "item", attrib={"type":"note", "lang":flex_language}).text = note
+                ET.SubElement(paragraph, "phrases").append(phrase)
+                write_tree(paragraph, out, 3)
+        out.write("    </paragraphs>\n    <languages>\n")
+        for lang, vernacular in [(child_language, True), (language, True), (translation_lang, False), (flex_language, False)]:
+            out.write('      <language lang="{}" font="Charis SIL"{} />\n'.format(lang, ' vernacular="true"' if vernacular else ""))
+        out.write('    </languages>\n    <media-files offset-type="">\n      <media guid="00000000-0000-0000-0000-000000000001" location="file:///recording.wav" />\n    </media-files>\n')
+        out.write("  </interlinear-text>\n</document>\n")
+
+def write_configs(directory: str, eaf_name: str, flextext_name: str, speakers: dict, languages: dict, translation_lang: str):
+    """Write a to_flextext_config.json and to_eaf_config.json for the synthetic EAF and FLExText"""
+    valid_characters = "A-Za-zäëöü'"
+    speaker_tiers = [(speaker + "_Translation-gls-" + translation_lang) for speaker in speakers]
+    to_flextext_config = {
+        "file_names":[eaf_name],
+        "language_fonts":[
+            {"lang":languages["child_language"], "font":"Charis SIL", "vernacular":"true"},
+            {"lang":languages["main_language"], "font":"Charis SIL", "vernacular":"true"},
+            {"lang":translation_lang, "font":"Charis SIL"},
+            {"lang":languages["flex_language"], "font":"Charis SIL"}
+        ],
+        "languages":languages,
+        "valid_characters":{"main_language":valid_characters, "child_language":valid_characters},
+        "exclude_tier_id":["Notes"],
+        "exclude_tier_type":["Words"],
+        "exclude_tier_constraint":["Symbolic_Subdivision"],
+        "translation_tiers":{tier_id:translation_lang for tier_id in speaker_tiers},
+        "target_utterance_tier_type":["Target Utterance"]
+    }
+    to_eaf_config = {
+        "eafs_flextexts":[{"original_eaf":eaf_name, "flextext":flextext_name}],
+        "language":languages["main_language"],
+        "child_language":languages["child_language"],
+        "speakers":{speaker:{"name":speaker, "kid":kid} for speaker, kid in speakers.items()},
+        "translations":[translation_lang],
+        "languages":[{"LANG_DEF":lang, "LANG_ID":lang, "LANG_LABEL":lang} for lang in [languages["main_language"], translation_lang, languages["child_language"]]],
+        "xds":xds_values
+    }
+    with open(os.path.join(directory, "to_flextext_config.json"), "w", encoding="utf8") as config_file:
+        json.dump(to_flextext_config, config_file, ensure_ascii=False, indent=4)
+    with open(os.path.join(directory, "to_eaf_config.json"), "w", encoding="utf8") as config_file:
+        json.dump(to_eaf_config, config_file, ensure_ascii=False, indent=4)
+
+def write_corpus(directory: str, n_segments: int, seed: int = 0, speakers: dict = None):
+    """Write a synthetic EAF, the glossed FLExText FLEx would give back for it, and configs for both directions
+
+    Parameters:
+        directory: where to write the files (the scripts should be run from here)
+        n_segments: how many utterances the EAF has
+        seed: the same seed always gives the same files
+        speakers: dict of speaker codes and whether they are kids (1) or not (0); by default two adults and two kids
+
+    Returns a dict with the paths of the "original_eaf" and the "flextext"
+    """
+    if speakers is None:
+        speakers = {"FIL":0, "FILS":0, "YDN":1, "YDNB":1}
+    languages = {"main_language":"mto", "child_language":"cps", "flex_language":"en"}
+    translation_lang = "es"
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    utterances = make_utterances(n_segments, speakers, rnd)
+    utterance_aIDs = write_eaf(os.path.join(directory, "synthetic.eaf"), utterances, speakers, translation_lang)
+    write_flextext(os.path.join(directory, "synthetic.flextext"), utterances, utterance_aIDs, speakers, languages, translation_lang, rnd)
+    write_configs(directory, "synthetic.eaf", "synthetic.flextext", speakers, languages, translation_lang)
+    return {"original_eaf":os.path.join(directory, "synthetic.eaf"), "flextext":os.path.join(directory, "synthetic.flextext")}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic EAF and glossed FLExText, with configs, for trying out and benchmarking flibl")
+    parser.add_argument("directory", help="Where to write the files")
+    parser.add_argument("-n", "--segments", type=int, default=1000, help="Number of utterances in the EAF")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random choices; the same seed gives the same files")
+    args = parser.parse_args()
+    write_corpus(args.directory, args.segments, args.seed)
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+import pytest
+
+# The scripts and flexible.py aren't installed, so import them from the repository
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+import synthetic_corpus
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """A small synthetic corpus (see synthetic_corpus.write_corpus), with the working directory moved into it, as the paths in its configs are relative to it
+
+    Returns the directory it is in
+    """
+    synthetic_corpus.write_corpus(str(tmp_path), 40, seed=0)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def eaf_config(corpus):
+    """The to_eaf_config.json of the synthetic corpus"""
+    with open("to_eaf_config.json", encoding="utf8") as config_file:
+        return json.load(config_file)
+
+@pytest.fixture
+def flextext_config(corpus):
+    """The to_flextext_config.json of the synthetic corpus"""
+    with open("to_flextext_config.json", encoding="utf8") as config_file:
+        return json.load(config_file)
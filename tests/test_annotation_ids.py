@@ -0,0 +1,37 @@
+import xml.etree.ElementTree as ET
+import flexible as flibl
+from eaf_construction import EafConverter
+
+def annotation_ids(eaf_file):
+    """Returns the ANNOTATION_IDs in an EAF, the ANNOTATION_REFs and PREVIOUS_ANNOTATIONs, and its lastUsedAnnotationId"""
+    root = ET.parse(eaf_file).getroot()
+    ids = [el.attrib["ANNOTATION_ID"] for el in root.iter() if "ANNOTATION_ID" in el.attrib]
+    refs = [el.attrib[name] for el in root.iter("REF_ANNOTATION") for name in ("ANNOTATION_REF", "PREVIOUS_ANNOTATION") if name in el.attrib]
+    last_used = int(root.find(".//PROPERTY[@NAME='lastUsedAnnotationId']").text)
+    return ids, refs, last_used
+
+def test_allocated_blocks_fit_together(eaf_config):
+    segments = [flibl.Segment(str(n)) for n in range(3)]
+    segments[0].words = [flibl.Word("a", morphs=[flibl.Morph(), flibl.Morph()])]
+    segments[2].words = [flibl.Word("b"), flibl.Word("c", morphs=[flibl.Morph()])]
+    blocks, next_aID = flibl.allocate_annotation_ids(segments, 10, 3, 2)
+    # 3 phrase-level associations each, 3 per word, and 1 + 2 per morph
+    assert blocks == [10, 10 + 3 + 3 + 2 * 3, 10 + 3 + 3 + 2 * 3 + 3]
+    assert next_aID == blocks[2] + 3 + 3 * 2 + 3
+
+def test_ids_are_unique_and_resolve(eaf_config):
+    eaf_file = EafConverter(eaf_config).convert(eaf_config["eafs_flextexts"][0])[0]
+    ids, refs, last_used = annotation_ids(eaf_file)
+    assert len(ids) == len(set(ids))
+    assert set(refs) <= set(ids)
+    assert last_used == max(int(aID[1:]) for aID in ids)
+
+def test_segment_without_phonetic_or_target_note_is_left_out(corpus, eaf_config, capsys):
+    flextext = corpus / "synthetic.flextext"
+    text = flextext.read_text(encoding="utf8")
+    flextext.write_text(text.replace('<item type="note" lang="en">Phonetic</item>', "", 1), encoding="utf8")
+    eaf_file = EafConverter(eaf_config).convert(eaf_config["eafs_flextexts"][0])[0]
+    assert "no_phonetic_or_target_note" in capsys.readouterr().out
+    ids, refs, last_used = annotation_ids(eaf_file)
+    assert "aNone" not in ids + refs
+    assert set(refs) <= set(ids)
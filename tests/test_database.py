@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import flexible as flibl
+import corpus_database
+from eaf_construction import EafConverter
+
+def convert_into(eaf_config, corpus, database_path):
+    """Convert the corpus with the cache, storing it in the database at database_path
+
+    Returns the status of each text
+    """
+    converter = EafConverter(eaf_config, database=corpus_database.CorpusDatabase(database_path))
+    cache = flibl.ConversionCache(str(corpus / "cache"))
+    return [result["status"] for result in converter.convert_many(eaf_config["eafs_flextexts"], cache=cache)]
+
+def stored_segments(database_path):
+    with sqlite3.connect(database_path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+def test_unchanged_text_is_stored_in_a_new_database(corpus, eaf_config):
+    database_path = str(corpus / "corpus.db")
+    assert convert_into(eaf_config, corpus, database_path) == ["ok"]
+    assert convert_into(eaf_config, corpus, database_path) == ["cached"]
+    segments = stored_segments(database_path)
+    assert segments > 0
+    # the text hasn't changed, but the database it was stored in is gone
+    os.remove(database_path)
+    assert convert_into(eaf_config, corpus, database_path) == ["ok"]
+    assert stored_segments(database_path) == segments
+    assert convert_into(eaf_config, corpus, database_path) == ["cached"]
@@ -0,0 +1,42 @@
+import re
+import pytest
+import validation
+from eaf_construction import EafConverter
+from flextext_construction import FlexTextConverter
+
+pytest.importorskip("lxml")
+
+def add_comments(path):
+    """Put a comment (and a processing instruction) in the HEADER of an EAF, as ELAN and other tools can leave there"""
+    with open(path, encoding="utf8") as eaf_file:
+        text = eaf_file.read()
+    with open(path, "w", encoding="utf8") as eaf_file:
+        eaf_file.write(re.sub(r"(<HEADER[^>]*>)", r"\1<!-- edited by hand --><?tool note?>", text, count=1))
+
+def test_comments_in_original_eaf_header(eaf_config):
+    add_comments(eaf_config["eafs_flextexts"][0]["original_eaf"])
+    stdlib_file = EafConverter(eaf_config, xml="stdlib").convert(eaf_config["eafs_flextexts"][0])[0]
+    with open(stdlib_file, encoding="utf8") as eaf_file:
+        stdlib_eaf = eaf_file.read()
+    lxml_file = EafConverter(eaf_config, xml="lxml").convert(eaf_config["eafs_flextexts"][0])[0]
+    with open(lxml_file, encoding="utf8") as eaf_file:
+        assert eaf_file.read() == stdlib_eaf
+    assert validation.validate_file(lxml_file) == []
+
+def test_comments_in_eaf_to_flextext(flextext_config):
+    add_comments(flextext_config["file_names"][0])
+    flextext_file = FlexTextConverter(flextext_config, xml="lxml").convert(flextext_config["file_names"][0])[0]
+    assert validation.validate_file(flextext_file) == []
+
+def test_comments_in_flextext(eaf_config):
+    text = eaf_config["eafs_flextexts"][0]
+    with open(text["flextext"], encoding="utf8") as flextext_file:
+        flextext = flextext_file.read()
+    with open(text["flextext"], "w", encoding="utf8") as flextext_file:
+        flextext_file.write(re.sub(r"(<phrase [^>]*>)", r"\1<!-- checked -->", flextext, count=1).replace("<words>", "<words><!-- words -->", 1))
+    stdlib_file = EafConverter(eaf_config, xml="stdlib").convert(text)[0]
+    with open(stdlib_file, encoding="utf8") as eaf_file:
+        stdlib_eaf = eaf_file.read()
+    lxml_file = EafConverter(eaf_config, xml="lxml").convert(text)[0]
+    with open(lxml_file, encoding="utf8") as eaf_file:
+        assert eaf_file.read() == stdlib_eaf
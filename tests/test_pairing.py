@@ -0,0 +1,34 @@
+import flexible as flibl
+
+def make_segments(*notes):
+    """Segments numbered from 1, each from a (phon_tar, orig_aID) pair"""
+    segments = {}
+    for n, (phon_tar, orig_aID) in enumerate(notes):
+        segment = flibl.Segment(str(n + 1))
+        segment.phon_tar, segment.orig_aID = phon_tar, orig_aID
+        segments[segment.segnum] = segment
+    return segments
+
+def test_targets_pair_with_the_phonetic_segment_of_their_aID():
+    # Targets can come before or after their Phonetic segment
+    segments = make_segments(("Target", "a3"), ("Phonetic", "a1"), ("Phonetic", "a3"), ("Target", "a1"), ("Phonetic", "a5"))
+    assert flibl.pair_targets(segments) == ({"1":"3", "4":"2"}, [])
+
+def test_duplicate_and_unmatched_aIDs_are_warned_about():
+    segments = make_segments(("Phonetic", "a1"), ("Phonetic", "a1"), ("Target", "a1"), ("Target", "a1"), ("Target", "a9"), ("", "a2"), ("Phonetic", ""))
+    pairs, warnings = flibl.pair_targets(segments)
+    # the first of each duplicate is the one kept
+    assert pairs == {"3":"1"}
+    assert warnings == [
+        {"warning":"duplicate_phonetic", "orig_aID":"a1", "segnum":"2", "paired_segnum":"1"},
+        {"warning":"no_phonetic_or_target_note", "orig_aID":"a2", "segnum":"6"},
+        {"warning":"duplicate_target", "orig_aID":"a1", "segnum":"4", "paired_segnum":"3"},
+        {"warning":"unmatched_target", "orig_aID":"a9", "segnum":"5"}
+    ]
+
+def test_pairing_a_large_text():
+    # one pass over the segments for each side, so this is quick even with many Targets
+    notes = [("Phonetic", "a{}".format(n)) for n in range(50000)] + [("Target", "a{}".format(n)) for n in range(0, 50000, 2)]
+    pairs, warnings = flibl.pair_targets(make_segments(*notes))
+    assert len(pairs) == 25000 and warnings == []
+    assert pairs["50001"] == "1" and pairs["75000"] == "49999"
@@ -0,0 +1,24 @@
+import json
+import flexible as flibl
+
+def as_json(phrases):
+    return json.dumps(list(phrases), default=flibl.record_json)
+
+def test_packed_phrases_are_the_same_as_parsed(corpus, eaf_config, tmp_path):
+    cache = flibl.PhraseCache(str(tmp_path / "phrases"))
+    languages = (eaf_config["language"], eaf_config["child_language"])
+    parsed = as_json(flibl.iter_phrases("synthetic.flextext", *languages))
+    # the first time it's parsed (from a file object, as FileAccess gives it) and packed, the second time it's unpacked
+    with open("synthetic.flextext", "rb") as flextext_file:
+        assert as_json(cache.phrases(flextext_file, *languages)) == parsed
+    assert as_json(cache.phrases("synthetic.flextext", *languages)) == parsed
+    assert len(list((tmp_path / "phrases").iterdir())) == 1
+
+def test_changed_flextext_is_parsed_again(corpus, eaf_config, tmp_path):
+    cache = flibl.PhraseCache(str(tmp_path / "phrases"))
+    languages = (eaf_config["language"], eaf_config["child_language"])
+    list(cache.phrases("synthetic.flextext", *languages))
+    flextext = corpus / "synthetic.flextext"
+    flextext.write_text(flextext.read_text(encoding="utf8").replace(">Phonetic<", ">Target<", 1), encoding="utf8")
+    phrases = list(cache.phrases("synthetic.flextext", *languages))
+    assert "Target" in phrases[0]["notes"]
@@ -0,0 +1,25 @@
+import os
+from eaf_construction import EafConverter
+from flextext_construction import FlexTextConverter
+
+def read_outputs(results):
+    """The contents of the files a batch wrote, in order, removing them so the next batch writes its own"""
+    contents = {}
+    for result in results:
+        assert result["status"] == "ok"
+        for output in result["outputs"]:
+            with open(output, "rb") as output_file:
+                contents[output] = output_file.read()
+    for output in contents:
+        os.remove(output)
+    return list(contents.values())
+
+def test_pipelined_eafs_are_the_same(eaf_config):
+    converter = EafConverter(eaf_config, export_json=True)
+    texts = eaf_config["eafs_flextexts"] * 2
+    assert read_outputs(converter.convert_many(texts, pipeline=True)) == read_outputs(converter.convert_many(texts))
+
+def test_pipelined_flextexts_are_the_same(flextext_config):
+    converter = FlexTextConverter(flextext_config, guids="counter")
+    file_names = flextext_config["file_names"] * 2
+    assert read_outputs(converter.convert_many(file_names, pipeline=True)) == read_outputs(converter.convert_many(file_names))
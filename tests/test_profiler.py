@@ -0,0 +1,24 @@
+import tracemalloc
+import flexible as flibl
+
+def test_memory_tracing_is_stopped_by_the_profiler_that_started_it():
+    profiler = flibl.Profiler(trace_memory=True)
+    profiler.begin("make a list")
+    numbers = list(range(100000))
+    report = profiler.report()
+    assert report["stages"]["make a list"]["peak_mb"] > 0 and len(numbers) == 100000
+    assert not tracemalloc.is_tracing()
+
+def test_memory_tracing_started_outside_is_left_running():
+    tracemalloc.start()
+    try:
+        profiler = flibl.Profiler(trace_memory=True)
+        profiler.begin("nothing")
+        assert "peak_mb" in profiler.report()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+def test_memory_is_only_traced_when_asked_for():
+    report = flibl.Profiler().report()
+    assert "peak_mb" not in report and not tracemalloc.is_tracing()
@@ -0,0 +1,26 @@
+import pytest
+import flexible as flibl
+import corpus_stats
+
+pytest.importorskip("numpy")
+
+def make_segment(segnum, speaker, xds, morphs_per_word, phon_tar="Phonetic"):
+    segment = flibl.Segment(segnum)
+    segment.speaker, segment.xds, segment.phon_tar = speaker, xds, phon_tar
+    segment.words = [flibl.Word("w", morphs=[flibl.Morph() for m in range(n)]) for n in morphs_per_word]
+    return segment
+
+def test_summary_over_two_texts(tmp_path):
+    first = {"1":make_segment("1", "YDN", "A", [1, 2]), "2":make_segment("2", "YDN", "A", [1], "Target"), "3":make_segment("3", "FIL", "C", [3])}
+    second = {"1":make_segment("1", "YDN", "C", [1, 1, 1, 1])}
+    speakers = {"YDN":{"kid":1}, "FIL":{"kid":0}}
+    counts = [corpus_stats.segment_counts(first, {"2":"1"}, speakers), corpus_stats.segment_counts(second, {}, speakers)]
+    # the counts go through a file between the conversions and the summary
+    with open(tmp_path / "second.stats.npz", "wb") as stats_file:
+        corpus_stats.save_counts(counts[1], stats_file)
+    counts[1] = corpus_stats.load_counts(str(tmp_path / "second.stats.npz"))
+    rows = {(row["speaker"], row["xds"]):row for row in corpus_stats.summarize_counts(counts)}
+    assert sorted(rows) == [("FIL", "*"), ("FIL", "C"), ("YDN", "*"), ("YDN", "A"), ("YDN", "C")]
+    assert rows[("YDN", "*")] == {"speaker":"YDN", "kid":True, "xds":"*", "utterances":2, "mlu_words":3.0, "mlu_morphs":3.5, "target_ratio":0.5}
+    assert rows[("FIL", "C")]["kid"] is False and rows[("FIL", "C")]["mlu_morphs"] == 3.0
+    assert corpus_stats.format_stats(list(rows.values()), separator="\t").splitlines()[0] == "\t".join(corpus_stats.stats_columns)
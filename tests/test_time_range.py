@@ -0,0 +1,25 @@
+import xml.etree.ElementTree as ET
+import flexible as flibl
+import validation
+from eaf_construction import EafConverter
+from flextext_construction import FlexTextConverter
+
+time_range = (20000, 60000)
+
+def phrase_times(flextext_file):
+    return [(int(phrase.attrib["begin-time-offset"]), int(phrase.attrib["end-time-offset"])) for phrase in ET.parse(flextext_file).getroot().iter("phrase")]
+
+def test_eaf_to_flextext_keeps_the_overlapping_annotations(flextext_config):
+    whole = phrase_times(FlexTextConverter(flextext_config).convert(flextext_config["file_names"][0])[0])
+    part = phrase_times(FlexTextConverter(flextext_config, time_range=time_range).convert(flextext_config["file_names"][0])[0])
+    assert part and len(part) < len(whole)
+    assert part == [times for times in whole if flibl.overlaps(*times, time_range)]
+
+def test_flextext_to_eaf_keeps_the_overlapping_segments(eaf_config):
+    eaf_file = EafConverter(eaf_config, time_range=time_range).convert(eaf_config["eafs_flextexts"][0])[0]
+    assert eaf_file.endswith("-20000_60000ms.eaf")
+    root = ET.parse(eaf_file).getroot()
+    times = flibl.time_values(root)
+    segments = [(int(times[annotation.attrib["TIME_SLOT_REF1"]]), int(times[annotation.attrib["TIME_SLOT_REF2"]])) for annotation in root.iter("ALIGNABLE_ANNOTATION")]
+    assert segments and all(flibl.overlaps(*segment, time_range) for segment in segments)
+    assert validation.validate_file(eaf_file) == []
@@ -0,0 +1,55 @@
+import random
+import xml.etree.ElementTree as ET
+import flexible as flibl
+
+def reference_tokens(phrase, word_forming):
+    """Tokens and kinds as they were worked out before the Tokenizer: split, strip and filter, gather the periods, then classify each token again"""
+    tokens = []
+    punct_chars = ""
+    for token in [piece.strip() for piece in word_forming.split(phrase)]:
+        if not token:
+            continue
+        if token == ".":
+            punct_chars += token
+        else:
+            if punct_chars:
+                tokens.append(" " + punct_chars)
+                punct_chars = ""
+            tokens.append(token)
+    return [(token, "punct" if word_forming.search(token) else "txt") for token in tokens]
+
+def word_forming(flextext_config):
+    return flibl.make_word_forming(flextext_config)[flextext_config["languages"]["main_language"]]
+
+def test_tokens_are_the_same_as_before(flextext_config):
+    pattern = word_forming(flextext_config)
+    tokenizer = flibl.Tokenizer(pattern)
+    phrases = ["", " ", ".", "...", "wa ne.", "wa... ne", "¿wa'ne? ¡ä!", "wa . . ne ..", "  wa,ne;  ", "wa-ne (ö)"]
+    # and some made up from the characters that matter: word-forming, not, spaces and periods
+    rng = random.Random(0)
+    phrases += ["".join(rng.choice("aäw' .,?-") for n in range(rng.randint(0, 20))) for m in range(500)]
+    for phrase in phrases:
+        assert list(tokenizer.tokenize(phrase)) == reference_tokens(phrase, pattern), phrase
+        assert flibl.tokenize(phrase, pattern) == [token for token, kind in reference_tokens(phrase, pattern)]
+
+def test_cache_keeps_the_most_recently_used(flextext_config):
+    tokenizer = flibl.Tokenizer(word_forming(flextext_config), cache_size=2)
+    first = tokenizer.tokenize("wa ne")
+    tokenizer.tokenize("ne wa")
+    assert tokenizer.tokenize("wa ne") is first
+    tokenizer.tokenize("wa wa")
+    # "ne wa" was used least recently, so it made room for "wa wa"
+    assert list(tokenizer.cache) == ["wa ne", "wa wa"]
+
+def test_tokenize_many(flextext_config):
+    tokenizer = flibl.Tokenizer(word_forming(flextext_config), cache_size=0)
+    phrases = ["wa ne.", "", "wa ne.", "¿ä?"]
+    batch = tokenizer.tokenize_many(phrases)
+    assert batch == [tokenizer.tokenize(phrase) for phrase in phrases]
+    # a repeated utterance is only scanned once
+    assert batch[0] is batch[2]
+
+def test_word_elements_keep_the_kinds_given():
+    phrase_el = ET.Element("phrase")
+    flibl.add_word_el([("wa", "txt"), (" ..", "punct"), ("?", "punct")], phrase_el, "mto")
+    assert [(item.text, item.attrib["type"]) for item in phrase_el.iter("item")] == [("wa", "txt"), (" ..", "punct"), ("?", "punct")]
@@ -0,0 +1,60 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+import pytest
+import validation
+from eaf_construction import EafConverter
+
+def rewrite(path, pattern, replacement):
+    """Change the first match of pattern in a file"""
+    with open(path, encoding="utf8") as xml_file:
+        text = xml_file.read()
+    with open(path, "w", encoding="utf8") as xml_file:
+        xml_file.write(re.sub(pattern, replacement, text, count=1, flags=re.DOTALL))
+
+def tier_values(eaf_file):
+    """The annotation values of each tier of an EAF, sorted, as the order within a tier is up to how the annotations were made"""
+    return {tier.attrib["TIER_ID"]:sorted(value.text or "" for value in tier.iter("ANNOTATION_VALUE")) for tier in ET.parse(eaf_file).getroot().iter("TIER")}
+
+def test_update_matches_a_fresh_conversion(corpus, eaf_config):
+    text = eaf_config["eafs_flextexts"][0]
+    # out of the way of the fresh conversion, which is named after the same minute
+    eaf_file = str(corpus / "previous.eaf")
+    os.replace(EafConverter(eaf_config).convert(text)[0], eaf_file)
+    # say the first word was said twice, which changes the words and the text of the first utterance
+    rewrite(text["flextext"], r"(<word guid=.*?</word>)", r"\1\1")
+    updated = EafConverter(eaf_config).update(dict(text, previous_eaf=eaf_file))[0]
+    fresh = EafConverter(eaf_config).convert(text)[0]
+    assert tier_values(updated) == tier_values(fresh)
+    assert validation.validate_file(updated) == []
+
+def test_segments_not_found_are_listed(eaf_config, capsys):
+    text = eaf_config["eafs_flextexts"][0]
+    eaf_file = EafConverter(eaf_config).convert(text)[0]
+    rewrite(text["flextext"], r'(<phrase [^>]*begin-time-offset=")\d+', r"\g<1>1")
+    EafConverter(eaf_config).update(dict(text, previous_eaf=eaf_file))
+    assert "1 segments of synthetic.flextext not found in {} by speaker and times, so left as they were: 1\n".format(eaf_file) in capsys.readouterr().out
+
+def test_utterances_with_the_same_speaker_and_times_are_refused(eaf_config):
+    text = eaf_config["eafs_flextexts"][0]
+    eaf_file = EafConverter(eaf_config).convert(text)[0]
+    # give the second Phonetic utterance of a speaker the times of their first
+    flextext = ET.parse(text["flextext"])
+    first_phrases = {}
+    for phrase in flextext.iter("phrase"):
+        notes = [item.text for item in phrase.findall("item[@type='note']")]
+        if "Phonetic" not in notes:
+            continue
+        speaker = next(note for note in notes if note in eaf_config["speakers"])
+        if speaker in first_phrases:
+            phrase.attrib["begin-time-offset"] = first_phrases[speaker].attrib["begin-time-offset"]
+            phrase.attrib["end-time-offset"] = first_phrases[speaker].attrib["end-time-offset"]
+            break
+        first_phrases[speaker] = phrase
+    flextext.write(text["flextext"], encoding="utf-8")
+    with open(eaf_file, encoding="utf8") as before:
+        eaf_text = before.read()
+    with pytest.raises(ValueError, match="same speaker and times"):
+        EafConverter(eaf_config).update(dict(text, previous_eaf=eaf_file))
+    with open(eaf_file, encoding="utf8") as after:
+        assert after.read() == eaf_text
@@ -0,0 +1,52 @@
+import re
+import validation
+from eaf_construction import EafConverter
+from flextext_construction import FlexTextConverter
+
+def convert_eaf(eaf_config):
+    return EafConverter(eaf_config).convert(eaf_config["eafs_flextexts"][0])[0]
+
+def rewrite(path, pattern, replacement):
+    """Change the first match of pattern in a file"""
+    with open(path, encoding="utf8") as xml_file:
+        text = xml_file.read()
+    with open(path, "w", encoding="utf8") as xml_file:
+        xml_file.write(re.sub(pattern, replacement, text, count=1))
+
+def test_converted_eaf_is_valid(eaf_config):
+    # the synthetic corpus has kids with targets, whose notes, xds and translations have to be under the target tier
+    assert validation.validate_file(convert_eaf(eaf_config)) == []
+
+def test_converted_flextext_is_valid(flextext_config):
+    flextext_file = FlexTextConverter(flextext_config).convert(flextext_config["file_names"][0])[0]
+    assert validation.validate_file(flextext_file) == []
+
+def test_missing_previous_annotation(eaf_config):
+    eaf_file = convert_eaf(eaf_config)
+    rewrite(eaf_file, r' PREVIOUS_ANNOTATION="a\d+"', "")
+    problems = validation.validate_file(eaf_file)
+    assert len(problems) == 1 and "has no PREVIOUS_ANNOTATION" in problems[0]
+
+def test_dangling_annotation_ref(eaf_config):
+    eaf_file = convert_eaf(eaf_config)
+    rewrite(eaf_file, r'ANNOTATION_REF="a\d+"', 'ANNOTATION_REF="a999999"')
+    problems = validation.validate_file(eaf_file)
+    assert any("ANNOTATION_REF a999999 is not an annotation" in problem for problem in problems)
+
+def test_wrong_last_used_annotation_id(eaf_config):
+    eaf_file = convert_eaf(eaf_config)
+    rewrite(eaf_file, r'lastUsedAnnotationId">\d+', 'lastUsedAnnotationId">5')
+    problems = validation.validate_file(eaf_file)
+    assert len(problems) == 1 and problems[0].startswith("header: lastUsedAnnotationId is 5")
+
+def test_annotation_on_wrong_tier(eaf_config):
+    eaf_file = convert_eaf(eaf_config)
+    # point a word's gloss at the segment instead of the word
+    rewrite(eaf_file, r'(TIER_ID="\w+-mto-phonetic-gls">\s*<ANNOTATION>\s*<REF_ANNOTATION ANNOTATION_ID="a\d+" ANNOTATION_REF=)"a\d+"', r'\1"a1"')
+    problems = validation.validate_file(eaf_file)
+    assert len(problems) == 1 and "not the parent tier" in problems[0]
+
+def test_phrase_without_segnum(flextext_config):
+    flextext_file = FlexTextConverter(flextext_config).convert(flextext_config["file_names"][0])[0]
+    rewrite(flextext_file, r'<item type="segnum"[^>]*>[^<]*</item>', "")
+    assert validation.validate_file(flextext_file) == ["text 1, phrase 1: it has no segnum"]
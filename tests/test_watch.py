@@ -0,0 +1,30 @@
+import os
+import watching
+from flextext_construction import FlexTextConverter
+
+def test_saved_file_is_converted_again(flextext_config, monkeypatch, capsys):
+    eaf_file = flextext_config["file_names"][0]
+    converter = FlexTextConverter(flextext_config)
+    rounds = []
+    def sleep(seconds):
+        """Save the EAF while watching the first time, and stop watching (as Ctrl+C would) the time after"""
+        rounds.append(seconds)
+        if len(rounds) == 1:
+            stat = os.stat(eaf_file)
+            os.utime(eaf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        else:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(watching.time, "sleep", sleep)
+    results = watching.watch(converter.convert, flextext_config["file_names"], converter.input_files, debounce=0)
+    assert [result["status"] for result in results] == ["ok"]
+    assert capsys.readouterr().out.endswith("Stopped watching\n")
+
+def test_unchanged_file_is_left_alone(flextext_config, monkeypatch):
+    converter = FlexTextConverter(flextext_config)
+    rounds = []
+    def sleep(seconds):
+        rounds.append(seconds)
+        if len(rounds) > 3:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(watching.time, "sleep", sleep)
+    assert watching.watch(converter.convert, flextext_config["file_names"], converter.input_files, debounce=0) == []
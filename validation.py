@@ -0,0 +1,242 @@
+# v1
+import xml.etree.ElementTree as ET
+
+class EafChecker:
+    """Parser target (for ET.XMLParser) that checks the structure of an EAF the way ELAN relies on it as the EAF is parsed, without building a tree
+
+    Checks that annotation IDs are unique, that every ANNOTATION_REF and PREVIOUS_ANNOTATION points at an existing annotation (on the parent tier, or the same tier),
+    that the annotations dividing up another one are chained by PREVIOUS_ANNOTATION in order, that associations have at most one annotation per parent,
+    that time slots, parent tiers and linguistic types exist, and that lastUsedAnnotationId is at least the highest annotation ID.
+    Everything that can be checked as an element is reached is, including references back to annotations already seen (as they almost always are);
+    only the annotations referring forward in the file are kept to check at the end.
+    Like ELAN, it expects the annotations referring to the same annotation to be next to each other in their tier.
+    """
+    def __init__(self):
+        self.problems = []
+        self.time_slots = {}
+        # TIER_ID: (PARENT_REF, LINGUISTIC_TYPE_REF) of each tier, and the CONSTRAINTS of each linguistic type
+        self.tiers = {}
+        self.linguistic_types = {}
+        # the tier each annotation is on, and (ANNOTATION_ID, tier, ANNOTATION_REF, PREVIOUS_ANNOTATION) for each REF_ANNOTATION referring to one not seen yet
+        self.annotation_tiers = {}
+        self.forward_references = []
+        # the (ANNOTATION_REF, ANNOTATION_ID) of the last annotation in each tier
+        self.last_in_tier = {}
+        # (tier, ANNOTATION_ID, ANNOTATION_REF, PREVIOUS_ANNOTATION, the annotation before it with the same ANNOTATION_REF) of annotations that aren't in order if their tier is a subdivision,
+        # or are a second annotation for the same one if it is an association (the linguistic types come after the tiers, so which it is is only known at the end)
+        self.out_of_order = []
+        self.last_used_aID = None
+        self.tier_id = None
+        # the text of the lastUsedAnnotationId property, gathered while inside it (None when outside)
+        self.property_text = None
+
+    def start(self, tag: str, attrib: dict):
+        # most of the elements are these, and have nothing to check
+        if tag == "ANNOTATION_VALUE" or tag == "ANNOTATION":
+            return
+        if tag == "REF_ANNOTATION" or tag == "ALIGNABLE_ANNOTATION":
+            aID = attrib.get("ANNOTATION_ID")
+            if aID in self.annotation_tiers:
+                self.problems.append("tier {}, annotation {}: there is another annotation with the same ANNOTATION_ID (on tier {})".format(self.tier_id, aID, self.annotation_tiers[aID]))
+            self.annotation_tiers[aID] = self.tier_id
+            if tag == "REF_ANNOTATION":
+                ref = attrib.get("ANNOTATION_REF")
+                previous = attrib.get("PREVIOUS_ANNOTATION")
+                if ref in self.annotation_tiers:
+                    self.check_reference(aID, self.tier_id, ref)
+                else:
+                    self.forward_references.append((aID, self.tier_id, ref))
+                if previous is not None and self.annotation_tiers.get(previous) != self.tier_id:
+                    self.problems.append("tier {}, annotation {}: its PREVIOUS_ANNOTATION {} is not an annotation before it on the same tier".format(self.tier_id, aID, previous))
+                last_ref, last_aID = self.last_in_tier.get(self.tier_id, (None, None))
+                before = last_aID if last_ref == ref else None
+                if previous != before:
+                    self.out_of_order.append((self.tier_id, aID, ref, previous, before))
+                self.last_in_tier[self.tier_id] = (ref, aID)
+                return
+            times = []
+            for time_slot_ref in ("TIME_SLOT_REF1", "TIME_SLOT_REF2"):
+                time_slot = attrib.get(time_slot_ref)
+                if time_slot not in self.time_slots:
+                    self.problems.append("tier {}, annotation {}: {} {} is not a time slot".format(self.tier_id, aID, time_slot_ref, time_slot))
+                else:
+                    times.append(self.time_slots[time_slot])
+            if len(times) == 2 and None not in times and times[0] > times[1]:
+                self.problems.append("tier {}, annotation {}: it ends ({} ms) before it begins ({} ms)".format(self.tier_id, aID, times[1], times[0]))
+        elif tag == "TIME_SLOT":
+            value = attrib.get("TIME_VALUE")
+            self.time_slots[attrib.get("TIME_SLOT_ID")] = int(value) if value is not None and value.isdigit() else None
+        elif tag == "TIER":
+            self.tier_id = attrib.get("TIER_ID")
+            if self.tier_id in self.tiers:
+                self.problems.append("tier {}: there is another tier with the same TIER_ID".format(self.tier_id))
+            self.tiers[self.tier_id] = (attrib.get("PARENT_REF"), attrib.get("LINGUISTIC_TYPE_REF"))
+        elif tag == "LINGUISTIC_TYPE":
+            self.linguistic_types[attrib.get("LINGUISTIC_TYPE_ID")] = attrib.get("CONSTRAINTS")
+        elif tag == "PROPERTY" and attrib.get("NAME") == "lastUsedAnnotationId":
+            self.property_text = []
+
+    def data(self, text: str):
+        if self.property_text is not None:
+            self.property_text.append(text)
+
+    def end(self, tag: str):
+        if self.property_text is not None and tag == "PROPERTY":
+            self.last_used_aID = "".join(self.property_text).strip()
+            self.property_text = None
+
+    def check_reference(self, aID: str, tier_id: str, ref: str):
+        """Check that the annotation an annotation refers to exists, on the parent tier of the annotation's tier"""
+        ref_tier = self.annotation_tiers.get(ref)
+        parent_tier = self.tiers[tier_id][0]
+        if ref_tier is None:
+            self.problems.append("tier {}, annotation {}: its ANNOTATION_REF {} is not an annotation".format(tier_id, aID, ref))
+        elif ref_tier != parent_tier:
+            self.problems.append("tier {}, annotation {}: its ANNOTATION_REF {} is on tier {}, not the parent tier {}".format(tier_id, aID, ref, ref_tier, parent_tier))
+
+    def close(self):
+        """Make the checks that need the whole EAF
+
+        Returns the list of problems found, each saying where it is (empty if there are none)
+        """
+        problems = self.problems
+        for aID, tier_id, ref in self.forward_references:
+            self.check_reference(aID, tier_id, ref)
+        for tier_id, (parent, linguistic_type) in self.tiers.items():
+            if parent is not None and parent not in self.tiers:
+                problems.append("tier {}: its PARENT_REF {} is not a tier".format(tier_id, parent))
+            if linguistic_type not in self.linguistic_types:
+                problems.append("tier {}: its LINGUISTIC_TYPE_REF {} is not a linguistic type".format(tier_id, linguistic_type))
+        constraints = {tier_id:self.linguistic_types.get(linguistic_type) for tier_id, (parent, linguistic_type) in self.tiers.items()}
+        for tier_id, aID, ref, previous, before in self.out_of_order:
+            where = "tier {}, annotation {}: ".format(tier_id, aID)
+            if constraints[tier_id] == "Symbolic_Subdivision":
+                if previous is None:
+                    problems.append(where + "it has no PREVIOUS_ANNOTATION, but comes after {} in dividing up {}".format(before, ref))
+                elif before is None:
+                    problems.append(where + "its PREVIOUS_ANNOTATION is {}, but it is the first in dividing up {}".format(previous, ref))
+                else:
+                    problems.append(where + "its PREVIOUS_ANNOTATION is {}, but it comes after {} in dividing up {}".format(previous, before, ref))
+            elif constraints[tier_id] == "Symbolic_Association" and before is not None:
+                problems.append(where + "{} already has an annotation ({}) on this tier, which only allows one".format(ref, before))
+        highest_aID = max([int(aID[1:]) for aID in self.annotation_tiers if aID is not None and aID[1:].isdigit()], default=0)
+        if self.last_used_aID is None:
+            problems.append("header: there is no lastUsedAnnotationId property")
+        elif not self.last_used_aID.isdigit() or int(self.last_used_aID) < highest_aID:
+            problems.append("header: lastUsedAnnotationId is {}, but annotation IDs go up to a{}".format(self.last_used_aID, highest_aID))
+        return problems
+
+class FlexTextChecker:
+    """Parser target (for ET.XMLParser) that checks the structure of a FLExText the way FLEx relies on it as the FLExText is parsed, without building a tree
+
+    Checks that every phrase has a segnum (not used by another phrase in the same text), that its time offsets are numbers in order,
+    that every word has its text or punctuation, and that no text, paragraph or phrase has the same guid as another
+    (words and morphs can, as FLEx gives them the guid of the wordform or lexical entry they are an instance of).
+    """
+    def __init__(self):
+        self.problems = []
+        self.guids = set()
+        self.segnums = set()
+        self.n_text = self.n_phrase = self.n_word = 0
+        # what is open: the depth of the innermost phrase and word, and the type of the item whose text is being gathered
+        self.depth = 0
+        self.phrase_depth = self.word_depth = None
+        self.item_type = None
+        self.item_text = []
+        self.segnum = None
+        self.word_has_text = False
+
+    def start(self, tag: str, attrib: dict):
+        self.depth += 1
+        if tag == "paragraph" or tag == "phrase" or tag == "interlinear-text":
+            guid = attrib.get("guid")
+            if guid in self.guids:
+                self.problems.append("text {}, phrase {}: {} has the guid {}, which is already used".format(self.n_text, self.n_phrase, tag, guid))
+            if guid is not None:
+                self.guids.add(guid)
+        if tag == "item":
+            # only the items right in a phrase or word matter (not those of its morphs)
+            if self.depth - 1 == self.word_depth or (self.word_depth is None and self.depth - 1 == self.phrase_depth):
+                self.item_type = attrib.get("type")
+                self.item_text = []
+        elif tag == "word":
+            self.n_word += 1
+            self.word_depth = self.depth
+            self.word_has_text = False
+        elif tag == "phrase":
+            self.n_phrase += 1
+            self.n_word = 0
+            self.phrase_depth = self.depth
+            self.segnum = None
+            offsets = [attrib.get(name) for name in ("begin-time-offset", "end-time-offset")]
+            if any(offset is not None and not offset.isdigit() for offset in offsets):
+                self.problems.append("text {}, phrase {}: its time offsets ({}, {}) are not whole numbers".format(self.n_text, self.n_phrase, *offsets))
+            elif None not in offsets and int(offsets[0]) > int(offsets[1]):
+                self.problems.append("text {}, phrase {}: it ends ({} ms) before it begins ({} ms)".format(self.n_text, self.n_phrase, offsets[1], offsets[0]))
+        elif tag == "interlinear-text":
+            self.n_text += 1
+            self.n_phrase = 0
+            self.segnums = set()
+
+    def data(self, text: str):
+        if self.item_type is not None:
+            self.item_text.append(text)
+
+    def end(self, tag: str):
+        self.depth -= 1
+        if tag == "item":
+            if self.item_type is None:
+                return
+            text = "".join(self.item_text).strip()
+            if self.word_depth is not None:
+                if self.item_type in ("txt", "punct") and text:
+                    self.word_has_text = True
+            elif self.item_type == "segnum":
+                self.segnum = text
+            self.item_type = None
+        elif tag == "word":
+            if not self.word_has_text:
+                self.problems.append("text {}, phrase {}, word {}: it has no txt or punct item".format(self.n_text, self.n_phrase, self.n_word))
+            self.word_depth = None
+        elif tag == "phrase":
+            if not self.segnum:
+                self.problems.append("text {}, phrase {}: it has no segnum".format(self.n_text, self.n_phrase))
+            elif self.segnum in self.segnums:
+                self.problems.append("text {}, phrase {}: its segnum {} is used by another phrase".format(self.n_text, self.n_phrase, self.segnum))
+            else:
+                self.segnums.add(self.segnum)
+            self.phrase_depth = None
+
+    def close(self):
+        """Returns the list of problems found, each saying where it is (empty if there are none)"""
+        return self.problems
+
+def validate_file(path: str):
+    """Check the structure of an EAF or FLExText (going by its extension) in one pass over the file, with an EafChecker or FlexTextChecker
+
+    Parameters:
+        path: path of the EAF or FLExText
+
+    Returns the list of problems found, each saying where it is (empty if there are none, or the file is neither)
+    """
+    if path.endswith(".eaf"):
+        checker = EafChecker()
+    elif path.endswith(".flextext"):
+        checker = FlexTextChecker()
+    else:
+        return []
+    parser = ET.XMLParser(target=checker)
+    with open(path, "rb") as xml_file:
+        for chunk in iter(lambda: xml_file.read(1 << 20), b""):
+            parser.feed(chunk)
+    return parser.close()
+
+def validate_outputs(outputs: list):
+    """Check each EAF and FLExText in a list of files a conversion wrote
+
+    Returns a dict to update the conversion's result with (see convert_file) if any have problems, listing them all, and None if they are all fine
+    """
+    problems = [output + ": " + problem for output in outputs for problem in validate_file(output)]
+    if not problems:
+        return None
+    return {"status":"error", "error":"{} problem(s) in the output, the first: {}".format(len(problems), problems[0]), "traceback":"\n".join(problems) + "\n"}
@@ -0,0 +1,60 @@
+# v1
+import os
+import time
+import flexible as flibl
+
+def input_signature(paths: list):
+    """Returns the modification time and size of each of a list of files (None for any that don't exist), to tell when they change"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def watch(convert, items: list, input_files, interval: float = 0.25, debounce: float = 0.5, label=str, **batch_options):
+    """Keep converting each file again whenever its inputs change, until interrupted (Ctrl+C)
+
+    Everything the converter set up (the config, compiled patterns, tokenizers, tier templates) stays in memory between conversions, so each one only costs the conversion itself.
+    An editor saving a file often writes it several times in quick succession, so a file is only converted once its inputs have stopped changing for a moment.
+
+    Parameters:
+        convert: the function that converts one file (see flibl.convert_batch)
+        items: the list of what convert takes as its first argument
+        input_files: function that gives the list of files an item is converted from, which are the ones watched
+        interval: seconds between checks for changes
+        debounce: seconds an item's inputs have to stay the same after changing before it is converted
+        label: function that gives the name to print for each input
+        batch_options: passed on to flibl.convert_batch for each round of conversions (e.g. cache, settings, trace_memory)
+
+    Returns the list of results (see flibl.convert_file) of every conversion made while watching
+    """
+    signatures = [input_signature(input_files(item)) for item in items]
+    # when each item whose inputs changed last changed
+    changed = {}
+    results = []
+    print("Watching {} files for changes (Ctrl+C to stop)".format(len(items)), flush=True)
+    try:
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            for n, item in enumerate(items):
+                signature = input_signature(input_files(item))
+                if signature != signatures[n]:
+                    signatures[n] = signature
+                    changed[n] = now
+            # files that are missing (e.g. in the middle of being replaced) wait until they are back
+            ready = [n for n, last_change in changed.items() if now - last_change >= debounce and None not in signatures[n]]
+            if not ready:
+                continue
+            for n in ready:
+                del changed[n]
+            batch = flibl.convert_batch(convert, [items[n] for n in ready], input_files=input_files, **batch_options)
+            flibl.print_summary(batch, label, totals=False)
+            results.extend(batch)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    return results